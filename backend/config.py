@@ -11,6 +11,24 @@ LOG_LEVEL = "info"
 NEO4J_URI = "localhost:3145"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "neo4jpass"
+# neo4j 驱动连接池：最大连接数、获取连接超时（秒）、连接最长存活时间（秒）
+# 以及空闲超过多久（秒）的连接在使用前先检测存活，None 表示不检测
+NEO4J_MAX_CONNECTION_POOL_SIZE = 100
+NEO4J_CONNECTION_ACQUISITION_TIMEOUT = 60
+NEO4J_MAX_CONNECTION_LIFETIME = 3600
+NEO4J_LIVENESS_CHECK_TIMEOUT = 300
+# 观点内容全文索引的分析器（cjk 按汉字二元组切分）与按相关度搜索时每批读取的命中数
+FULLTEXT_ANALYZER = "cjk"
+FULLTEXT_BATCH_SIZE = 1000
+# 观点向量索引：本地 sentence-transformers 模型路径（None 表示使用字符 n-gram 散列向量）、
+# 散列向量维数、索引文件路径，以及 AI 生成辩论时复用已有观点的最低余弦相似度
+EMBEDDING_MODEL = None
+EMBEDDING_DIM = 256
+EMBEDDING_INDEX_PATH = "data/opinion_index.npz"
+# 向量索引在累计修改达到该条数或距上次保存超过该秒数后，于后台写回文件
+EMBEDDING_SAVE_EVERY = 1000
+EMBEDDING_SAVE_INTERVAL = 300
+SIMILAR_OPINION_THRESHOLD = 0.85
 
 # PostgreSQL 数据库配置
 psql_config = {
@@ -20,11 +38,36 @@ psql_config = {
     'host': 'localhost',
     'port': '3143'
 }
+# PostgreSQL 连接池（同步与异步引擎各一个）：常驻连接数、额外溢出连接数、
+# 获取连接超时（秒）、连接回收时间（秒）以及使用前是否检测连接存活
+PSQL_POOL_SIZE = 10
+PSQL_MAX_OVERFLOW = 20
+PSQL_POOL_TIMEOUT = 30
+PSQL_POOL_RECYCLE = 1800
+PSQL_POOL_PRE_PING = True
+# 辩论成员缓存：最多缓存的辩论数与有效期（秒），缓存只在本进程内失效，
+# 有效期也是其他进程修改辩论成员后本进程读到旧成员的最长时间
+MEMBERSHIP_CACHE_SIZE = 256
+MEMBERSHIP_CACHE_TTL = 10
 
 # OpenAI格式 API 配置
 MODEL = "deepseek-chat"
 BASE_URL = "https://api.deepseek.com"
 API_KEY = "sk-***"
+# LLM 并发请求上限、单次请求超时（秒）与失败重试次数
+LLM_MAX_CONCURRENCY = 8
+LLM_TIMEOUT = 60
+LLM_MAX_RETRIES = 3
+# LLM 评分结果缓存：内存LRU条目数与有效期（秒，None表示永不过期）
+LLM_CACHE_SIZE = 10000
+LLM_CACHE_TTL = 30 * 24 * 3600
+
+# AI 生成辩论的后台任务：工作线程数与队列轮询间隔（秒）
+AI_JOB_WORKERS = 2
+AI_JOB_POLL_INTERVAL = 1.0
+# 运行中任务的租约：心跳间隔与租约时长（秒），租约过期的任务视为其进程已退出，重新排队
+AI_JOB_HEARTBEAT_INTERVAL = 10
+AI_JOB_LEASE_TIMEOUT = 60
 
 # 链有效性阈值
 LINK_REASONABLENESS_THRESHOLD = 0.6
@@ -37,3 +80,6 @@ CORS_ALLOW_ORIGIN = [
 
 # 认证密钥
 SECRET_KEY = "your_secret"
+# 已认证用户缓存：条目数与有效期（秒），有效期也是收不到用户修改通知时修改生效的最长延迟
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 30
@@ -0,0 +1,275 @@
+import threading
+from datetime import timedelta
+from sqlalchemy import func
+from core.db_life import get_psql_session
+from core.ai_maker import ai_build_debate_from_opinion
+from schemas.db.psql import AiJob, model2dict
+from config_private import (
+    AI_JOB_WORKERS,
+    AI_JOB_POLL_INTERVAL,
+    AI_JOB_HEARTBEAT_INTERVAL,
+    AI_JOB_LEASE_TIMEOUT,
+)
+
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+
+_stop_event = threading.Event()
+_workers: list[threading.Thread] = []
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when its cancellation was requested."""
+
+
+class JobInterrupted(Exception):
+    """Raised inside a running job when the workers are stopping."""
+
+
+def _job2dict(job: AiJob) -> dict:
+    result = model2dict(job)
+    result["id"] = str(job.id)
+    result["debate_id"] = str(job.debate_id) if job.debate_id else None
+    return result
+
+
+def _check_access(job: AiJob, requester: str, is_admin: bool):
+    if not is_admin and job.creator != requester:
+        raise PermissionError(f"Job with ID {job.id} belongs to another user.")
+
+
+def _lease_expired():
+    # 运行中任务的租约超过 AI_JOB_LEASE_TIMEOUT 未刷新，说明执行它的进程已退出
+    return AiJob.locked_at.is_(None) | (
+        AiJob.locked_at < func.now() - timedelta(seconds=AI_JOB_LEASE_TIMEOUT)
+    )
+
+
+def submit_job(content: str, creator: str, max_nodes: int) -> str:
+    """
+    Queue a job building a debate from the content with an LLM.
+
+    :param content: The text to build the debate from.
+    :param creator: The user submitting the job.
+    :param max_nodes: Maximum number of opinions to create.
+    :return: The ID of the job.
+    """
+    with get_psql_session() as psql_session:
+        try:
+            job = AiJob(creator=creator, content=content, max_nodes=max_nodes)
+            psql_session.add(job)
+            psql_session.commit()
+            psql_session.refresh(job)
+        except Exception as e:
+            psql_session.rollback()
+            raise RuntimeError(f"Failed to submit job: {str(e)}")
+        return str(job.id)
+
+
+def get_job(job_id: str, requester: str, is_admin: bool = False) -> dict:
+    """
+    Get the status and progress of a job.
+
+    :param job_id: The ID of the job.
+    :param requester: The user asking, who must have submitted the job.
+    :param is_admin: Whether the requester is an admin, who may read any job.
+    """
+    with get_psql_session() as psql_session:
+        job = psql_session.query(AiJob).filter(AiJob.id == job_id).first()
+        if not job:
+            raise ValueError(f"Job with ID {job_id} does not exist.")
+        _check_access(job, requester, is_admin)
+        return _job2dict(job)
+
+
+def cancel_job(job_id: str, requester: str, is_admin: bool = False):
+    """
+    Cancel a job. A pending job is cancelled at once, a running job stops
+    at its next progress report.
+
+    :param job_id: The ID of the job.
+    :param requester: The user asking, who must have submitted the job.
+    :param is_admin: Whether the requester is an admin, who may cancel any job.
+    """
+    with get_psql_session() as psql_session:
+        job = (
+            psql_session.query(AiJob)
+            .filter(AiJob.id == job_id)
+            .with_for_update()
+            .first()
+        )
+        if not job:
+            raise ValueError(f"Job with ID {job_id} does not exist.")
+        _check_access(job, requester, is_admin)
+        if job.status in TERMINAL_STATUSES:
+            raise ValueError(f"Job with ID {job_id} has already finished.")
+        if job.status == "pending":
+            job.status = "cancelled"  # type: ignore
+        job.cancel_requested = True  # type: ignore
+        try:
+            psql_session.commit()
+        except Exception as e:
+            psql_session.rollback()
+            raise RuntimeError(f"Failed to cancel job: {str(e)}")
+
+
+def _update_job(job_id: str, **fields) -> bool:
+    """
+    Update the given fields of a job and return whether cancellation was requested.
+    """
+    with get_psql_session() as psql_session:
+        job = psql_session.query(AiJob).filter(AiJob.id == job_id).first()
+        for key, value in fields.items():
+            setattr(job, key, value)
+        psql_session.commit()
+        return bool(job.cancel_requested)
+
+
+def _claim_job() -> dict | None:
+    """
+    Take the oldest pending job, or a running job whose lease expired, and
+    mark it as running under a new lease.
+
+    Rows locked by other workers are skipped, so each job runs only once.
+    """
+    with get_psql_session() as psql_session:
+        job = (
+            psql_session.query(AiJob)
+            .filter(
+                (AiJob.status == "pending")
+                | ((AiJob.status == "running") & _lease_expired())
+            )
+            .order_by(AiJob.created_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not job:
+            return None
+        job.status = "running"  # type: ignore
+        job.locked_at = func.now()  # type: ignore
+        psql_session.commit()
+        return _job2dict(job)
+
+
+def _renew_lease(job_id: str):
+    with get_psql_session() as psql_session:
+        psql_session.query(AiJob).filter(
+            AiJob.id == job_id, AiJob.status == "running"
+        ).update(
+            # 保持 updated_at 不变，续约不算作进度变化
+            {"locked_at": func.now(), "updated_at": AiJob.updated_at},
+            synchronize_session=False,
+        )
+        psql_session.commit()
+
+
+def _heartbeat(job_id: str, finished: threading.Event):
+    # 一层的生成可能远长于租约，由单独的线程定期刷新租约
+    while not finished.wait(AI_JOB_HEARTBEAT_INTERVAL):
+        try:
+            _renew_lease(job_id)
+        except Exception as e:
+            print(f"Failed to renew the lease of AI job {job_id}: {e}")
+
+
+def _run_job(job: dict):
+    job_id = job["id"]
+    finished = threading.Event()
+    threading.Thread(
+        target=_heartbeat,
+        args=(job_id, finished),
+        name=f"ai-job-heartbeat-{job_id}",
+        daemon=True,
+    ).start()
+    try:
+        _execute_job(job)
+    finally:
+        finished.set()
+
+
+def _execute_job(job: dict):
+    job_id = job["id"]
+
+    def on_progress(progress: dict):
+        fields: dict = {"progress": progress}
+        if progress.get("debate_id"):
+            fields["debate_id"] = progress["debate_id"]
+        if _update_job(job_id, **fields):
+            raise JobCancelled()
+        if _stop_event.is_set():
+            raise JobInterrupted()
+
+    try:
+        debate_id = ai_build_debate_from_opinion(
+            job["content"],
+            max_nodes=job["max_nodes"],
+            on_progress=on_progress,
+            debate_id=job["debate_id"],
+        )
+        _update_job(job_id, status="done", debate_id=debate_id, locked_at=None)
+    except JobCancelled:
+        _update_job(job_id, status="cancelled", locked_at=None)
+    except JobInterrupted:
+        # 重启后从已生成的辩论继续
+        _update_job(job_id, status="pending", locked_at=None)
+    except Exception as e:
+        _update_job(job_id, status="failed", error=str(e), locked_at=None)
+
+
+def _worker_loop():
+    while not _stop_event.is_set():
+        try:
+            job = _claim_job()
+        except Exception as e:
+            print(f"Failed to claim AI job: {e}")
+            job = None
+        if job is None:
+            _stop_event.wait(AI_JOB_POLL_INTERVAL)
+            continue
+        try:
+            _run_job(job)
+        except Exception as e:
+            print(f"Failed to run AI job {job['id']}: {e}")
+
+
+def recover_jobs():
+    """
+    Requeue the jobs left running by an exited process, so that they resume.
+
+    Only jobs whose lease expired are requeued; jobs still renewed by a worker
+    of another process keep running there.
+    """
+    with get_psql_session() as psql_session:
+        try:
+            psql_session.query(AiJob).filter(
+                AiJob.status == "running", _lease_expired()
+            ).update(
+                {"status": "pending", "locked_at": None}, synchronize_session=False
+            )
+            psql_session.commit()
+        except Exception as e:
+            psql_session.rollback()
+            raise RuntimeError(f"Failed to recover AI jobs: {str(e)}")
+
+
+def start_workers():
+    """
+    Requeue interrupted jobs and start the worker threads.
+    """
+    recover_jobs()
+    _stop_event.clear()
+    for i in range(AI_JOB_WORKERS):
+        worker = threading.Thread(
+            target=_worker_loop, name=f"ai-job-worker-{i}", daemon=True
+        )
+        worker.start()
+        _workers.append(worker)
+
+
+def stop_workers(timeout: float = 5.0):
+    """
+    Stop the worker threads. Running jobs are requeued at their next progress report.
+    """
+    _stop_event.set()
+    for worker in _workers:
+        worker.join(timeout)
+    _workers.clear()
@@ -1,23 +1,37 @@
-from .debate import create_debate
+from .debate import create_debate, query_debate
 from .opinion import (
     create_or_opinion,
     create_and_opinion,
     head_opinion,
-    info_opinion,
+    info_opinions,
     patch_opinion,
-    query_opinion,
+    similar_opinions,
 )
 from .link import create_link
+from neomodel import db
 from schemas.link import LinkType
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Callable
+from concurrent.futures import ThreadPoolExecutor
 from .utils.llm import llm_chat
+from .utils.membership import membership_cache
+from config_private import LLM_MAX_CONCURRENCY, SIMILAR_OPINION_THRESHOLD
 import re
 import json
-import time
 
+# 记录 LLM 判定无需继续辩论的观点，继续生成时跳过
+SETTLE_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids
+SET n.settled = true
+"""
 
-def _default_parse_list_response(text: str) -> dict:
-    """Try to parse text as JSON; fall back to simple line-split lists.
+UNSETTLED_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids AND NOT coalesce(n.settled, false)
+RETURN n.uid
+"""
+
+
+def _default_parse_list_response(text: str) -> dict | None:
+    """Try to parse text as JSON, returning None if it is not valid.
 
     Expected JSON format:
     {"supports": ["..."], "opposes": ["..."], "debate": true}
@@ -35,10 +49,11 @@ def _default_parse_list_response(text: str) -> dict:
             "debate": bool(data.get("debate", True)),
         }
     except Exception:
-        return {"debate": False}
+        # 解析失败不是“无需辩论”的判定，不记录，继续生成时重新询问
+        return None
 
 
-def _ask_llm_for_children(op_content: str) -> dict:
+def _ask_llm_for_children(op_content: str) -> dict | None:
     """Ask LLM to propose supports/opposes (and groups)."""
     prompt = (
         "请给出对以下观点的支持和反对的简短观点（每条为一句可判真假的陈述）。\n"
@@ -79,12 +94,10 @@ def _ensure_or_create_opinion(
     creator: str,
     created_ids: List[str],
 ) -> str:
-    """Find an existing opinion by text in the debate or create a new OR opinion."""
-    # TODO: 未来使用向量相似度搜索
-    found = query_opinion(q=stmt, debate_id=debate_id, max_num=1)
-    if found:
-        fid = found[0].get("id")
-        return str(fid)
+    """Reuse the most similar opinion in the debate or create a new OR opinion."""
+    found = similar_opinions(stmt, debate_id=debate_id, k=1)
+    if found and found[0]["similarity"] >= SIMILAR_OPINION_THRESHOLD:
+        return str(found[0]["id"])
     sid = create_or_opinion(content=stmt, creator=creator, debate_id=debate_id)
     created_ids.append(sid)
     return sid
@@ -99,7 +112,7 @@ def _create_or_children(
     max_nodes: int,
     creator: str = "ai",
 ):
-    """Create OR children and return a list of (child_id, LinkType)."""
+    """Create OR children and return a list of (child_id, LinkType, content)."""
     new_children = []
     for child_text in supports:
         if len(created_ids) >= max_nodes:
@@ -109,7 +122,7 @@ def _create_or_children(
                 content=child_text, creator=creator, debate_id=debate_id
             )
             created_ids.append(child_id)
-            new_children.append((child_id, LinkType.SUPPORT))
+            new_children.append((child_id, LinkType.SUPPORT, child_text))
         except Exception as e:
             print(f"Failed to create support opinion for {oid}: {e}")
     for child_text in opposes:
@@ -120,11 +133,11 @@ def _create_or_children(
                 content=child_text, creator=creator, debate_id=debate_id
             )
             created_ids.append(child_id)
-            new_children.append((child_id, LinkType.OPPOSE))
+            new_children.append((child_id, LinkType.OPPOSE, child_text))
         except Exception as e:
             print(f"Failed to create oppose opinion for {oid}: {e}")
     # link OR children to parent
-    for child_id, ltype in new_children:
+    for child_id, ltype, _ in new_children:
         try:
             create_link(from_id=child_id, to_id=oid, link_type=ltype)
         except Exception as e:
@@ -141,16 +154,23 @@ def _create_and_groups(
     link_type: LinkType,
     creator: str = "ai",
 ):
-    """Create AND nodes for each group (group is list of statements)."""
-    and_ids = []
+    """Create AND nodes for each group (group is list of statements).
+
+    Returns a list of (son_id, content) for the newly created sons.
+    """
+    new_sons = []
     for group in groups:
-        if len(created_ids) >= max_nodes:
+        # 一组最多新建 len(group) 个子观点和 1 个与观点，超出预算则整组跳过
+        if len(created_ids) + len(group) + 1 > max_nodes:
             break
         try:
             son_ids = []
             for stmt in group:
+                num_created = len(created_ids)
                 sid = _ensure_or_create_opinion(stmt, debate_id, creator, created_ids)
                 son_ids.append(sid)
+                if len(created_ids) > num_created:
+                    new_sons.append((sid, stmt))
             and_id, _, _ = create_and_opinion(
                 parent_id=oid,
                 son_ids=son_ids,
@@ -159,12 +179,10 @@ def _create_and_groups(
                 debate_id=debate_id,
             )
             created_ids.append(and_id)
-            created_ids.extend(son_ids)
-            and_ids.append(and_id)
         except Exception as e:
             typ = "SUPPORT" if link_type == LinkType.SUPPORT else "OPPOSE"
             print(f"Failed to create {typ} AND for {oid}: {e}")
-    return and_ids
+    return new_sons
 
 
 def _score_leaves_and_patch(debate_id: str, root_opinion: str) -> Dict[str, Optional[float]]:
@@ -174,15 +192,13 @@ def _score_leaves_and_patch(debate_id: str, root_opinion: str) -> Dict[str, Opti
         return {}
 
     # Collect all leaf contents
-    leaf_contents = []
-    for lid in leaf_ids:
-        try:
-            opinfo = info_opinion(lid, debate_id)
-            content = opinfo.get('content', '')
-            leaf_contents.append((lid, content))
-        except Exception as e:
-            print(f"Failed to get info for leaf {lid}: {e}")
-            leaf_contents.append((lid, ''))
+    try:
+        infos = info_opinions(leaf_ids, debate_id, has_relationship=False)
+        contents = {str(info["id"]): info.get("content", "") for info in infos}
+    except Exception as e:
+        print(f"Failed to get info for leaves: {e}")
+        contents = {}
+    leaf_contents = [(lid, contents.get(lid, "")) for lid in leaf_ids]
 
     # Build prompt for batch scoring
     prompt_parts = [
@@ -234,11 +250,21 @@ def _score_leaves_and_patch(debate_id: str, root_opinion: str) -> Dict[str, Opti
     return scores
 
 
+def _ask_llm_for_children_safe(oid: str, content: str) -> dict | None:
+    """Ask LLM for children in a worker thread, returning None on failure."""
+    try:
+        return _ask_llm_for_children(content)
+    except Exception as e:
+        print(f"LLM call failed for opinion {oid}: {e}")
+        return None
+
+
 def ai_build_debate_from_opinion(
     root_content: str,
     max_nodes: int = 20,
     creator: str = "ai",
-    sleep_between_calls: float = 0.0,
+    on_progress: Callable[[dict], None] | None = None,
+    debate_id: str | None = None,
 ) -> str:
     """Use an LLM to iteratively build a debate graph from a single opinion.
 
@@ -248,116 +274,130 @@ def ai_build_debate_from_opinion(
 
     Behavior summary:
     1. Create a debate and a root OR opinion for `root_content`.
-    2. Repeatedly expand leaf opinions by asking the LLM to propose up to 3 supporting and 3 opposing short, testable statements.
-       The LLM may indicate a leaf "need not be debated" by returning empty lists or debate=false.
-    3. Stop when either all leaves are marked non-debatable, or total created opinions >= max_nodes.
+    2. Expand the opinions level by level (BFS). The LLM is asked for the children of all
+       opinions of a level concurrently, up to `LLM_MAX_CONCURRENCY` at a time, proposing up to
+       3 supporting and 3 opposing short, testable statements.
+       The LLM may indicate an opinion "need not be debated" by returning empty lists or debate=false.
+    3. Stop when no opinion of the next level remains, or total created opinions >= max_nodes.
+       Opinions are created sequentially, so the budget is never exceeded.
     4. For all leaf opinions, ask the LLM to provide a score in [0,1] and patch the opinion positive score.
 
     Notes:
     - llm_chat must return a plain string. Prefer returning JSON: {"supports":[], "opposes":[], "debate": true}.
     - The function is conservative: it creates OR opinions for each suggestion and links them to the parent.
+    - `on_progress` is called with a dict describing each stage, e.g.
+      {"stage": "expand", "level": 1, "created": 7, "max_nodes": 20, "frontier": 3}.
+      It may raise to abort the build.
+    - If `debate_id` is given, an interrupted build of that debate is resumed from its
+      current leaves, and its existing opinions count towards `max_nodes`. Leaves the
+      LLM marked debate=false are stored as `settled` and not expanded again.
+    - Only as many opinions of a level as the remaining budget can expand are sent
+      to the LLM.
     """
-    # 1. create debate
-    desp = root_content if len(root_content) <= 120 else root_content[:117] + "..."
-    root_opinion = _ask_llm_for_opinion(root_content)
-    debate_id = create_debate(title=root_opinion, creator=creator, description=desp)
 
-    created_ids: List[str] = []
+    def report(stage: str, **kwargs):
+        if on_progress is not None:
+            on_progress({"stage": stage, **kwargs})
+
+    # opinions of the current BFS level, with their contents
+    frontier: List[tuple[str, str]] = []
+
+    if debate_id is None:
+        # 1. create debate
+        desp = root_content if len(root_content) <= 120 else root_content[:117] + "..."
+        root_opinion = _ask_llm_for_opinion(root_content)
+        debate_id = create_debate(title=root_opinion, creator=creator, description=desp)
+        created_ids: List[str] = []
+    else:
+        # resume from the current leaves of the debate
+        debates = query_debate(debate_id=debate_id)
+        if not debates:
+            raise ValueError(f"Debate with ID {debate_id} does not exist.")
+        root_opinion = debates[0]["title"]
+        created_ids = membership_cache.members(debate_id)
+        if created_ids:
+            leaf_ids = head_opinion(debate_id, is_root=False)
+            if leaf_ids:
+                results, _ = db.cypher_query(UNSETTLED_QUERY, {"uids": leaf_ids})
+                leaf_ids = [row[0] for row in results]
+            frontier = [
+                (str(info["id"]), info.get("content") or "")
+                for info in info_opinions(leaf_ids, debate_id, has_relationship=False)
+            ]
 
     # 2. create root opinion
-    root_id = create_or_opinion(
-        content=root_opinion, creator=creator, debate_id=debate_id
-    )
-    created_ids.append(root_id)
-
-    # track which leaves should no longer be expanded
-    no_debate_set = set()
-
-    # BFS queue of leaf ids to consider
-    queue: List[str] = [root_id]
-
-    # Helper to get current leafs
-    def current_leafs() -> List[str]:
-        return head_opinion(debate_id, is_root=False)
-
-    # expansion loop
-    while queue and len(created_ids) < max_nodes:
-        oid = queue.pop(0)
-        if oid in no_debate_set:
-            continue
-        # ask LLM and use helper functions to create children
-        info = info_opinion(oid, debate_id)
-        content = info.get("content") or ""
-        if not content.strip():
-            no_debate_set.add(oid)
-            continue
-        try:
-            parsed = _ask_llm_for_children(content)
-        except Exception as e:
-            print(f"LLM call failed for opinion {oid}: {e}")
-            continue
-
-        supports = parsed.get("supports", [])
-        opposes = parsed.get("opposes", [])
-        supports_and = parsed.get("supports_and", [])
-        opposes_and = parsed.get("opposes_and", [])
-        should_debate = bool(parsed.get("debate", True))
-
-        if not should_debate or (
-            not supports and not opposes and not supports_and and not opposes_and
-        ):
-            no_debate_set.add(oid)
-            leaves = current_leafs()
-            if all(l in no_debate_set for l in leaves):
-                break
-            continue
-
-        # create OR children
-        new_children = _create_or_children(
-            oid,
-            supports,
-            opposes,
-            debate_id,
-            created_ids,
-            max_nodes,
-        )
-
-        # append new children to queue for further expansion
-        queue.extend([cid for cid, _ in new_children])
-
-        # create AND groups
-        new_children = _create_and_groups(
-            oid,
-            supports_and,
-            debate_id,
-            created_ids,
-            max_nodes,
-            LinkType.SUPPORT,
-        )
-
-        # append new children to queue for further expansion
-        queue.extend(new_children)
-
-        new_children = _create_and_groups(
-            oid,
-            opposes_and,
-            debate_id,
-            created_ids,
-            max_nodes,
-            LinkType.OPPOSE,
+    if not created_ids:
+        root_id = create_or_opinion(
+            content=root_opinion, creator=creator, debate_id=debate_id
         )
+        created_ids.append(root_id)
+        frontier = [(root_id, root_opinion)]
+    report("create", debate_id=debate_id, created=len(created_ids), max_nodes=max_nodes)
+
+    level = 0
+
+    with ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY) as executor:
+        while frontier and len(created_ids) < max_nodes:
+            frontier = [(oid, content) for oid, content in frontier if content.strip()]
+            # 每个展开的观点至少新建一个观点，超出剩余预算的观点不再询问LLM
+            frontier = frontier[: max_nodes - len(created_ids)]
+            # 同一层的LLM请求并发执行
+            parsed_list = list(
+                executor.map(lambda item: _ask_llm_for_children_safe(*item), frontier)
+            )
 
-        # append new children to queue for further expansion
-        queue.extend(new_children)
-
-        # small throttle
-        time.sleep(sleep_between_calls)
-
-        # refresh queue with current leaves if queue empty
-        if not queue:
-            queue = [l for l in current_leafs() if l not in no_debate_set]
+            # 按层内顺序依次创建观点，保证预算精确
+            next_frontier: List[tuple[str, str]] = []
+            settled_ids: List[str] = []
+            for (oid, _), parsed in zip(frontier, parsed_list):
+                if len(created_ids) >= max_nodes:
+                    break
+                if not parsed:
+                    continue
+                if not parsed.get("debate", True):
+                    settled_ids.append(oid)
+                    continue
+
+                new_children = _create_or_children(
+                    oid,
+                    parsed.get("supports", []),
+                    parsed.get("opposes", []),
+                    debate_id,
+                    created_ids,
+                    max_nodes,
+                )
+                next_frontier.extend((cid, content) for cid, _, content in new_children)
+                for groups, link_type in (
+                    (parsed.get("supports_and", []), LinkType.SUPPORT),
+                    (parsed.get("opposes_and", []), LinkType.OPPOSE),
+                ):
+                    next_frontier.extend(
+                        _create_and_groups(
+                            oid,
+                            groups,
+                            debate_id,
+                            created_ids,
+                            max_nodes,
+                            link_type,
+                        )
+                    )
+
+            if settled_ids:
+                db.cypher_query(SETTLE_QUERY, {"uids": settled_ids})
+
+            level += 1
+            frontier = next_frontier
+            report(
+                "expand",
+                level=level,
+                created=len(created_ids),
+                max_nodes=max_nodes,
+                frontier=len(frontier),
+            )
 
     # After expansion, score all leaf nodes via helper
+    report("score", created=len(created_ids), max_nodes=max_nodes)
     _score_leaves_and_patch(debate_id, root_opinion)
+    report("done", debate_id=debate_id, created=len(created_ids), max_nodes=max_nodes)
 
     return debate_id
@@ -1,12 +1,44 @@
+import jwt
 from fastapi_users.authentication import CookieTransport, AuthenticationBackend
 from fastapi_users.authentication import JWTStrategy
+from fastapi_users.jwt import decode_jwt
 from config import SECRET_KEY
+from .user_cache import user_cache
 
 cookie_transport = CookieTransport(cookie_max_age=3600)
 
 
+class CachedJWTStrategy(JWTStrategy):
+    """
+    A JWT strategy that looks up the user of a token in `user_cache` before
+    loading it from PostgreSQL.
+    """
+
+    async def read_token(self, token, user_manager):
+        if token is None:
+            return None
+        try:
+            data = decode_jwt(
+                token, self.decode_key, self.token_audience, algorithms=[self.algorithm]
+            )
+        except jwt.PyJWTError:
+            return None
+        user_id = data.get("sub")
+        if user_id is None:
+            return None
+
+        user = user_cache.get(user_id)
+        if user is not None:
+            return user
+        version = user_cache.version
+        user = await super().read_token(token, user_manager)
+        if user is not None:
+            user_cache.put(user_id, user, version)
+        return user
+
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=SECRET_KEY, lifetime_seconds=3600)
+    return CachedJWTStrategy(secret=SECRET_KEY, lifetime_seconds=3600)
 
 
 auth_backend = AuthenticationBackend(
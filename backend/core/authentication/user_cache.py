@@ -0,0 +1,131 @@
+import time
+import threading
+import asyncpg
+from collections import OrderedDict
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import make_transient_to_detached
+from schemas.db.psql import User
+from config_private import psql_config, USER_CACHE_SIZE, USER_CACHE_TTL
+
+# 其他进程（如权限脚本）修改用户后通过该频道通知服务进程
+USER_CHANGED_CHANNEL = "user_changed"
+
+
+class UserCache:
+    """
+    A short-lived cache of the users of authenticated requests, keyed by the
+    subject of their token, i.e. their ID.
+
+    Only column values are stored, and every hit builds a new detached User,
+    so requests never share an ORM object. The cache must be invalidated by
+    every change of a user; changes made by other processes arrive through
+    `USER_CHANGED_CHANNEL`, and the TTL bounds the staleness if one is missed.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次失效递增，避免失效前读取的旧用户被写入缓存
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, user_id: str) -> User | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            values = entry[1]
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
+    def put(self, user_id: str, user: User, version: int):
+        """
+        Cache a user loaded while the cache was at `version`.
+        """
+        values = {
+            attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs
+        }
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[user_id] = (time.monotonic() + self.ttl, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str | None = None):
+        """
+        Drop a user from the cache, or the whole cache if no user is given.
+        """
+        with self._lock:
+            self._version += 1
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(user_id), None)
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+def notify_user_changed(session, user_id) -> None:
+    """
+    Tell the service processes that a user changed, from another process.
+
+    The notification is sent when the transaction of `session` commits.
+    """
+    session.execute(
+        text("SELECT pg_notify(:channel, :user_id)"),
+        {"channel": USER_CHANGED_CHANNEL, "user_id": str(user_id)},
+    )
+
+
+_listener: asyncpg.Connection | None = None
+
+
+def _on_user_changed(connection, pid, channel, payload):
+    user_cache.invalidate(payload or None)
+
+
+def _on_listener_lost(connection):
+    # 收不到通知时清空缓存，此后的修改最多延迟一个 TTL 生效
+    user_cache.invalidate()
+    print("⚠️ Lost the user change listener, cached users expire by TTL only")
+
+
+async def start_user_listener():
+    """
+    Listen on `USER_CHANGED_CHANNEL` with a dedicated connection.
+    """
+    global _listener
+    _listener = await asyncpg.connect(
+        user=psql_config["user"],
+        password=psql_config["password"],
+        host=psql_config["host"],
+        port=psql_config["port"],
+        database=psql_config["dbname"],
+    )
+    await _listener.add_listener(USER_CHANGED_CHANNEL, _on_user_changed)
+    _listener.add_termination_listener(_on_listener_lost)
+
+
+async def stop_user_listener():
+    global _listener
+    if _listener is not None:
+        _listener.remove_termination_listener(_on_listener_lost)
+        await _listener.close()
+        _listener = None
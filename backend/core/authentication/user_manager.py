@@ -5,6 +5,7 @@ from fastapi import Depends, Request
 from fastapi_users import BaseUserManager, UUIDIDMixin, FastAPIUsers
 from ..db_life import User, get_user_db
 from .backend import auth_backend
+from .user_cache import user_cache
 from config import SECRET_KEY
 
 
@@ -15,6 +16,14 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     async def on_after_register(self, user: User, request: Optional[Request] = None):
         print(f"User {user.id} has registered.")
 
+    async def on_after_update(
+        self, user: User, update_dict: dict, request: Optional[Request] = None
+    ):
+        user_cache.invalidate(str(user.id))
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        user_cache.invalidate(str(user.id))
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
@@ -0,0 +1,281 @@
+import time
+import uuid
+import logging
+from neomodel import db
+from sqlalchemy import insert, delete
+from core.db_life import get_psql_session
+from core.debate import get_global_debate
+from core.update_score.recompute import recompute_scores
+from schemas.db.psql import (
+    Debate as DebatePsql,
+    Opinion as OpinionPsql,
+    WriteOutbox,
+    debate_opinion_association,
+)
+from schemas.opinion import LogicType
+from .utils.debate_code import parse_link
+from .utils.reachability import reserve_topo_orders
+from .utils.membership import membership_cache
+from .utils.embedding import get_opinion_index
+from .utils.debate_version import bump_versions_in
+
+logger = logging.getLogger("opendebate.bulk_import")
+
+NEO4J_BATCH_SIZE = 5000
+
+CREATE_NODES_QUERY = """
+UNWIND $rows AS row
+CREATE (n:Opinion {
+  uid: row.uid, content: row.content, host: row.host,
+  logic_type: row.logic_type, node_type: row.node_type,
+  intermediate: false, topo_order: row.topo_order,
+  positive_score: row.positive_score
+})
+"""
+
+# 关系类型无法参数化，按类型分别创建
+CREATE_LINKS_QUERY = """
+UNWIND $rows AS row
+MATCH (a:Opinion {{uid: row.from_id}}), (b:Opinion {{uid: row.to_id}})
+CREATE (a)-[:{link_type} {{uid: row.uid}}]->(b)
+"""
+
+DELETE_NODES_QUERY = """
+UNWIND $uids AS uid
+MATCH (n:Opinion {uid: uid})
+DETACH DELETE n
+"""
+
+
+def _build_graph(
+    opinions: list[dict], links: list[str], host: str
+) -> tuple[list[dict], list[tuple[int, int, str]], dict[str, int]]:
+    """
+    Turn parsed debate code into nodes and links between node indices.
+
+    AND links get an extra AND node between their sources and their target.
+    """
+    nodes = []
+    index = {}
+    for opinion in opinions:
+        key = opinion["id"]
+        if key in index:
+            raise ValueError(f"Opinion {key} is defined more than once.")
+        if not opinion.get("content"):
+            raise ValueError(f"Opinion {key} has no content.")
+        score = opinion.get("score")
+        if score is not None and not 0 <= score <= 1:
+            raise ValueError(f"Score of opinion {key} must be between 0 and 1.")
+        index[key] = len(nodes)
+        nodes.append(
+            {
+                "uid": str(uuid.uuid4()),
+                "content": opinion["content"],
+                "host": host,
+                "logic_type": LogicType.OR.value,
+                "node_type": "solid",
+                "positive_score": score,
+            }
+        )
+
+    edges: dict[tuple[int, int], str] = {}
+
+    def add_edge(from_idx: int, to_idx: int, link_type: str):
+        if from_idx == to_idx:
+            raise ValueError("Cannot create a link from a node to itself.")
+        old_type = edges.setdefault((from_idx, to_idx), link_type)
+        if old_type != link_type:
+            raise ValueError("Two opinions cannot both support and oppose each other.")
+
+    for link in links:
+        from_keys, to_key, link_type, is_and = parse_link(link)
+        for key in from_keys + [to_key]:
+            if key not in index:
+                raise ValueError(f"Opinion {key} in link '{link}' is not defined.")
+        if is_and:
+            and_idx = len(nodes)
+            nodes.append(
+                {
+                    "uid": str(uuid.uuid4()),
+                    "content": "与" if link_type == "supports" else "与非",
+                    "host": host,
+                    "logic_type": LogicType.AND.value,
+                    "node_type": "empty",
+                    "positive_score": None,
+                }
+            )
+            for key in from_keys:
+                add_edge(index[key], and_idx, "supports")
+            add_edge(and_idx, index[to_key], link_type)
+        else:
+            for key in from_keys:
+                add_edge(index[key], index[to_key], link_type)
+
+    return nodes, [(f, t, link_type) for (f, t), link_type in edges.items()], index
+
+
+def _topological_order(num_nodes: int, edges: list[tuple[int, int, str]]) -> list[int]:
+    """
+    Order the nodes so that every son comes before its parents.
+
+    Raises:
+        ValueError: If the links contain a cycle.
+    """
+    parents: list[list[int]] = [[] for _ in range(num_nodes)]
+    in_degree = [0] * num_nodes
+    for from_idx, to_idx, _ in edges:
+        parents[from_idx].append(to_idx)
+        in_degree[to_idx] += 1
+    order = [i for i in range(num_nodes) if in_degree[i] == 0]
+    for i in order:  # order grows while iterating
+        for parent in parents[i]:
+            in_degree[parent] -= 1
+            if in_degree[parent] == 0:
+                order.append(parent)
+    if len(order) != num_nodes:
+        raise ValueError("The imported links contain a cycle.")
+    return order
+
+
+def import_debate(
+    title: str,
+    creator: str,
+    opinions: list[dict],
+    links: list[str],
+    description: str | None = None,
+    host: str = "local",
+) -> dict:
+    """
+    Create a debate with all its opinions and links in bulk.
+
+    The graph is validated in memory first, then the PostgreSQL rows are
+    inserted in one transaction together with their outbox entries, the Neo4j
+    nodes and links are created with UNWIND, and the scores are computed once
+    at the end before the outbox entries are removed. If the process stops
+    in between, `reconcile_outbox` keeps or removes each opinion.
+
+    :param title: The title of the debate.
+    :param creator: The creator of the debate and its opinions.
+    :param opinions: Opinions as returned by `parse_debate_code`, i.e. dicts with
+        "id" and "content", and an optional initial positive "score".
+    :param links: Links in debate code, e.g. "a1->a2", "a1->!a2", "a1|a2->a3" or "a1&a2->a3".
+    :param description: The description of the debate.
+    :param host: The host of the opinions.
+    :return: The debate ID, the opinion ID of every key and statistics of the import.
+    """
+    start_time = time.perf_counter()
+    nodes, edges, index = _build_graph(opinions, links, host)
+    order = _topological_order(len(nodes), edges)
+    base = reserve_topo_orders(len(nodes)) if nodes else 0.0
+    for rank, i in enumerate(order):
+        nodes[i]["topo_order"] = base + rank
+
+    # PostgreSQL：辩论、观点、关联行与发件箱行在一个事务中批量插入
+    debate_id = uuid.uuid4()
+    debate_ids = [debate_id]
+    global_debate_id = get_global_debate()
+    if global_debate_id:
+        debate_ids.append(uuid.UUID(global_debate_id))
+    with get_psql_session() as psql_session:
+        try:
+            psql_session.add(
+                DebatePsql(
+                    id=debate_id, title=title, creator=creator, description=description
+                )
+            )
+            psql_session.flush()
+            if nodes:
+                psql_session.execute(
+                    insert(OpinionPsql),
+                    [{"id": uuid.UUID(node["uid"]), "creator": creator} for node in nodes],
+                )
+                psql_session.execute(
+                    insert(WriteOutbox),
+                    [
+                        {"opinion_id": uuid.UUID(node["uid"]), "operation": "create"}
+                        for node in nodes
+                    ],
+                )
+                psql_session.execute(
+                    insert(debate_opinion_association),
+                    [
+                        {"debate_id": d, "opinion_id": uuid.UUID(node["uid"])}
+                        for node in nodes
+                        for d in debate_ids
+                    ],
+                )
+            psql_session.commit()
+        except Exception as e:
+            psql_session.rollback()
+            raise RuntimeError(f"Failed to import debate into PostgreSQL: {str(e)}")
+    for d in debate_ids:
+        membership_cache.add(d, [node["uid"] for node in nodes])
+    psql_time = time.perf_counter()
+
+    # Neo4j：节点与边按批次 UNWIND 创建
+    uids = [node["uid"] for node in nodes]
+    try:
+        for begin in range(0, len(nodes), NEO4J_BATCH_SIZE):
+            db.cypher_query(
+                CREATE_NODES_QUERY, {"rows": nodes[begin : begin + NEO4J_BATCH_SIZE]}
+            )
+        for link_type in ("supports", "opposes"):
+            rows = [
+                {"from_id": uids[f], "to_id": uids[t], "uid": uuid.uuid4().hex}
+                for f, t, lt in edges
+                if lt == link_type
+            ]
+            query = CREATE_LINKS_QUERY.format(link_type=link_type)
+            for begin in range(0, len(rows), NEO4J_BATCH_SIZE):
+                db.cypher_query(query, {"rows": rows[begin : begin + NEO4J_BATCH_SIZE]})
+    except Exception as e:
+        # 回滚已写入的数据，避免两库不一致
+        try:
+            db.cypher_query(DELETE_NODES_QUERY, {"uids": uids})
+            with get_psql_session() as psql_session:
+                bump_versions_in(psql_session, opinion_ids=uids)
+                psql_session.execute(
+                    delete(OpinionPsql).where(
+                        OpinionPsql.id.in_([uuid.UUID(uid) for uid in uids])
+                    )
+                )
+                psql_session.execute(delete(DebatePsql).where(DebatePsql.id == debate_id))
+                psql_session.commit()
+            membership_cache.discard_everywhere(uids)
+        except Exception as cleanup_error:
+            # 残留的发件箱行由 reconcile_outbox 处理
+            logger.error(f"Failed to clean up the failed import: {cleanup_error}")
+        raise RuntimeError(f"Failed to import debate into Neo4j: {str(e)}")
+    get_opinion_index().upsert(
+        [
+            (node["uid"], node["content"])
+            for node in nodes
+            if node["logic_type"] == LogicType.OR.value
+        ]
+    )
+    neo4j_time = time.perf_counter()
+
+    # 新图与已有观点不相连，只需重算本辩论一次
+    score_stats = recompute_scores(str(debate_id))
+    try:
+        with get_psql_session() as psql_session:
+            psql_session.execute(
+                delete(WriteOutbox).where(
+                    WriteOutbox.opinion_id.in_([uuid.UUID(uid) for uid in uids])
+                )
+            )
+            psql_session.commit()
+    except Exception as e:
+        logger.error(f"Failed to complete outbox entries of debate {debate_id}: {e}")
+    end_time = time.perf_counter()
+
+    return {
+        "debate_id": str(debate_id),
+        "id_map": {key: uids[i] for key, i in index.items()},
+        "nodes": len(nodes),
+        "links": len(edges),
+        "psql_seconds": round(psql_time - start_time, 3),
+        "neo4j_seconds": round(neo4j_time - psql_time, 3),
+        "score_seconds": round(end_time - neo4j_time, 3),
+        "updated": score_stats["updated"],
+    }
@@ -1,38 +1,102 @@
-from neomodel import config
-from contextlib import contextmanager
+import time
+from neo4j import GraphDatabase, AsyncGraphDatabase, RoutingControl, basic_auth
+from neomodel import db
+from contextlib import contextmanager, asynccontextmanager
 from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from fastapi_users.db import SQLAlchemyUserDatabase
 from fastapi import Depends
-from config_private import NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, psql_config
+from config_private import (
+    NEO4J_URI,
+    NEO4J_USER,
+    NEO4J_PASSWORD,
+    NEO4J_MAX_CONNECTION_POOL_SIZE,
+    NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+    NEO4J_MAX_CONNECTION_LIFETIME,
+    NEO4J_LIVENESS_CHECK_TIMEOUT,
+    psql_config,
+    PSQL_POOL_SIZE,
+    PSQL_MAX_OVERFLOW,
+    PSQL_POOL_TIMEOUT,
+    PSQL_POOL_RECYCLE,
+    PSQL_POOL_PRE_PING,
+)
 from schemas.db.psql import DbBase, User
 from collections.abc import AsyncGenerator
+from core.utils.metrics import (
+    neo4j_metrics,
+    psql_metrics,
+    psql_async_metrics,
+    timed_pool,
+    instrument_engine,
+    instrument_cypher_query,
+)
+from core.utils.tracing import record_psql_session
 
+neo4j_async_driver = None
+psql_engine = None
+psql_async_engine = None
 psql_sessioner = None
 psql_async_sessioner = None
 
 
+def _pool_options() -> dict:
+    return {
+        "pool_size": PSQL_POOL_SIZE,
+        "max_overflow": PSQL_MAX_OVERFLOW,
+        "pool_timeout": PSQL_POOL_TIMEOUT,
+        "pool_recycle": PSQL_POOL_RECYCLE,
+        "pool_pre_ping": PSQL_POOL_PRE_PING,
+    }
+
+
+def _neo4j_options() -> dict:
+    return {
+        "auth": basic_auth(NEO4J_USER, NEO4J_PASSWORD),
+        "max_connection_pool_size": NEO4J_MAX_CONNECTION_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_CONNECTION_ACQUISITION_TIMEOUT,
+        "max_connection_lifetime": NEO4J_MAX_CONNECTION_LIFETIME,
+        "liveness_check_timeout": NEO4J_LIVENESS_CHECK_TIMEOUT,
+        "keep_alive": True,
+    }
+
+
 def init_db():
-    # Configure Neomodel
-    config.DATABASE_URL = (
-        f"bolt://{NEO4J_USER}:{NEO4J_PASSWORD}@{NEO4J_URI}"
+    # Configure Neomodel with a driver whose connection pool we tune ourselves
+    driver = GraphDatabase.driver(f"bolt://{NEO4J_URI}", **_neo4j_options())
+    db.set_connection(driver=driver)
+    instrument_cypher_query(db)
+
+    # Initialize the async Neo4j driver for the read paths of async endpoints
+    global neo4j_async_driver
+    neo4j_async_driver = AsyncGraphDatabase.driver(
+        f"bolt://{NEO4J_URI}", **_neo4j_options()
     )
 
     # Initialize PostgreSQL synchronous sessioner
-    global psql_sessioner
+    global psql_engine, psql_sessioner
     engine = create_engine(
-        f'postgresql://{psql_config["user"]}:{psql_config["password"]}@{psql_config["host"]}:{psql_config["port"]}/{psql_config["dbname"]}'
+        f'postgresql://{psql_config["user"]}:{psql_config["password"]}@{psql_config["host"]}:{psql_config["port"]}/{psql_config["dbname"]}',
+        poolclass=timed_pool(QueuePool, psql_metrics),
+        **_pool_options(),
     )
+    instrument_engine(engine, psql_metrics)
+    psql_engine = engine
     DbBase.metadata.create_all(engine)
     psql_session_factory = sessionmaker(bind=engine)
     psql_sessioner = scoped_session(psql_session_factory)
 
     # Initialize async sessioner for authentication
-    global psql_async_sessioner
+    global psql_async_engine, psql_async_sessioner
     async_engine = create_async_engine(
         f'postgresql+asyncpg://{psql_config["user"]}:{psql_config["password"]}@{psql_config["host"]}:{psql_config["port"]}/{psql_config["dbname"]}',
+        poolclass=timed_pool(AsyncAdaptedQueuePool, psql_async_metrics),
+        **_pool_options(),
     )
+    instrument_engine(async_engine.sync_engine, psql_async_metrics)
+    psql_async_engine = async_engine
     # Use async_sessionmaker for AsyncEngine
     psql_async_sessioner = async_sessionmaker(
         bind=async_engine,
@@ -45,6 +109,53 @@ def close_db():
     if psql_sessioner:
         psql_sessioner.remove()
         psql_sessioner = None
+    db.close_connection()
+
+
+async def close_db_async():
+    """
+    Close the async Neo4j driver and the async PostgreSQL engine.
+    """
+    global neo4j_async_driver, psql_async_engine, psql_async_sessioner
+    if neo4j_async_driver:
+        await neo4j_async_driver.close()
+        neo4j_async_driver = None
+    if psql_async_engine:
+        await psql_async_engine.dispose()
+        psql_async_engine = None
+        psql_async_sessioner = None
+
+
+def _pool_status(engine) -> dict | None:
+    if engine is None:
+        return None
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": PSQL_MAX_OVERFLOW,
+    }
+
+
+def get_db_metrics() -> dict:
+    """
+    Get the connection pool status, connection wait times and query counts of each store.
+
+    The Neo4j drivers do not expose their pools, so `active_queries` stands in
+    for their checked-out connections and the wait time is part of the query
+    time. Queries of the sync and the async driver are counted together.
+    """
+    neo4j = neo4j_metrics.snapshot()
+    neo4j["pool"] = {"max_size": NEO4J_MAX_CONNECTION_POOL_SIZE}
+    psql = psql_metrics.snapshot()
+    psql["pool"] = _pool_status(psql_engine)
+    psql_async = psql_async_metrics.snapshot()
+    psql_async["pool"] = _pool_status(
+        psql_async_engine.sync_engine if psql_async_engine else None
+    )
+    return {"neo4j": neo4j, "psql": psql, "psql_async": psql_async}
 
 
 @contextmanager
@@ -57,12 +168,27 @@ def get_psql_session():
     if not psql_sessioner:
         raise RuntimeError("PostgreSQL session not initialized")
     session = psql_sessioner()
+    record_psql_session()
     try:
         yield session
     finally:
         session.close()
 
 
+@asynccontextmanager
+async def async_psql_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Provides an async session for database operations in the event loop.
+    Use this function within an async context manager to ensure proper cleanup.
+    """
+    global psql_async_sessioner
+    if not psql_async_sessioner:
+        raise RuntimeError("PostgreSQL async session not initialized")
+    record_psql_session()
+    async with psql_async_sessioner() as session:
+        yield session
+
+
 async def get_async_psql_session() -> AsyncGenerator[AsyncSession, None]:
     global psql_async_sessioner
     if not psql_async_sessioner:
@@ -71,5 +197,28 @@ async def get_async_psql_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def cypher_query_async(
+    query: str, params: dict | None = None
+) -> tuple[list[list], list[str]]:
+    """
+    Run a read-only Cypher query with the async Neo4j driver.
+
+    :param query: The Cypher query.
+    :param params: The parameters of the query.
+    :return: The rows as lists and the column names, like `db.cypher_query`.
+    """
+    if not neo4j_async_driver:
+        raise RuntimeError("Neo4j async driver not initialized")
+    start = time.perf_counter()
+    neo4j_metrics.begin_query()
+    try:
+        records, _, keys = await neo4j_async_driver.execute_query(
+            query, params or {}, routing_=RoutingControl.READ
+        )
+    finally:
+        neo4j_metrics.end_query(time.perf_counter() - start)
+    return [list(record.values()) for record in records], keys
+
+
 async def get_user_db(session: AsyncSession = Depends(get_async_psql_session)):
     yield SQLAlchemyUserDatabase(session, User)
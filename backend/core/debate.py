@@ -1,6 +1,21 @@
+import logging
 import datetime
-from core.db_life import get_psql_session
-from schemas.db.psql import Debate, Opinion, model2dict
+from typing import Callable
+from neomodel import db
+from sqlalchemy import select, delete, insert, exists
+from core.db_life import get_psql_session, async_psql_session
+from schemas.db.psql import (
+    Debate,
+    Opinion,
+    PruneOutbox,
+    debate_opinion_association,
+    model2dict,
+)
+from core.utils.membership import membership_cache
+from core.utils.embedding import get_opinion_index
+from core.utils.debate_version import bump_versions
+
+logger = logging.getLogger("opendebate.debate")
 
 _global_debate_cache: str | None = None
 
@@ -21,27 +36,122 @@ def create_debate(title: str, creator: str, description: str | None = None) -> s
         raise RuntimeError(f"Failed to create debate: {str(e)}")
 
 
-def delete_debate(debate_id: str):
+def _orphans_query(debate_id: str, global_debate_id: str | None):
+    """
+    Select the opinions of a debate cited by no other debate but the global one,
+    as an anti-join on the association table.
+    """
+    own = debate_opinion_association.alias("own")
+    other = debate_opinion_association.alias("other")
+    kept_debates = [debate_id] + ([global_debate_id] if global_debate_id else [])
+    return (
+        select(own.c.opinion_id)
+        .where(own.c.debate_id == debate_id)
+        .where(
+            ~exists().where(
+                other.c.opinion_id == own.c.opinion_id,
+                other.c.debate_id.not_in(kept_debates),
+            )
+        )
+    )
+
+
+def delete_debate(
+    debate_id: str,
+    delete_orphans: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+) -> dict:
     """
     Delete a debate by its ID.
+
+    With `delete_orphans`, the opinions cited by no other debate but the global
+    one are deleted too: their PostgreSQL rows in the same transaction as the
+    debate, their Neo4j nodes and links in batches, and the scores of the
+    surviving neighbors are repaired once at the end. The deletion is recorded
+    in the prune outbox, so `reconcile_outbox` finishes it if interrupted.
+
+    :param debate_id: The ID of the debate to delete.
+    :param delete_orphans: Whether to delete the opinions only this debate cites.
+    :param progress: Optional callback receiving the numbers of deleted and all
+        orphans after each batch.
+    :return: The numbers of deleted orphans and of opinions with repaired scores.
     """
     # Cant delete the global debate
-    if debate_id == get_global_debate():
+    global_debate_id = get_global_debate()
+    if debate_id == global_debate_id:
         raise ValueError("Cannot delete the global debate.")
 
+    # core.utils.unit_of_work 依赖本模块，在此导入以避免循环导入
+    from core.utils.unit_of_work import prune_rows, finish_prune
+
+    orphan_ids = []
     with get_psql_session() as psql_session:
         debate_to_delete = (
             psql_session.query(Debate).filter(Debate.id == debate_id).first()
         )
-        if debate_to_delete:
-            try:
-                psql_session.delete(debate_to_delete)
-                psql_session.commit()
-            except Exception as e:
-                psql_session.rollback()
-                raise RuntimeError(f"Failed to delete debate: {str(e)}")
-        else:
+        if not debate_to_delete:
             raise ValueError(f"Debate with ID {debate_id} does not exist.")
+        try:
+            if delete_orphans:
+                result = psql_session.execute(
+                    delete(Opinion)
+                    .where(Opinion.id.in_(_orphans_query(debate_id, global_debate_id)))
+                    .returning(Opinion.id)
+                )
+                orphan_ids = [str(row[0]) for row in result]
+                # 记录待删除的 Neo4j 节点，中断后由 reconcile_outbox 继续
+                if orphan_ids:
+                    psql_session.execute(insert(PruneOutbox), prune_rows(orphan_ids))
+            psql_session.delete(debate_to_delete)
+            psql_session.commit()
+        except Exception as e:
+            psql_session.rollback()
+            raise RuntimeError(f"Failed to delete debate: {str(e)}")
+    membership_cache.invalidate(debate_id)
+    if not orphan_ids:
+        return {"orphans": 0, "updated": 0}
+    membership_cache.discard_everywhere(orphan_ids)
+    get_opinion_index().remove(orphan_ids)
+
+    def report(done: int, total: int):
+        logger.info(f"Deleted {done}/{total} orphans of debate {debate_id}")
+        if progress:
+            progress(done, total)
+
+    # Neo4j：按批次删除孤立观点及其链，所有批次完成后只修复一次分数
+    try:
+        updated_nodes = finish_prune(orphan_ids, report)
+    except Exception as e:
+        raise RuntimeError(
+            f"Failed to delete orphans of debate {debate_id} in Neo4j: {str(e)}"
+        )
+    return {"orphans": len(orphan_ids), "updated": len(updated_nodes)}
+
+
+def _debate_statement(
+    title: str | None,
+    description: str | None,
+    creator: str | None,
+    start_timestamp: int | None,
+    end_timestamp: int | None,
+    debate_id: str | None,
+):
+    statement = select(Debate)
+    if debate_id:
+        return statement.where(Debate.id == debate_id)
+    if title:
+        statement = statement.where(Debate.title.ilike(f"%{title}%"))
+    if description:
+        statement = statement.where(Debate.description.ilike(f"%{description}%"))
+    if creator:
+        statement = statement.where(Debate.creator.ilike(f"%{creator}%"))
+    if start_timestamp:
+        dt_start = datetime.datetime.fromtimestamp(start_timestamp / 1000)
+        statement = statement.where(Debate.created_at >= dt_start)
+    if end_timestamp:
+        dt_end = datetime.datetime.fromtimestamp(end_timestamp / 1000)
+        statement = statement.where(Debate.created_at <= dt_end)
+    return statement
 
 
 def query_debate(
@@ -55,28 +165,29 @@ def query_debate(
     """
     Query debates based on various parameters.
     """
+    statement = _debate_statement(
+        title, description, creator, start_timestamp, end_timestamp, debate_id
+    )
     with get_psql_session() as psql_session:
-        query = psql_session.query(Debate)
+        return [model2dict(debate) for debate in psql_session.scalars(statement)]
 
-    if debate_id:
-        query = query.filter(Debate.id == debate_id)
-    else:
-        if title:
-            query = query.filter(Debate.title.ilike(f"%{title}%"))
-        if description:
-            query = query.filter(Debate.description.ilike(f"%{description}%"))
-        if creator:
-            query = query.filter(Debate.creator.ilike(f"%{creator}%"))
-        if start_timestamp:
-            dt_start = datetime.datetime.fromtimestamp(start_timestamp / 1000)
-            query = query.filter(Debate.created_at >= dt_start)
-        if end_timestamp:
-            dt_end = datetime.datetime.fromtimestamp(end_timestamp / 1000)
-            query = query.filter(Debate.created_at <= dt_end)
-
-    results = query.all()
-
-    return [model2dict(debate) for debate in results]
+
+async def query_debate_async(
+    title: str | None = None,
+    description: str | None = None,
+    creator: str | None = None,
+    start_timestamp: int | None = None,
+    end_timestamp: int | None = None,
+    debate_id: str | None = None,
+) -> list[dict]:
+    """
+    Async version of `query_debate`.
+    """
+    statement = _debate_statement(
+        title, description, creator, start_timestamp, end_timestamp, debate_id
+    )
+    async with async_psql_session() as psql_session:
+        return [model2dict(debate) for debate in await psql_session.scalars(statement)]
 
 
 def patch_debate(
@@ -134,6 +245,8 @@ def cited_in_debate(debate_id: str, opinion_id: str):
             except Exception as e:
                 psql_session.rollback()
                 raise RuntimeError(f"Failed to cite opinion: {str(e)}")
+            membership_cache.add(debate_id, [opinion_id])
+            bump_versions(debate_ids=[debate_id])
         else:
             raise ValueError("Opinion is already cited in this debate.")
 
@@ -150,3 +263,73 @@ def get_global_debate() -> str | None:
         debate = session.query(Debate).filter(Debate.is_all == True).first()
         _global_debate_cache = str(debate.id) if debate else None
     return _global_debate_cache
+
+
+async def get_global_debate_async() -> str | None:
+    """
+    Async version of `get_global_debate`, sharing its cache.
+    """
+    global _global_debate_cache
+    if _global_debate_cache is not None:
+        return _global_debate_cache
+
+    async with async_psql_session() as session:
+        debate_id = await session.scalar(select(Debate.id).where(Debate.is_all == True))
+        _global_debate_cache = str(debate_id) if debate_id else None
+    return _global_debate_cache
+
+
+# 返回节点的所有出边，另一端不在辩论内的边由调用方过滤
+GRAPH_QUERY = """
+MATCH (n:Opinion)
+WHERE $uids IS NULL OR n.uid IN $uids
+OPTIONAL MATCH (n)-[r:supports|opposes]->(m:Opinion)
+RETURN n.uid, n.content, n.logic_type, n.node_type,
+       n.positive_score, n.negative_score,
+       collect(CASE WHEN r IS NULL THEN NULL ELSE [m.uid, type(r), r.uid] END)
+ORDER BY n.uid
+"""
+
+
+def graph_debate(debate_id: str) -> dict:
+    """
+    Get all opinions, scores and links of a debate as a columnar snapshot.
+
+    Nodes are stored in parallel arrays, and links refer to nodes by their
+    index in these arrays.
+    """
+    with get_psql_session() as psql_session:
+        debate = psql_session.query(Debate).filter(Debate.id == debate_id).first()
+        if not debate:
+            raise ValueError(f"Debate with ID {debate_id} does not exist.")
+        is_all = debate.is_all
+    uids = None if is_all else membership_cache.members(debate_id)
+
+    try:
+        results, _ = db.cypher_query(GRAPH_QUERY, {"uids": uids})
+    except Exception as e:
+        raise RuntimeError(f"Failed to retrieve debate graph from Neo4j: {str(e)}")
+
+    index = {row[0]: i for i, row in enumerate(results)}
+    links = sorted(
+        (i, index[to_id], link_type, link_id)
+        for i, row in enumerate(results)
+        for to_id, link_type, link_id in filter(None, row[6])
+        if to_id in index
+    )
+    return {
+        "uids": [row[0] for row in results],
+        "contents": [row[1] for row in results],
+        "logic_types": [row[2] for row in results],
+        "node_types": [row[3] for row in results],
+        "positive_scores": [
+            round(row[4], 2) if row[4] is not None else None for row in results
+        ],
+        "negative_scores": [
+            round(row[5], 2) if row[5] is not None else None for row in results
+        ],
+        "link_from": [link[0] for link in links],
+        "link_to": [link[1] for link in links],
+        "link_types": [link[2] for link in links],
+        "link_uids": [link[3] for link in links],
+    }
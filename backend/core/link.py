@@ -1,9 +1,12 @@
 from neomodel import db
+from core.db_life import cypher_query_async
 from core.opinion import create_or_opinion, create_and_opinion
 from schemas.db.neo4j import Opinion as OpinionNeo4j
 from schemas.link import LinkType
 from . import update_score
 from .utils.llm import is_OR_link_reasonable, llm_score
+from .utils.reachability import ensure_link_order
+from .utils.debate_version import bump_versions
 
 
 def create_link(
@@ -22,18 +25,8 @@ def create_link(
     :return: Link ID, and a dictionary of updated node IDs with their new scores.
     """
     try:
-        if from_id == to_id:
-            raise ValueError("Cannot create a link from a node to itself.")
-        # 检查是否会形成环
-        # 检查从to_id是否可达from_id，如果可达则加边会成环
-        cycle_query = """
-        MATCH (start:Opinion {uid: $to_id}), (end:Opinion {uid: $from_id})
-        MATCH path = shortestPath((start)-[:supports|opposes*1..100]->(end))
-        RETURN COUNT(path) > 0 AS has_cycle
-        """
-        results, _ = db.cypher_query(cycle_query, {"from_id": from_id, "to_id": to_id})
-        if results and results[0][0]:
-            raise ValueError("Adding this link would create a cycle in the graph.")
+        # 检查是否会形成环，并维护拓扑序
+        ensure_link_order(from_id, to_id)
 
         from_opinion = OpinionNeo4j.nodes.get(uid=from_id)
         to_opinion = OpinionNeo4j.nodes.get(uid=to_id)
@@ -48,14 +41,14 @@ def create_link(
             if not from_opinion.supports.is_connected(to_opinion):
                 relationship = from_opinion.supports.connect(to_opinion)
                 link_id = relationship.uid
-                update_score.update_node_score_positively_from(from_id, updated_nodes)
+                update_score.propagate_scores([from_id], updated_nodes)
             else:
                 link_id = from_opinion.supports.relationship(to_opinion).uid
         elif link_type == LinkType.OPPOSE:
             if not from_opinion.opposes.is_connected(to_opinion):
                 relationship = from_opinion.opposes.connect(to_opinion)
                 link_id = relationship.uid
-                update_score.update_node_score_positively_from(from_id, updated_nodes)
+                update_score.propagate_scores([from_id], updated_nodes)
             else:
                 link_id = from_opinion.opposes.relationship(to_opinion).uid
         else:
@@ -83,16 +76,11 @@ def delete_link_by_info(
 
         if link_info["link_type"] == LinkType.SUPPORT.value:
             from_opinion.supports.disconnect(to_opinion)
-            update_score.update_node_score_positively_recursively(
-                link_info["to_id"], {"positive": None}, updated_nodes
-            )
         elif link_info["link_type"] == LinkType.OPPOSE.value:
             from_opinion.opposes.disconnect(to_opinion)
-            update_score.update_node_score_positively_recursively(
-                link_info["to_id"], {"negative": None}, updated_nodes
-            )
-        update_score.update_node_score_negatively_recursively(
-            link_info["from_id"], updated_nodes=updated_nodes, new_score=None
+        # The parent loses a son and the son loses a parent
+        update_score.propagate_scores(
+            [link_info["from_id"], link_info["to_id"]], updated_nodes
         )
         return updated_nodes
     except Exception as e:
@@ -114,6 +102,24 @@ def delete_link(link_id: str) -> dict[str, dict[str, float | None]]:
     return updated_nodes
 
 
+INFO_LINK_QUERY = """
+MATCH (from:Opinion)-[r]->(to:Opinion)
+WHERE r.uid = $uid
+RETURN from.uid, to.uid, type(r)
+"""
+
+
+def _link_info(results: list) -> dict[str, str]:
+    if not results:
+        raise ValueError("Link not found")
+    from_id, to_id, link_type = results[0]
+    return {
+        "from_id": from_id,
+        "to_id": to_id,
+        "link_type": link_type,
+    }
+
+
 def info_link(link_id: str) -> dict[str, str]:
     """
     Get information about a link in the Neo4j database.
@@ -122,21 +128,19 @@ def info_link(link_id: str) -> dict[str, str]:
     :return: A dictionary containing link information.
     """
     try:
-        query = """
-        MATCH (from:Opinion)-[r]->(to:Opinion)
-        WHERE r.uid = $uid
-        RETURN from.uid, to.uid, type(r)
-        """
-        results, _ = db.cypher_query(query, {"uid": link_id})
-        if not results:
-            raise ValueError("Link not found")
+        results, _ = db.cypher_query(INFO_LINK_QUERY, {"uid": link_id})
+        return _link_info(results)
+    except Exception as e:
+        raise RuntimeError(f"Failed to retrieve link info from Neo4j: {str(e)}")
+
 
-        from_id, to_id, link_type = results[0]
-        return {
-            "from_id": from_id,
-            "to_id": to_id,
-            "link_type": link_type,
-        }
+async def info_link_async(link_id: str) -> dict[str, str]:
+    """
+    Async version of `info_link`.
+    """
+    try:
+        results, _ = await cypher_query_async(INFO_LINK_QUERY, {"uid": link_id})
+        return _link_info(results)
     except Exception as e:
         raise RuntimeError(f"Failed to retrieve link info from Neo4j: {str(e)}")
 
@@ -165,22 +169,23 @@ def patch_link(link_id: str, link_type: LinkType) -> dict[str, dict[str, float |
         if old_type == link_type.value:
             return {}
 
-        # 删除原关系，并更新分数
-        updated_nodes = delete_link(link_id)
+        # 端点不变，拓扑序本应成立，这里仅作校验
+        ensure_link_order(from_id, to_id)
 
-        # 创建新类型关系，并保留原uid
-        create_query = f"""
-        MATCH (from:Opinion {{uid: $from_id}}), (to:Opinion {{uid: $to_id}})
+        # 删除原关系，创建新类型关系，并保留原uid
+        replace_query = f"""
+        MATCH (from:Opinion {{uid: $from_id}})-[old]->(to:Opinion {{uid: $to_id}})
+        WHERE old.uid = $uid
+        DELETE old
         CREATE (from)-[r:{link_type.value} {{uid: $uid}}]->(to)
         """
         db.cypher_query(
-            create_query, {"from_id": from_id, "to_id": to_id, "uid": rel_uid}
+            replace_query, {"from_id": from_id, "to_id": to_id, "uid": rel_uid}
         )
 
-        # 更新相关节点的分数
-        update_score.update_node_score_positively_from(
-            from_id, updated_nodes, is_refresh=True
-        )
+        # 一次性更新相关节点的分数
+        updated_nodes = dict()
+        update_score.propagate_scores([from_id, to_id], updated_nodes)
 
         return updated_nodes
 
@@ -188,13 +193,26 @@ def patch_link(link_id: str, link_type: LinkType) -> dict[str, dict[str, float |
         raise RuntimeError(f"Failed to patch link in Neo4j: {str(e)}")
 
 
-def attack_link(link_id: str, debate_id: str, is_llm_score: bool = False) -> tuple[str, str, list[str]]:
+def attack_content(from_content: str, to_content: str) -> str:
+    """
+    Get the content used to score the OR opinion attacking a link.
+    """
+    return f"{from_content} ->（蕴含） {to_content}"
+
+
+def attack_link(
+    link_id: str,
+    debate_id: str,
+    is_llm_score: bool = False,
+    positive_score: float | None = 1.0,
+) -> tuple[str, str, list[str]]:
     """
     Split a link into an AND opinion, and create another OR opinion to attack it.
 
     :param link_id: The ID of the link to delete.
     :param debate_id: The debate ID where the new opinions will be created.
-    :param is_llm_score: Whether to use AI to score the new OR opinion.
+    :param is_llm_score: Whether to use AI to score the new OR opinion, which will ignore the provided positive_score.
+    :param positive_score: The positive score of the new OR opinion.
     :return: The ID of the new OR and AND opinions created.
     """
     try:
@@ -213,10 +231,7 @@ def attack_link(link_id: str, debate_id: str, is_llm_score: bool = False) -> tup
         # Create a new OR opinion
         if is_llm_score:
             # 使用AI评分
-            or_content = f"{from_opinion.content} ->（蕴含） {to_opinion.content}"
-            positive_score = llm_score(or_content)
-        else:
-            positive_score = 1.0
+            positive_score = llm_score(attack_content(from_opinion.content, to_opinion.content))
         new_or_opinion_id = create_or_opinion(
             content=f"{from_opinion.content} -> {to_opinion.content}",
             creator="system",
@@ -240,6 +255,7 @@ def attack_link(link_id: str, debate_id: str, is_llm_score: bool = False) -> tup
         new_and_opinion.son_positive_score = from_opinion.positive_score
         new_and_opinion.negative_score = from_opinion.negative_score
         new_and_opinion.save()
+        bump_versions(opinion_ids=[new_and_opinion_id])
         return (
             new_or_opinion_id,
             new_and_opinion_id,
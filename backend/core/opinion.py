@@ -1,12 +1,31 @@
-from core.db_life import get_psql_session
-from core.debate import cited_in_debate
-from core.debate import get_global_debate
+from neomodel import db
+from sqlalchemy import select, delete, insert, tuple_
+from sqlalchemy.orm import aliased
+from core.db_life import get_psql_session, async_psql_session, cypher_query_async
+from core.debate import get_global_debate, get_global_debate_async
 from schemas.db.neo4j import Opinion as OpinionNeo4j
-from schemas.db.psql import Opinion as OpinionPsql, Debate as DebatePsql, model2dict
+from schemas.db.psql import (
+    Opinion as OpinionPsql,
+    Debate as DebatePsql,
+    PruneOutbox,
+    debate_opinion_association,
+    model2dict,
+)
 from schemas.opinion import LogicType
 from schemas.link import LinkType
 from core import update_score
 from .utils.llm import llm_score, is_AND_link_reasonable
+from .utils.reachability import next_topo_order, topo_order_between, ensure_link_order
+from .utils.unit_of_work import create_opinion_unit, prune_rows, finish_prune
+from .utils.membership import membership_cache
+from .utils.search import (
+    FULLTEXT_BATCH_SIZE,
+    is_searchable,
+    search_opinion_ids,
+    search_opinion_ids_async,
+)
+from .utils.embedding import get_opinion_index
+from .utils.debate_version import bump_versions, bump_versions_in
 
 
 def create_or_opinion(
@@ -32,41 +51,28 @@ def create_or_opinion(
     """
     if is_llm_score:
         positive_score = llm_score(content)
-    with get_psql_session() as psql_session:
+    # 在写事务之外分配拓扑序，避免事务持有计数器节点的锁
+    topo_order = next_topo_order()
+
+    # PostgreSQL rows and the Neo4j node are written as one unit of work
+    with create_opinion_unit(creator, debate_id) as opinion_id:
         try:
-            new_opinion_psql = OpinionPsql(creator=creator)
-            psql_session.add(new_opinion_psql)
-            psql_session.commit()
-            psql_session.refresh(new_opinion_psql)
+            new_opinion_neo4j = OpinionNeo4j(
+                uid=opinion_id,
+                content=content,
+                host=host,
+                node_type=node_type,
+                logic_type=LogicType.OR.value,
+                topo_order=topo_order,
+            )
+            if positive_score:
+                new_opinion_neo4j.positive_score = positive_score  # type: ignore
+            new_opinion_neo4j.save()
         except Exception as e:
-            psql_session.rollback()
-            raise RuntimeError(f"Failed to create opinion in PostgreSQL: {str(e)}")
+            raise RuntimeError(f"Failed to create opinion in Neo4j: {str(e)}")
 
-    try:
-        new_opinion_neo4j = OpinionNeo4j(
-            uid=new_opinion_psql.id,
-            content=content,
-            host=host,
-            node_type=node_type,
-            logic_type=LogicType.OR.value,
-        )
-        if positive_score:
-            new_opinion_neo4j.positive_score = positive_score  # type: ignore
-        new_opinion_neo4j.save()
-    except Exception as e:
-        raise RuntimeError(f"Failed to create opinion in Neo4j: {str(e)}")
-
-    # Link the opinion to the debate
-    try:
-        cited_in_debate(debate_id, str(new_opinion_psql.id))
-        global_debate_id = get_global_debate()
-        # Also link to the global debate
-        if global_debate_id and debate_id != global_debate_id:
-            cited_in_debate(global_debate_id, str(new_opinion_psql.id))
-    except Exception as e:
-        raise RuntimeError(f"Failed to link opinion to debate in PostgreSQL: {str(e)}")
-
-    return str(new_opinion_psql.id)
+    get_opinion_index().upsert([(opinion_id, content)])
+    return opinion_id
 
 
 def create_and_opinion(
@@ -103,6 +109,8 @@ def create_and_opinion(
     parent_opinion_neo4j = OpinionNeo4j.nodes.get(uid=parent_id)
     if parent_opinion_neo4j.node_type == "empty":
         raise ValueError(f"Parent opinion {parent_id} is empty.")
+    # Check if the AND opinion would create a cycle, and reserve its topological order
+    topo_order = topo_order_between(son_ids, parent_id)
 
     # Check if the links are reasonable using LLM
     if is_llm_evaluate:
@@ -111,70 +119,177 @@ def create_and_opinion(
         if not is_AND_link_reasonable(son_ids_contents, to_content, link_type.value):
             raise ValueError("The AND link is not reasonable according to LLM evaluation.")
 
+    links_ids: list[str] = []
+    updated_nodes: dict[str, dict[str, float | None]] = {}
+    # PostgreSQL rows and the Neo4j node with its links are written as one unit of work
+    with create_opinion_unit(creator, debate_id) as opinion_id:
+        try:
+            # Create the new opinion node
+            new_opinion_neo4j = OpinionNeo4j(
+                uid=opinion_id,
+                content="与" if link_type == LinkType.SUPPORT else "与非",
+                host=host,
+                node_type="empty",
+                logic_type=LogicType.AND.value,
+                intermediate=intermediate,
+                topo_order=topo_order,
+            )
+            new_opinion_neo4j.save()
+            # Link the new AND opinion to the parent opinion
+            if link_type == LinkType.SUPPORT:
+                new_opinion_neo4j.supports.connect(parent_opinion_neo4j)  # type: ignore
+                rel = new_opinion_neo4j.supports.relationship(parent_opinion_neo4j)  # type: ignore
+            elif link_type == LinkType.OPPOSE:
+                new_opinion_neo4j.opposes.connect(parent_opinion_neo4j)  # type: ignore
+                rel = new_opinion_neo4j.opposes.relationship(parent_opinion_neo4j)  # type: ignore
+            else:
+                raise ValueError(f"Unsupported link type: {link_type}")
+            links_ids.append(rel.uid)
+            # Link the new AND opinion to the child opinions
+            for son_opinion_neo4j in son_opinion_neo4j_list:
+                ensure_link_order(son_opinion_neo4j.uid, new_opinion_neo4j.uid)
+                son_opinion_neo4j.supports.connect(new_opinion_neo4j)
+                rel_son = son_opinion_neo4j.supports.relationship(new_opinion_neo4j)
+                links_ids.append(rel_son.uid)
+            # Update score, the new AND opinion gets its score from its sons
+            # and then propagates it to its parent and back to its sons
+            update_score.propagate_scores([opinion_id], updated_nodes)
+        except Exception as e:
+            raise RuntimeError(f"Failed to create opinion in Neo4j: {str(e)}")
+
+    return opinion_id, links_ids, updated_nodes
+
+
+# 一层子节点及其全部父节点
+SONS_QUERY = """
+MATCH (m:Opinion)-[:supports|opposes]->(n:Opinion) WHERE n.uid IN $uids
+WITH DISTINCT m
+MATCH (m)-[:supports|opposes]->(p:Opinion)
+RETURN m.uid, collect(p.uid)
+"""
+
+
+def _exclusive_subtree(opinion_ids: list[str]) -> list[str]:
+    """
+    Extend opinions with their descendants that only they are supported or
+    opposed by, i.e. whose parents would all be deleted.
+
+    Descendants are fetched one level per query. A son with a parent outside
+    the set so far is kept pending, as that parent may still join the set.
+    """
+    subtree = list(opinion_ids)
+    in_subtree = set(opinion_ids)
+    pending: dict[str, list[str]] = {}
+    frontier = list(opinion_ids)
+    while frontier:
+        results, _ = db.cypher_query(SONS_QUERY, {"uids": frontier})
+        for son_id, parent_ids in results:
+            if son_id not in in_subtree:
+                pending[son_id] = parent_ids
+        frontier = []
+        changed = True
+        while changed:
+            changed = False
+            for son_id, parent_ids in list(pending.items()):
+                if all(p in in_subtree for p in parent_ids):
+                    del pending[son_id]
+                    in_subtree.add(son_id)
+                    subtree.append(son_id)
+                    frontier.append(son_id)
+                    changed = True
+    return subtree
+
+
+def delete_opinions(
+    opinion_ids: list[str], debate_id: str, include_subtree: bool = False
+) -> tuple[list[str], dict[str, dict[str, float | None]]]:
+    """
+    Delete several opinions at once.
+
+    In the global debate the opinions are removed from PostgreSQL in one
+    statement, recorded in the prune outbox in the same transaction, and
+    removed from Neo4j with their links in batches; the scores of all their
+    remaining neighbors are then propagated once. `reconcile_outbox` finishes
+    the deletion if it is interrupted. In another debate they are only
+    removed from that debate.
+
+    :param opinion_ids: The IDs of the opinions to delete.
+    :param debate_id: ID of the debate to delete the opinions from.
+    :param include_subtree: Whether to also delete the descendants that are
+        only linked to deleted opinions, e.g. the whole argument below a claim.
+    :return: The IDs of the deleted opinions, and a dictionary of updated IDs
+        and their new scores.
+    """
+    opinion_ids = list(dict.fromkeys(opinion_ids))
+    if not opinion_ids:
+        return [], {}
+    with get_psql_session() as psql_session:
+        found = {
+            str(row[0])
+            for row in psql_session.query(OpinionPsql.id).filter(
+                OpinionPsql.id.in_(opinion_ids)
+            )
+        }
+    for opinion_id in opinion_ids:
+        if opinion_id not in found:
+            raise ValueError(f"Opinion with ID {opinion_id} not found in PostgreSQL.")
+
+    if include_subtree:
+        opinion_ids = _exclusive_subtree(opinion_ids)
+    if debate_id == get_global_debate():
+        return opinion_ids, _delete_everywhere(opinion_ids)
+    return _remove_from_debate(opinion_ids, debate_id), {}
+
+
+def _delete_everywhere(opinion_ids: list[str]) -> dict[str, dict[str, float | None]]:
     with get_psql_session() as psql_session:
         try:
-            new_opinion_psql = OpinionPsql(creator=creator)
-            psql_session.add(new_opinion_psql)
+            bump_versions_in(psql_session, opinion_ids=opinion_ids)
+            psql_session.query(OpinionPsql).filter(
+                OpinionPsql.id.in_(opinion_ids)
+            ).delete(synchronize_session=False)
+            # 记录待删除的 Neo4j 节点，中断后由 reconcile_outbox 继续
+            psql_session.execute(insert(PruneOutbox), prune_rows(opinion_ids))
             psql_session.commit()
-            psql_session.refresh(new_opinion_psql)
         except Exception as e:
             psql_session.rollback()
-            raise RuntimeError(f"Failed to create opinion in PostgreSQL: {str(e)}")
+            raise RuntimeError(f"Failed to delete opinions in PostgreSQL: {str(e)}")
+    membership_cache.discard_everywhere(opinion_ids)
+    get_opinion_index().remove(opinion_ids)
 
-    links_ids: list[str] = []
     try:
-        # Create the new opinion node
-        new_opinion_neo4j = OpinionNeo4j(
-            uid=new_opinion_psql.id,
-            content="与" if link_type == LinkType.SUPPORT else "与非",
-            host=host,
-            node_type="empty",
-            logic_type=LogicType.AND.value,
-            intermediate=intermediate,
-        )
-        new_opinion_neo4j.save()
-        # Link the new AND opinion to the parent opinion
-        if link_type == LinkType.SUPPORT:
-            new_opinion_neo4j.supports.connect(parent_opinion_neo4j)  # type: ignore
-            rel = new_opinion_neo4j.supports.relationship(parent_opinion_neo4j)  # type: ignore
-        elif link_type == LinkType.OPPOSE:
-            new_opinion_neo4j.opposes.connect(parent_opinion_neo4j)  # type: ignore
-            rel = new_opinion_neo4j.opposes.relationship(parent_opinion_neo4j)  # type: ignore
-        else:
-            raise ValueError(f"Unsupported link type: {link_type}")
-        links_ids.append(rel.uid)
-        # Link the new AND opinion to the child opinions
-        for son_opinion_neo4j in son_opinion_neo4j_list:
-            son_opinion_neo4j.supports.connect(new_opinion_neo4j)
-            rel_son = son_opinion_neo4j.supports.relationship(new_opinion_neo4j)
-            links_ids.append(rel_son.uid)
-        updated_nodes: dict[str, dict[str, float | None]] = {}
-        # Update score
-        update_score.refresh_son_type_score(
-            str(new_opinion_neo4j.uid), "positive", updated_nodes
-        )
-        new_opinion_neo4j = OpinionNeo4j.nodes.get(uid=new_opinion_neo4j.uid)
-        new_opinion_neo4j.positive_score = new_opinion_neo4j.son_positive_score
-        new_opinion_neo4j.save()
-        update_score.update_node_score_positively_from(
-            str(new_opinion_psql.id), updated_nodes
-        )
-        ## No need to update negative score here, as it will be updated in update_node_score_positively_from above
-        ## And here new_opinion_neo4j.negative_score is None by default
+        # Delete the opinions in Neo4j, then repair their remaining neighbors:
+        # parents lose a son and sons lose a parent
+        updated_nodes = finish_prune(opinion_ids)
     except Exception as e:
-        raise RuntimeError(f"Failed to create opinion in Neo4j: {str(e)}")
+        raise RuntimeError(f"Failed to delete opinions in Neo4j: {str(e)}")
+    for opinion_id in opinion_ids:
+        updated_nodes.pop(opinion_id, None)
+    return updated_nodes
 
-    # Link the opinion to the debate
-    try:
-        cited_in_debate(debate_id, str(new_opinion_psql.id))
-        global_debate_id = get_global_debate()
-        # Also link to the global debate
-        if global_debate_id and debate_id != global_debate_id:
-            cited_in_debate(global_debate_id, str(new_opinion_psql.id))
-    except Exception as e:
-        raise RuntimeError(f"Failed to link opinion to debate in PostgreSQL: {str(e)}")
 
-    return str(new_opinion_psql.id), links_ids, updated_nodes
+def _remove_from_debate(opinion_ids: list[str], debate_id: str) -> list[str]:
+    with get_psql_session() as psql_session:
+        try:
+            if not psql_session.query(DebatePsql.id).filter_by(id=debate_id).first():
+                raise ValueError(f"Debate with ID {debate_id} not found in PostgreSQL.")
+            association = debate_opinion_association.c
+            result = psql_session.execute(
+                delete(debate_opinion_association)
+                .where(association.debate_id == debate_id)
+                .where(association.opinion_id.in_(opinion_ids))
+                .returning(association.opinion_id)
+            )
+            removed = [str(row[0]) for row in result]
+            psql_session.commit()
+        except Exception as e:
+            psql_session.rollback()
+            raise RuntimeError(
+                f"Failed to remove opinions from debate in PostgreSQL: {str(e)}"
+            )
+    membership_cache.discard(debate_id, removed)
+    bump_versions(debate_ids=[debate_id])
+    return removed
 
 
 def delete_opinion(opinion_id: str, debate_id: str) -> dict[str, float | None]:
@@ -185,59 +300,206 @@ def delete_opinion(opinion_id: str, debate_id: str) -> dict[str, float | None]:
     :param debate_id: ID of the debate this opinion belongs to.
     :return: A dictionary of updated IDs and their new scores.
     """
-    updated_nodes = dict()
-    with get_psql_session() as psql_session:
-        opinion = psql_session.query(OpinionPsql).filter_by(id=opinion_id).first()
-        if not opinion:
-            raise ValueError(f"Opinion with ID {opinion_id} not found in PostgreSQL.")
+    _, updated_nodes = delete_opinions([opinion_id], debate_id)
+    return updated_nodes
 
-        if debate_id == get_global_debate():
-            # If no debate_id is provided, delete the opinion from all debates
-            try:
-                psql_session.delete(opinion)
-                psql_session.commit()
-            except Exception as e:
-                psql_session.rollback()
-                raise RuntimeError(f"Failed to delete opinion in PostgreSQL: {str(e)}")
-            try:
-                opinion_neo4j = OpinionNeo4j.nodes.get(uid=opinion_id)
-                son_opinions = (
-                    opinion_neo4j.supported_by.all() + opinion_neo4j.opposed_by.all()
-                )
-                # Update positive score to None before deleting
-                opinion_neo4j.positive_score = None
-                opinion_neo4j.save()
-                update_score.update_node_score_positively_from(
-                    opinion_id, updated_nodes, is_refresh=True
-                )
-                # Delete the opinion in Neo4j
-                opinion_neo4j.delete()
-                # Update negative scores of son opinions
-                for son_opinion in son_opinions:
-                    update_score.update_node_score_negatively_recursively(
-                        son_opinion.uid, updated_nodes, None
-                    )
-            except Exception as e:
-                raise RuntimeError(f"Failed to delete opinion in Neo4j: {str(e)}")
-        else:
-            # If a debate_id is provided, only delete the opinion in the debate
-            try:
-                debate = psql_session.query(DebatePsql).filter_by(id=debate_id).first()
-                if not debate:
-                    raise ValueError(
-                        f"Debate with ID {debate_id} not found in PostgreSQL."
-                    )
-                if debate in opinion.debates:
-                    opinion.debates.remove(debate)
-                    psql_session.commit()
-            except Exception as e:
-                psql_session.rollback()
-                raise RuntimeError(
-                    f"Failed to remove opinion from debate in PostgreSQL: {str(e)}"
+
+def get_opinion_contents(opinion_ids: list[str]) -> dict[str, str]:
+    """
+    Get the contents of the given opinions in one query.
+
+    :param opinion_ids: The IDs of the opinions.
+    :return: A dictionary mapping each opinion ID to its content.
+    """
+    results, _ = db.cypher_query(
+        "MATCH (n:Opinion) WHERE n.uid IN $uids RETURN n.uid, n.content",
+        {"uids": opinion_ids},
+    )
+    contents = {uid: content for uid, content in results}
+    for opinion_id in opinion_ids:
+        if opinion_id not in contents:
+            raise ValueError(f"Opinion with ID {opinion_id} not found in Neo4j.")
+    return contents
+
+
+def _round_score(positive: float | None, negative: float | None) -> dict:
+    """
+    Round the scores of an opinion for the response.
+    """
+    return {
+        "positive": round(positive, 2) if positive else None,
+        "negative": round(negative, 2) if negative else None,
+    }
+
+
+INFO_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids
+OPTIONAL MATCH (n)-[r:supports|opposes]-(m:Opinion)
+RETURN n.uid, n.content, n.host, n.logic_type, n.node_type,
+       n.positive_score, n.negative_score,
+       collect(
+         CASE WHEN r IS NULL THEN NULL
+         ELSE [type(r), startNode(r) = n, r.uid, m.uid] END
+       )
+"""
+
+# (关系类型, 是否为出边) -> relationship 中的分类
+RELATIONSHIP_NAMES = {
+    ("supports", True): "supports",
+    ("opposes", True): "opposes",
+    ("supports", False): "supported_by",
+    ("opposes", False): "opposed_by",
+}
+
+
+def _opinions_statement(opinion_ids: list[str]):
+    return select(OpinionPsql).where(OpinionPsql.id.in_(opinion_ids))
+
+
+def _in_order(rows, opinion_ids: list[str]) -> list[dict]:
+    by_id = {str(row.id): model2dict(row) for row in rows}
+    return [by_id[uid] for uid in opinion_ids if uid in by_id]
+
+
+def _neighbour_ids(results: list) -> set[str]:
+    return {rel[3] for row in results for rel in row[7] if rel is not None}
+
+
+def _build_infos(
+    opinion_ids: list[str],
+    results: list,
+    opinions_psql: dict[str, dict],
+    opinion_id_in_debate: set[str],
+    has_relationship: bool,
+    is_get_relationship_id: bool,
+) -> list[dict]:
+    """
+    Merge the rows of `INFO_QUERY` with the PostgreSQL rows of the opinions.
+    """
+    nodes = {row[0]: row for row in results}
+    infos_list = []
+    for opinion_id in opinion_ids:
+        if opinion_id not in opinions_psql or opinion_id not in nodes:
+            continue
+        _, content, host, logic_type, node_type, positive, negative, rels = nodes[
+            opinion_id
+        ]
+        infos = opinions_psql[opinion_id]
+        infos.update(
+            {
+                "content": content,
+                "host": host,
+                "logic_type": logic_type,
+                "node_type": node_type,
+                "score": _round_score(positive, negative),
+            }
+        )
+        if has_relationship:
+            relationship = {name: [] for name in RELATIONSHIP_NAMES.values()}
+            for rel in rels:
+                if rel is None:
+                    continue
+                rel_type, is_outgoing, rel_uid, neighbour_id = rel
+                if neighbour_id not in opinion_id_in_debate:
+                    continue
+                relationship[RELATIONSHIP_NAMES[(rel_type, is_outgoing)]].append(
+                    rel_uid if is_get_relationship_id else neighbour_id
                 )
-    if opinion_id in updated_nodes:
-        del updated_nodes[opinion_id]
-    return updated_nodes
+            infos["relationship"] = relationship
+        infos_list.append(infos)
+    return infos_list
+
+
+def info_opinions(
+    opinion_ids: list[str],
+    debate_id: str | None = None,
+    has_relationship: bool = True,
+    is_get_relationship_id: bool = True,
+) -> list[dict]:
+    """
+    Get information about several opinions by their IDs in a few queries.
+
+    Opinions missing in either database are skipped.
+
+    :param opinion_ids: The IDs of the opinions to retrieve.
+    :param debate_id: Optional ID of the debate the related opinions should be filtered by.
+    :param has_relationship: Whether to include related opinions in the response.
+    :param is_get_relationship_id: Whether to return the IDs of relationships or the full objects.
+    :return: A list of dictionaries containing the opinion details, in the given order.
+    """
+    opinion_ids = list(dict.fromkeys(opinion_ids))
+    if not opinion_ids:
+        return []
+
+    # 一次查询节点信息及其所有关系
+    try:
+        results, _ = db.cypher_query(INFO_QUERY, {"uids": opinion_ids})
+    except Exception as e:
+        raise RuntimeError(f"Failed to retrieve opinions from Neo4j: {str(e)}")
+
+    with get_psql_session() as psql_session:
+        opinions_psql = {
+            str(opinion.id): model2dict(opinion)
+            for opinion in psql_session.scalars(_opinions_statement(opinion_ids))
+        }
+
+    # 仅判断邻居是否属于辩论，未指定辩论时即全辩论
+    opinion_id_in_debate = set()
+    neighbour_ids = _neighbour_ids(results)
+    if has_relationship and neighbour_ids:
+        opinion_id_in_debate = membership_cache.filter(
+            debate_id or get_global_debate(), neighbour_ids
+        )
+
+    return _build_infos(
+        opinion_ids,
+        results,
+        opinions_psql,
+        opinion_id_in_debate,
+        has_relationship,
+        is_get_relationship_id,
+    )
+
+
+async def info_opinions_async(
+    opinion_ids: list[str],
+    debate_id: str | None = None,
+    has_relationship: bool = True,
+    is_get_relationship_id: bool = True,
+) -> list[dict]:
+    """
+    Async version of `info_opinions`, using the async drivers of both databases.
+    """
+    opinion_ids = list(dict.fromkeys(opinion_ids))
+    if not opinion_ids:
+        return []
+
+    try:
+        results, _ = await cypher_query_async(INFO_QUERY, {"uids": opinion_ids})
+    except Exception as e:
+        raise RuntimeError(f"Failed to retrieve opinions from Neo4j: {str(e)}")
+
+    async with async_psql_session() as psql_session:
+        opinions_psql = {
+            str(opinion.id): model2dict(opinion)
+            for opinion in await psql_session.scalars(_opinions_statement(opinion_ids))
+        }
+
+    opinion_id_in_debate = set()
+    neighbour_ids = _neighbour_ids(results)
+    if has_relationship and neighbour_ids:
+        opinion_id_in_debate = await membership_cache.filter_async(
+            debate_id or await get_global_debate_async(), neighbour_ids
+        )
+
+    return _build_infos(
+        opinion_ids,
+        results,
+        opinions_psql,
+        opinion_id_in_debate,
+        has_relationship,
+        is_get_relationship_id,
+    )
 
 
 def info_opinion(
@@ -255,80 +517,43 @@ def info_opinion(
     :param is_get_relationship_id: Whether to return the IDs of relationships or the full objects.
     :return: A dictionary containing the opinion details.
     """
-    # Get information from postgreSQL
     with get_psql_session() as psql_session:
-        query = psql_session.query(OpinionPsql).filter_by(id=opinion_id)
-        opinion_psql = query.first()
-        if not opinion_psql:
+        if not psql_session.query(OpinionPsql.id).filter_by(id=opinion_id).first():
             raise ValueError(f"Opinion with ID {opinion_id} not found in PostgreSQL.")
 
-        infos = model2dict(opinion_psql)
-
-        # Get information from Neo4j
-        try:
-            opinion_neo4j = OpinionNeo4j.nodes.get(uid=opinion_id)
-            infos.update(
-                {
-                    "content": opinion_neo4j.content,
-                    "host": opinion_neo4j.host,
-                    "logic_type": opinion_neo4j.logic_type,
-                    "node_type": opinion_neo4j.node_type,
-                    "score": {
-                        "positive": (
-                            round(opinion_neo4j.positive_score, 2)
-                            if opinion_neo4j.positive_score
-                            else None
-                        ),
-                        "negative": (
-                            round(opinion_neo4j.negative_score, 2)
-                            if opinion_neo4j.negative_score
-                            else None
-                        ),
-                    },
-                }
-            )
-        except Exception as e:
-            raise RuntimeError(f"Failed to retrieve opinion from Neo4j: {str(e)}")
+    infos_list = info_opinions(
+        [opinion_id], debate_id, has_relationship, is_get_relationship_id
+    )
+    if not infos_list:
+        raise RuntimeError(
+            f"Failed to retrieve opinion from Neo4j: Opinion with ID {opinion_id} not found."
+        )
+    return infos_list[0]
 
-        if has_relationship:
-            # Get related opinions and classify them by link type
-            relationship = {
-                "supports": [],
-                "opposes": [],
-                "supported_by": [],
-                "opposed_by": [],
-            }
-            try:
-                if debate_id:
-                    opinion_id_in_debate = {
-                        str(row[0])
-                        for row in psql_session.query(OpinionPsql.id)
-                        .filter(OpinionPsql.debates.any(id=debate_id))
-                        .all()
-                    }
-                else:
-                    opinion_id_in_debate = {
-                        str(row[0]) for row in psql_session.query(OpinionPsql.id).all()
-                    }
-                for rel_name in ["supports", "opposes", "supported_by", "opposed_by"]:
-                    for to_node in getattr(opinion_neo4j, rel_name).all():
-                        if to_node.uid in opinion_id_in_debate:
-                            if is_get_relationship_id:
-                                relationship[rel_name].append(
-                                    getattr(opinion_neo4j, rel_name)
-                                    .relationship(to_node)
-                                    .uid
-                                )
-                            else:
-                                relationship[rel_name].append(to_node.uid)
-            except Exception as e:
-                raise RuntimeError(
-                    f"Failed to retrieve related opinions from Neo4j: {str(e)}"
-                )
 
-            infos["relationship"] = relationship
+async def info_opinion_async(
+    opinion_id: str,
+    debate_id: str | None = None,
+    has_relationship: bool = True,
+    is_get_relationship_id: bool = True,
+) -> dict:
+    """
+    Async version of `info_opinion`.
+    """
+    async with async_psql_session() as psql_session:
+        if not await psql_session.scalar(
+            select(OpinionPsql.id).where(OpinionPsql.id == opinion_id)
+        ):
+            raise ValueError(f"Opinion with ID {opinion_id} not found in PostgreSQL.")
 
-        return infos
+    infos_list = await info_opinions_async(
+        [opinion_id], debate_id, has_relationship, is_get_relationship_id
+    )
+    if not infos_list:
+        raise RuntimeError(
+            f"Failed to retrieve opinion from Neo4j: Opinion with ID {opinion_id} not found."
+        )
+    return infos_list[0]
 
 
 def query_opinion(
@@ -338,77 +563,460 @@ def query_opinion(
     max_score: float | None = None,
     is_time_accending: bool = True,
     max_num: int = 1,
+    cursor: str | None = None,
+    is_relevance_order: bool = False,
 ) -> list[dict]:
     """
     Query opinions based on content, debate ID, or opinion ID.
 
+    By default the IDs of the opinions of the debate are read from PostgreSQL
+    in creation order, and content and score filters and the page limit run
+    in one Neo4j query. A query searchable by the full-text index (see
+    `is_searchable`) takes its candidates from the index instead, which are
+    then paged in creation order in PostgreSQL. With `is_relevance_order`,
+    the index hits are ranked by relevance. With `is_relevance_order`, the full-text
+    index is read in batches instead and the results are ranked by relevance.
+
     :param q: Optional search query string to filter opinions by content.
     :param debate_id: Optional related_opinionsID of the debate to filter opinions by.
     :param min_score: Optional minimum score to filter opinions by.
     :param max_score: Optional maximum score to filter opinions by.
-    :param is_time_accending: Whether to sort the results by time in ascending order.
+    :param is_time_accending: Whether to sort the results by time in ascending order,
+        ignored when the results are ranked by relevance.
     :param max_num: The maximum number of opinions to return.
+    :param cursor: Optional ID of the last opinion of the previous page (keyset pagination).
+    :param is_relevance_order: Whether to rank the results by relevance, which
+        needs `q` to be at least two CJK characters.
     :return: A list of dictionaries containing matching opinions.
     """
-    # Get information from Neo4j
+    if is_relevance_order and not is_searchable(q):
+        raise ValueError("Relevance order needs a query of at least two CJK characters.")
     try:
-        query = OpinionNeo4j.nodes
-        if q:
-            query = query.filter(content__contains=q)
-        opinions_list = query.all()
-        if min_score is not None:
-            opinions_list = [
-                op
-                for op in opinions_list
-                if op.positive_score
-                and op.negative_score
-                and (op.positive_score + op.negative_score) / 2 >= min_score
-            ]
-        if max_score is not None:
-            opinions_list = [
-                op
-                for op in opinions_list
-                if op.positive_score
-                and op.negative_score
-                and (op.positive_score + op.negative_score) / 2 <= max_score
-            ]
-        opinion_ids = [opinion.uid for opinion in opinions_list]
-        with get_psql_session() as psql_session:
-            if debate_id:
-                opinion_ids = [
-                    op_id
-                    for op_id in opinion_ids
-                    if psql_session.query(OpinionPsql.id)
-                    .filter(
-                        OpinionPsql.id == op_id, OpinionPsql.debates.any(id=debate_id)
-                    )
-                    .first()
-                ]
-            # 查询所有opinion_id及其created_at
-            id_time = (
-                psql_session.query(OpinionPsql.id, OpinionPsql.created_at)
-                .filter(OpinionPsql.id.in_(opinion_ids))
-                .all()
+        if is_relevance_order:
+            opinions = _search_page(
+                q, debate_id, min_score, max_score, max_num, cursor  # type: ignore
             )
-            # 排序
-            id_time_sorted = sorted(
-                id_time,
-                key=lambda x: x[1],
-                reverse=not is_time_accending,
+        else:
+            opinions = _filter_page(
+                q, debate_id, min_score, max_score, is_time_accending, max_num, cursor
             )
-            # 只保留排序后的id
-            opinion_ids = [str(row[0]) for row in id_time_sorted]
-            opinion_ids = opinion_ids[:max_num]
-
-        opinions = []
-        for opinion_id in opinion_ids:
-            opinion_info = info_opinion(opinion_id, debate_id, False)
-            opinions.append(opinion_info)
-        return opinions
+        return _attach_details(opinions)
+    except Exception as e:
+        raise RuntimeError(f"Failed to query opinions from Neo4j: {str(e)}")
+
+
+async def query_opinion_async(
+    q: str | None = None,
+    debate_id: str | None = None,
+    min_score: float | None = None,
+    max_score: float | None = None,
+    is_time_accending: bool = True,
+    max_num: int = 1,
+    cursor: str | None = None,
+    is_relevance_order: bool = False,
+) -> list[dict]:
+    """
+    Async version of `query_opinion`, using the async drivers of both databases.
+    """
+    if is_relevance_order and not is_searchable(q):
+        raise ValueError("Relevance order needs a query of at least two CJK characters.")
+    try:
+        if is_relevance_order:
+            opinions = await _search_page_async(
+                q, debate_id, min_score, max_score, max_num, cursor  # type: ignore
+            )
+        else:
+            opinions = await _filter_page_async(
+                q, debate_id, min_score, max_score, is_time_accending, max_num, cursor
+            )
+        return await _attach_details_async(opinions)
     except Exception as e:
         raise RuntimeError(f"Failed to query opinions from Neo4j: {str(e)}")
 
 
+def _take_after(ids: list[str], batch: list[str], cursor: str | None) -> str | None:
+    """
+    Append the IDs of a batch of a ranking that follow the cursor.
+
+    :return: The cursor if it is not found yet, otherwise None.
+    """
+    if cursor:
+        # 排名中上一页最后一个观点之后的观点
+        if cursor not in batch:
+            return cursor
+        batch = batch[batch.index(cursor) + 1 :]
+    ids.extend(batch)
+    return None
+
+
+def _search_page(
+    q: str,
+    debate_id: str | None,
+    min_score: float | None,
+    max_score: float | None,
+    max_num: int,
+    cursor: str | None,
+) -> list[dict]:
+    """
+    Get a page of opinions matching the query, most relevant first.
+
+    The index is read a batch at a time until enough hits pass the filters,
+    so filtered out hits never shorten the page.
+    """
+    ids: list[str] = []
+    skip = 0
+    while len(ids) < max_num:
+        matches, hits = search_opinion_ids(q, min_score, max_score, skip)
+        skip += hits
+        batch = [uid for uid, _ in matches]
+        if debate_id and batch:
+            members = membership_cache.filter(debate_id, batch)
+            batch = [uid for uid in batch if uid in members]
+        cursor = _take_after(ids, batch, cursor)
+        if hits < FULLTEXT_BATCH_SIZE:
+            break
+    ids = ids[:max_num]
+    if not ids:
+        return []
+    with get_psql_session() as psql_session:
+        return _in_order(psql_session.scalars(_opinions_statement(ids)), ids)
+
+
+async def _search_page_async(
+    q: str,
+    debate_id: str | None,
+    min_score: float | None,
+    max_score: float | None,
+    max_num: int,
+    cursor: str | None,
+) -> list[dict]:
+    ids: list[str] = []
+    skip = 0
+    while len(ids) < max_num:
+        matches, hits = await search_opinion_ids_async(q, min_score, max_score, skip)
+        skip += hits
+        batch = [uid for uid, _ in matches]
+        if debate_id and batch:
+            members = await membership_cache.filter_async(debate_id, batch)
+            batch = [uid for uid in batch if uid in members]
+        cursor = _take_after(ids, batch, cursor)
+        if hits < FULLTEXT_BATCH_SIZE:
+            break
+    ids = ids[:max_num]
+    if not ids:
+        return []
+    async with async_psql_session() as psql_session:
+        return _in_order(await psql_session.scalars(_opinions_statement(ids)), ids)
+
+
+# 候选观点按创建时间排好序传入，内容与分数的过滤在 WHERE 中完成，
+# 按候选的位置排序后只返回一页
+FILTER_QUERY = """
+UNWIND range(0, size($uids) - 1) AS i
+WITH i, $uids[i] AS uid
+MATCH (n:Opinion) WHERE n.uid = uid
+AND ($q IS NULL OR n.content CONTAINS $q)
+AND ($min_score IS NULL OR (
+    n.positive_score IS NOT NULL AND n.negative_score IS NOT NULL
+    AND (n.positive_score + n.negative_score) / 2 >= $min_score))
+AND ($max_score IS NULL OR (
+    n.positive_score IS NOT NULL AND n.negative_score IS NOT NULL
+    AND (n.positive_score + n.negative_score) / 2 <= $max_score))
+RETURN n.uid
+ORDER BY i
+LIMIT $limit
+"""
+
+
+def _needs_filter_query(
+    q: str | None, min_score: float | None, max_score: float | None
+) -> bool:
+    return bool(q) or min_score is not None or max_score is not None
+
+
+def _filter_params(
+    uids: list[str],
+    q: str | None,
+    min_score: float | None,
+    max_score: float | None,
+    max_num: int,
+) -> dict:
+    return {
+        "uids": uids,
+        "q": q or None,
+        "min_score": min_score,
+        "max_score": max_score,
+        "limit": max_num,
+    }
+
+
+def _ordered_statement(
+    entity,
+    debate_id: str | None,
+    is_time_accending: bool,
+    cursor: str | None,
+):
+    """
+    Build the PostgreSQL query of the opinions after the cursor, ordered by
+    creation time.
+    """
+    statement = select(entity)
+    if debate_id:
+        statement = statement.where(OpinionPsql.debates.any(id=debate_id))
+    if cursor:
+        # 以上一页最后一个观点的 (created_at, id) 作为键集游标
+        last = aliased(OpinionPsql)
+        last_key = (
+            select(last.created_at, last.id)
+            .where(last.id == cursor)
+            .scalar_subquery()
+        )
+        key = tuple_(OpinionPsql.created_at, OpinionPsql.id)
+        statement = statement.where(
+            key > last_key if is_time_accending else key < last_key
+        )
+    if is_time_accending:
+        return statement.order_by(OpinionPsql.created_at, OpinionPsql.id)
+    return statement.order_by(OpinionPsql.created_at.desc(), OpinionPsql.id.desc())
+
+
+def _page_statement(
+    debate_id: str | None,
+    is_time_accending: bool,
+    max_num: int,
+    cursor: str | None,
+):
+    """
+    Build the PostgreSQL query of a page of opinions ordered by creation time.
+    """
+    return _ordered_statement(
+        OpinionPsql, debate_id, is_time_accending, cursor
+    ).limit(max_num)
+
+
+def _candidates_statement(
+    uids: list[str],
+    debate_id: str | None,
+    is_time_accending: bool,
+    max_num: int,
+    cursor: str | None,
+):
+    """
+    Build the PostgreSQL query of a page of the given opinions ordered by
+    creation time.
+    """
+    return (
+        _ordered_statement(OpinionPsql, debate_id, is_time_accending, cursor)
+        .where(OpinionPsql.id.in_(uids))
+        .limit(max_num)
+    )
+
+
+def _search_candidates(
+    q: str, min_score: float | None, max_score: float | None
+) -> list[str]:
+    """
+    Read all hits of the full-text index that pass the content and score filters.
+    """
+    uids: list[str] = []
+    skip = 0
+    while True:
+        matches, hits = search_opinion_ids(q, min_score, max_score, skip)
+        skip += hits
+        uids += [uid for uid, _ in matches]
+        if hits < FULLTEXT_BATCH_SIZE:
+            return uids
+
+
+async def _search_candidates_async(
+    q: str, min_score: float | None, max_score: float | None
+) -> list[str]:
+    uids: list[str] = []
+    skip = 0
+    while True:
+        matches, hits = await search_opinion_ids_async(q, min_score, max_score, skip)
+        skip += hits
+        uids += [uid for uid, _ in matches]
+        if hits < FULLTEXT_BATCH_SIZE:
+            return uids
+
+
+def _filter_page(
+    q: str | None,
+    debate_id: str | None,
+    min_score: float | None,
+    max_score: float | None,
+    is_time_accending: bool,
+    max_num: int,
+    cursor: str | None,
+) -> list[dict]:
+    """
+    Get a page of opinions matching the filters, ordered by creation time.
+
+    Only the IDs of the candidates are read from PostgreSQL, in order; the
+    content and score filters and the page limit run in one Neo4j query. For
+    a query searchable by the full-text index, the candidates are the index
+    hits passing the filters, paged in PostgreSQL.
+    """
+    if not _needs_filter_query(q, min_score, max_score):
+        statement = _page_statement(debate_id, is_time_accending, max_num, cursor)
+        with get_psql_session() as psql_session:
+            return [model2dict(row) for row in psql_session.scalars(statement)]
+
+    if is_searchable(q):
+        uids = _search_candidates(q, min_score, max_score)  # type: ignore
+        if not uids:
+            return []
+        statement = _candidates_statement(
+            uids, debate_id, is_time_accending, max_num, cursor
+        )
+        with get_psql_session() as psql_session:
+            return [model2dict(row) for row in psql_session.scalars(statement)]
+
+    statement = _ordered_statement(OpinionPsql.id, debate_id, is_time_accending, cursor)
+    with get_psql_session() as psql_session:
+        uids = [str(uid) for uid in psql_session.scalars(statement)]
+    if not uids:
+        return []
+    results, _ = db.cypher_query(
+        FILTER_QUERY, _filter_params(uids, q, min_score, max_score, max_num)
+    )
+    ids = [row[0] for row in results]
+    if not ids:
+        return []
+    with get_psql_session() as psql_session:
+        return _in_order(psql_session.scalars(_opinions_statement(ids)), ids)
+
+
+async def _filter_page_async(
+    q: str | None,
+    debate_id: str | None,
+    min_score: float | None,
+    max_score: float | None,
+    is_time_accending: bool,
+    max_num: int,
+    cursor: str | None,
+) -> list[dict]:
+    if not _needs_filter_query(q, min_score, max_score):
+        statement = _page_statement(debate_id, is_time_accending, max_num, cursor)
+        async with async_psql_session() as psql_session:
+            return [model2dict(row) for row in await psql_session.scalars(statement)]
+
+    if is_searchable(q):
+        uids = await _search_candidates_async(q, min_score, max_score)  # type: ignore
+        if not uids:
+            return []
+        statement = _candidates_statement(
+            uids, debate_id, is_time_accending, max_num, cursor
+        )
+        async with async_psql_session() as psql_session:
+            return [model2dict(row) for row in await psql_session.scalars(statement)]
+
+    statement = _ordered_statement(OpinionPsql.id, debate_id, is_time_accending, cursor)
+    async with async_psql_session() as psql_session:
+        uids = [str(uid) for uid in await psql_session.scalars(statement)]
+    if not uids:
+        return []
+    results, _ = await cypher_query_async(
+        FILTER_QUERY, _filter_params(uids, q, min_score, max_score, max_num)
+    )
+    ids = [row[0] for row in results]
+    if not ids:
+        return []
+    async with async_psql_session() as psql_session:
+        return _in_order(await psql_session.scalars(_opinions_statement(ids)), ids)
+
+
+DETAILS_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids
+RETURN n.uid, n.content, n.host, n.logic_type, n.node_type,
+       n.positive_score, n.negative_score
+"""
+
+
+def _merge_details(opinions: list[dict], results: list) -> list[dict]:
+    details = {row[0]: row[1:] for row in results}
+    page = []
+    for op in opinions:
+        if str(op["id"]) not in details:
+            continue
+        content, host, logic_type, node_type, positive, negative = details[
+            str(op["id"])
+        ]
+        op.update(
+            {
+                "content": content,
+                "host": host,
+                "logic_type": logic_type,
+                "node_type": node_type,
+                "score": _round_score(positive, negative),
+            }
+        )
+        page.append(op)
+    return page
+
+
+def _attach_details(opinions: list[dict]) -> list[dict]:
+    """
+    Add the Neo4j fields to a page of opinions in one query, missing nodes are skipped.
+    """
+    results, _ = db.cypher_query(
+        DETAILS_QUERY, {"uids": [str(op["id"]) for op in opinions]}
+    )
+    return _merge_details(opinions, results)
+
+
+async def _attach_details_async(opinions: list[dict]) -> list[dict]:
+    results, _ = await cypher_query_async(
+        DETAILS_QUERY, {"uids": [str(op["id"]) for op in opinions]}
+    )
+    return _merge_details(opinions, results)
+
+
+def similar_opinions(text: str, debate_id: str | None = None, k: int = 5) -> list[dict]:
+    """
+    Find the OR opinions whose content is most similar to a text.
+
+    Contents are compared by the cosine similarity of their embeddings in the
+    local vector index, so rewordings are found as well as exact matches.
+
+    :param text: The text to compare against.
+    :param debate_id: Optional ID of the debate the opinions must belong to.
+    :param k: The maximum number of opinions to return.
+    :return: A list of opinions like `query_opinion`, each with its "similarity",
+        most similar first.
+    """
+    try:
+        hits = get_opinion_index().search(text, k, debate_id)
+        if not hits:
+            return []
+        ids = [uid for uid, _ in hits]
+        with get_psql_session() as psql_session:
+            rows = psql_session.scalars(_opinions_statement(ids))
+            by_id = {str(row.id): model2dict(row) for row in rows}
+        opinions = _attach_details([by_id[uid] for uid in ids if uid in by_id])
+        similarity = dict(hits)
+        for op in opinions:
+            op["similarity"] = round(similarity[str(op["id"])], 4)
+        return opinions
+    except Exception as e:
+        raise RuntimeError(f"Failed to find similar opinions: {str(e)}")
+
+
+# 没有任何 supports 和 opposes 关系的节点为根节点
+ROOT_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids
+AND NOT (n)-[:supports|opposes]->()
+RETURN n.uid
+"""
+# 没有任何 supported_by 和 opposed_by 关系的节点为叶节点
+LEAF_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids
+AND NOT (n)<-[:supports|opposes]-()
+RETURN n.uid
+"""
+
+
 def head_opinion(debate_id: str, is_root: bool) -> list[str]:
     """
     Get leaf or root opinions in a debate.
@@ -418,30 +1026,27 @@ def head_opinion(debate_id: str, is_root: bool) -> list[str]:
     :return: A list of head opinion IDs.
     """
     try:
-        # Get all opinions from psql if debate_id is provided
-        with get_psql_session() as psql_session:
-            opinion_ids = [
-                str(row[0])
-                for row in psql_session.query(OpinionPsql.id)
-                .filter(OpinionPsql.debates.any(id=debate_id))
-                .all()
-            ]
-        # Get head opinions from Neo4j
-        head_ids = []
-        for oid in opinion_ids:
-            try:
-                op = OpinionNeo4j.nodes.get(uid=oid)
-                if is_root:
-                    # 没有任何 supports 和 opposes 关系的节点为根节点
-                    if not op.supports.all() and not op.opposes.all():
-                        head_ids.append(oid)
-                else:
-                    # 没有任何 supported_by 和 opposed_by 关系的节点为叶节点
-                    if not op.supported_by.all() and not op.opposed_by.all():
-                        head_ids.append(oid)
-            except Exception:
-                continue  # 跳过Neo4j中不存在的节点
-        return head_ids
+        # Get all opinions of the debate from the membership cache
+        opinion_ids = membership_cache.members(debate_id)
+        # Get head opinions from Neo4j in one query, missing nodes are skipped
+        results, _ = db.cypher_query(
+            ROOT_QUERY if is_root else LEAF_QUERY, {"uids": opinion_ids}
+        )
+        return [row[0] for row in results]
+    except Exception as e:
+        raise RuntimeError(f"Failed to get head opinions: {str(e)}")
+
+
+async def head_opinion_async(debate_id: str, is_root: bool) -> list[str]:
+    """
+    Async version of `head_opinion`.
+    """
+    try:
+        opinion_ids = await membership_cache.members_async(debate_id)
+        results, _ = await cypher_query_async(
+            ROOT_QUERY if is_root else LEAF_QUERY, {"uids": opinion_ids}
+        )
+        return [row[0] for row in results]
     except Exception as e:
         raise RuntimeError(f"Failed to get head opinions: {str(e)}")
 
@@ -505,10 +1110,11 @@ def patch_opinion(
             op_neo4j.positive_score = score["positive"]
             op_neo4j.save()
             updated_nodes.setdefault(opinion_id, {})["positive"] = score["positive"]
-            update_score.update_node_score_positively_from(
-                opinion_id, updated_nodes, is_refresh=True
-            )
+            update_score.propagate_scores([opinion_id], updated_nodes)
         op_neo4j.save()
+        bump_versions(opinion_ids=[opinion_id])
+        if content is not None and op_neo4j.logic_type == LogicType.OR.value:
+            get_opinion_index().upsert([(opinion_id, content)])
         return updated_nodes
     except Exception as e:
         raise RuntimeError(f"Failed to update opinion in Neo4j: {str(e)}")
@@ -0,0 +1,156 @@
+from neomodel import db
+from .graph import ScoreGraph, is_changed
+
+# 载入变更源的所有上游节点，以及这些上游节点的所有下游节点
+# 上游节点的正证分可能改变，而反证分会沿着下游一直传播
+# 区域内节点的子节点必在区域内，但父节点可能不在，作为固定输入一并返回
+REGION_QUERY = """
+MATCH (s:Opinion) WHERE s.uid IN $uids
+MATCH (s)-[:supports|opposes*0..]->(u:Opinion)
+WITH DISTINCT u
+MATCH (u)<-[:supports|opposes*0..]-(n:Opinion)
+WITH DISTINCT n
+OPTIONAL MATCH (n)-[r:supports|opposes]->(m:Opinion)
+RETURN n.uid, n.logic_type, n.positive_score, n.negative_score,
+       n.son_positive_score, n.son_negative_score,
+       collect(
+         CASE WHEN r IS NULL THEN NULL ELSE [
+           type(r), m.uid, m.logic_type, m.positive_score, m.negative_score,
+           m.son_positive_score, m.son_negative_score
+         ] END
+       )
+"""
+
+WRITE_QUERY = """
+UNWIND $rows AS row
+MATCH (n:Opinion {uid: row.uid})
+SET n.positive_score = row.positive_score,
+    n.negative_score = row.negative_score,
+    n.son_positive_score = row.son_positive_score,
+    n.son_negative_score = row.son_negative_score
+"""
+
+
+def load_region(source_ids: list[str]) -> ScoreGraph:
+    """
+    Load the region affected by a change of the source nodes in one query.
+
+    Args:
+        source_ids (list[str]): IDs of the nodes whose links or scores have changed.
+
+    Returns:
+        ScoreGraph: The affected region, with outside parents as fixed nodes.
+    """
+    graph = ScoreGraph()
+    if not source_ids:
+        return graph
+    results, _ = db.cypher_query(REGION_QUERY, {"uids": list(source_ids)})
+    for uid, logic_type, positive, negative, son_positive, son_negative, _ in results:
+        graph.add_node(uid, logic_type, positive, negative, son_positive, son_negative)
+    for row in results:
+        from_idx = graph.index[row[0]]
+        for link_type, *parent in row[6]:
+            to_idx = graph.index.get(parent[0])
+            if to_idx is None:
+                to_idx = graph.add_node(*parent, mutable=False)
+            graph.add_edge(from_idx, to_idx, link_type)
+    return graph
+
+
+def write_scores(graph: ScoreGraph, indices: set[int]):
+    """
+    Write the scores of the given nodes back to Neo4j in one batch.
+
+    Args:
+        graph (ScoreGraph): The graph holding the new scores.
+        indices (set[int]): Indices of the nodes to write.
+    """
+    if not indices:
+        return
+    rows = [
+        {
+            "uid": graph.uids[i],
+            "positive_score": graph.positive[i],
+            "negative_score": graph.negative[i],
+            "son_positive_score": graph.son_positive[i],
+            "son_negative_score": graph.son_negative[i],
+        }
+        for i in indices
+    ]
+    db.cypher_query(WRITE_QUERY, {"rows": rows})
+
+
+def propagate_in_memory(
+    graph: ScoreGraph,
+    sources: list[int],
+    updated_nodes: dict[str, dict[str, float | None]],
+) -> set[int]:
+    """
+    Propagate score changes from the source nodes over an in-memory graph.
+
+    The dirty nodes are ordered topologically and every node is recomputed
+    exactly once: positive scores from sons to parents over the sources and
+    their ancestors, then negative scores from parents to sons over the whole
+    mutable region.
+
+    Args:
+        graph (ScoreGraph): The region to update in place.
+        sources (list[int]): Indices of the nodes whose links or scores have changed.
+        updated_nodes (dict[str, dict[str, float | None]]): A dictionary to keep track of updated node IDs and their new scores.
+
+    Returns:
+        set[int]: Indices of the nodes whose stored scores have changed.
+    """
+    changed: set[int] = set()
+
+    # 向上游传播正证分，子节点先于父节点
+    for i in graph.topological_order(graph.ancestors(sources)):
+        son_positive, son_negative = graph.compute_son_scores(i)
+        if not is_changed(graph.son_positive[i], son_positive) and not is_changed(
+            graph.son_negative[i], son_negative
+        ):
+            continue
+        graph.son_positive[i] = son_positive
+        graph.son_negative[i] = son_negative
+        changed.add(i)
+        positive = graph.compute_positive_score(i)
+        if is_changed(graph.positive[i], positive):
+            graph.positive[i] = positive
+            updated_nodes.setdefault(graph.uids[i], {})["positive"] = positive
+
+    # 向下游传播反证分，父节点先于子节点
+    region = {i for i in range(len(graph)) if graph.mutable[i]}
+    for i in reversed(graph.topological_order(region)):
+        negative = graph.compute_negative_score(i)
+        if is_changed(graph.negative[i], negative):
+            graph.negative[i] = negative
+            changed.add(i)
+            updated_nodes.setdefault(graph.uids[i], {})["negative"] = negative
+
+    return changed
+
+
+def propagate_scores(
+    source_ids: list[str],
+    updated_nodes: dict[str, dict[str, float | None]],
+):
+    """
+    Update the scores of all nodes affected by a change of the source nodes.
+
+    The affected region is loaded in one query, updated in memory and the
+    changed scores are written back in one batch.
+
+    Args:
+        source_ids (list[str]): IDs of the nodes whose links or scores have changed.
+            Both ends of an added or removed link should be given.
+        updated_nodes (dict[str, dict[str, float | None]]): A dictionary to keep track of updated node IDs and their new scores.
+    """
+    graph = load_region(source_ids)
+    sources = [graph.index[uid] for uid in source_ids if uid in graph.index]
+    changed = propagate_in_memory(graph, sources, updated_nodes)
+    write_scores(graph, changed)
+    # 在此导入，使评分引擎模块不依赖 PostgreSQL
+    from core.utils.debate_version import bump_versions
+
+    # 调用方在结构变化后才传播分数，变更源所在的辩论无论分数是否变化都视为已变化
+    bump_versions(opinion_ids=list(source_ids) + [graph.uids[i] for i in changed])
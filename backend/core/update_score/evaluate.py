@@ -0,0 +1,166 @@
+import numpy as np
+
+# 全图批量评分：只依赖 NumPy，不访问数据库
+
+
+def _to_array(values: list[float | None]) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _topological_levels(num_nodes: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Calculate the level of every node so that each edge goes from a lower to a higher level.
+
+    Args:
+        num_nodes (int): The number of nodes.
+        src (np.ndarray): Source node index of every edge.
+        dst (np.ndarray): Target node index of every edge.
+
+    Returns:
+        np.ndarray: The level of every node.
+
+    Raises:
+        ValueError: If the edges contain a cycle.
+    """
+    order = np.argsort(src, kind="stable")
+    sorted_dst = dst[order]
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=num_nodes), out=offsets[1:])
+    in_degree = np.bincount(dst, minlength=num_nodes)
+
+    levels = np.zeros(num_nodes, dtype=np.int64)
+    frontier = np.flatnonzero(in_degree == 0)
+    level = 0
+    visited = 0
+    while frontier.size:
+        levels[frontier] = level
+        visited += frontier.size
+        starts = offsets[frontier]
+        counts = offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        if total == 0:
+            break
+        # 展开 frontier 所有出边在 sorted_dst 中的下标
+        edge_idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(
+            total
+        )
+        targets = sorted_dst[edge_idx]
+        np.subtract.at(in_degree, targets, 1)
+        candidates = np.unique(targets)
+        frontier = candidates[in_degree[candidates] == 0]
+        level += 1
+    if visited != num_nodes:
+        raise ValueError("The opinion graph contains a cycle.")
+    return levels
+
+
+def _iter_levels(levels: np.ndarray, nodes: np.ndarray):
+    """
+    Yield the given nodes grouped by ascending level.
+    """
+    order = nodes[np.argsort(levels[nodes], kind="stable")]
+    bounds = np.flatnonzero(np.diff(levels[order])) + 1
+    return np.split(order, bounds) if order.size else []
+
+
+def evaluate_scores(
+    logic_and: np.ndarray,
+    positive: np.ndarray,
+    negative: np.ndarray,
+    son_positive: np.ndarray,
+    son_negative: np.ndarray,
+    mutable: np.ndarray,
+    src: np.ndarray,
+    dst: np.ndarray,
+    is_support: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Evaluate all scores of a DAG level by level with vectorized operations.
+
+    Missing scores are NaN. Non-mutable nodes keep their given scores, and
+    mutable nodes without any scored son keep their given positive score.
+
+    Args:
+        logic_and (np.ndarray): Whether each node is an AND node.
+        positive (np.ndarray): The current positive score of each node.
+        negative (np.ndarray): The current negative score of each node.
+        son_positive (np.ndarray): The current son_positive_score of each node.
+        son_negative (np.ndarray): The current son_negative_score of each node.
+        mutable (np.ndarray): Whether each node should be recomputed.
+        src (np.ndarray): Son node index of every link.
+        dst (np.ndarray): Parent node index of every link.
+        is_support (np.ndarray): Whether each link supports or opposes its parent.
+
+    Returns:
+        tuple: New positive, negative, son_positive and son_negative scores.
+    """
+    n = positive.shape[0]
+    positive = positive.copy()
+    negative = negative.copy()
+    son_positive = son_positive.copy()
+    son_negative = son_negative.copy()
+    inner = mutable[src] & mutable[dst]
+    mutable_nodes = np.flatnonzero(mutable)
+
+    # 正证分：子节点先于父节点，逐层计算
+    levels = _topological_levels(n, src[inner], dst[inner])
+    in_edges = np.flatnonzero(mutable[dst])
+    edge_order = in_edges[np.argsort(levels[dst[in_edges]], kind="stable")]
+    edge_levels = levels[dst[edge_order]]
+    sup_max = np.full(n, -np.inf)
+    sup_min = np.full(n, np.inf)
+    opp_max = np.full(n, -np.inf)
+    for nodes in _iter_levels(levels, mutable_nodes):
+        level = levels[nodes[0]]
+        lo, hi = np.searchsorted(edge_levels, [level, level + 1])
+        edges = edge_order[lo:hi]
+        edges = edges[~np.isnan(positive[src[edges]])]
+        sup = edges[is_support[edges]]
+        opp = edges[~is_support[edges]]
+        np.maximum.at(sup_max, dst[sup], positive[src[sup]])
+        np.minimum.at(sup_min, dst[sup], positive[src[sup]])
+        np.maximum.at(opp_max, dst[opp], positive[src[opp]])
+
+        son_pos = np.where(logic_and[nodes], sup_min[nodes], sup_max[nodes])
+        son_pos[np.isinf(son_pos)] = np.nan
+        son_neg = opp_max[nodes]
+        son_neg[np.isinf(son_neg)] = np.nan
+        son_positive[nodes] = son_pos
+        son_negative[nodes] = son_neg
+
+        parts = np.stack([son_pos, 1 - son_neg])
+        count = np.sum(~np.isnan(parts), axis=0)
+        total = np.nansum(parts, axis=0)
+        has_son = count > 0
+        positive[nodes[has_son]] = total[has_son] / count[has_son]
+
+    # 反证分：父节点先于子节点，逐层计算
+    levels = _topological_levels(n, dst[inner], src[inner])
+    out_edges = np.flatnonzero(mutable[src])
+    edge_order = out_edges[np.argsort(levels[src[out_edges]], kind="stable")]
+    edge_levels = levels[src[edge_order]]
+    negative_min = np.full(n, np.inf)
+    for nodes in _iter_levels(levels, mutable_nodes):
+        level = levels[nodes[0]]
+        lo, hi = np.searchsorted(edge_levels, [level, level + 1])
+        edges = edge_order[lo:hi]
+        sons, parents = src[edges], dst[edges]
+        # AND 父节点只向其最小的支持子节点传递反证分
+        passes = is_support[edges] & (
+            ~logic_and[parents] | (positive[sons] <= son_positive[parents] + 1e-6)
+        )
+        sup = edges[passes]
+        opp = edges[~is_support[edges]]
+        for contrib_edges, values in (
+            (sup, negative[dst[sup]]),
+            (sup, 1 - son_negative[dst[sup]]),
+            (opp, 1 - negative[dst[opp]]),
+            (opp, 1 - son_positive[dst[opp]]),
+        ):
+            valid = ~np.isnan(values)
+            np.minimum.at(negative_min, src[contrib_edges[valid]], values[valid])
+        neg = negative_min[nodes]
+        neg[np.isinf(neg)] = np.nan
+        negative[nodes] = neg
+
+    return positive, negative, son_positive, son_negative
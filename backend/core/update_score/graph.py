@@ -0,0 +1,189 @@
+from core.utils.math import avg_of_list, min_of_list, revert_score, is_same
+
+
+class ScoreGraph:
+    """
+    An in-memory view of a region of the opinion graph.
+
+    Nodes are addressed by their index in the parallel arrays. Links always point
+    from the son opinion to the parent opinion, exactly like in Neo4j, so that
+    ``supports[i]`` lists the parents that node ``i`` supports and
+    ``supported_by[i]`` lists the sons supporting node ``i``.
+
+    Nodes that are not ``mutable`` only provide their scores as fixed inputs
+    (e.g. parents outside the loaded region) and are never recomputed.
+    """
+
+    def __init__(self):
+        self.uids: list[str] = []
+        self.index: dict[str, int] = {}
+        self.logic_type: list[str] = []
+        self.positive: list[float | None] = []
+        self.negative: list[float | None] = []
+        self.son_positive: list[float | None] = []
+        self.son_negative: list[float | None] = []
+        self.mutable: list[bool] = []
+        self.supports: list[list[int]] = []
+        self.opposes: list[list[int]] = []
+        self.supported_by: list[list[int]] = []
+        self.opposed_by: list[list[int]] = []
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    def add_node(
+        self,
+        uid: str,
+        logic_type: str,
+        positive: float | None = None,
+        negative: float | None = None,
+        son_positive: float | None = None,
+        son_negative: float | None = None,
+        mutable: bool = True,
+    ) -> int:
+        """
+        Add a node to the graph and return its index.
+        """
+        idx = len(self.uids)
+        self.uids.append(uid)
+        self.index[uid] = idx
+        self.logic_type.append(logic_type)
+        self.positive.append(positive)
+        self.negative.append(negative)
+        self.son_positive.append(son_positive)
+        self.son_negative.append(son_negative)
+        self.mutable.append(mutable)
+        self.supports.append([])
+        self.opposes.append([])
+        self.supported_by.append([])
+        self.opposed_by.append([])
+        return idx
+
+    def add_edge(self, from_idx: int, to_idx: int, link_type: str):
+        """
+        Add a link from the son node `from_idx` to the parent node `to_idx`.
+        """
+        if link_type == "supports":
+            self.supports[from_idx].append(to_idx)
+            self.supported_by[to_idx].append(from_idx)
+        elif link_type == "opposes":
+            self.opposes[from_idx].append(to_idx)
+            self.opposed_by[to_idx].append(from_idx)
+        else:
+            raise ValueError(f"Unsupported link type: {link_type}")
+
+    def parents(self, idx: int) -> list[int]:
+        return self.supports[idx] + self.opposes[idx]
+
+    def sons(self, idx: int) -> list[int]:
+        return self.supported_by[idx] + self.opposed_by[idx]
+
+    def ancestors(self, sources: list[int]) -> set[int]:
+        """
+        Collect the mutable sources and all their mutable ancestors.
+        """
+        visited = set()
+        stack = [i for i in sources if self.mutable[i]]
+        while stack:
+            i = stack.pop()
+            if i in visited:
+                continue
+            visited.add(i)
+            stack.extend(p for p in self.parents(i) if self.mutable[p])
+        return visited
+
+    def topological_order(self, nodes: set[int]) -> list[int]:
+        """
+        Order the given nodes so that every son comes before its parents.
+
+        Only links between the given nodes are considered.
+
+        Raises:
+            ValueError: If the nodes contain a cycle.
+        """
+        in_degree = {
+            i: sum(1 for son in self.sons(i) if son in nodes) for i in nodes
+        }
+        order = [i for i in nodes if in_degree[i] == 0]
+        for i in order:  # order grows while iterating
+            for parent in self.parents(i):
+                if parent in in_degree:
+                    in_degree[parent] -= 1
+                    if in_degree[parent] == 0:
+                        order.append(parent)
+        if len(order) != len(nodes):
+            raise ValueError("The opinion graph contains a cycle.")
+        return order
+
+    def compute_son_scores(self, idx: int) -> tuple[float | None, float | None]:
+        """
+        Calculate the son_positive_score and son_negative_score of a node from its sons.
+
+        Supporting sons are combined with max for OR nodes and min for AND nodes,
+        opposing sons are always combined with max.
+        """
+        support_scores = [
+            self.positive[son]
+            for son in self.supported_by[idx]
+            if self.positive[son] is not None
+        ]
+        if not support_scores:
+            son_positive = None
+        elif self.logic_type[idx] == "or":
+            son_positive = max(support_scores)  # type: ignore
+        elif self.logic_type[idx] == "and":
+            son_positive = min(support_scores)  # type: ignore
+        else:
+            raise ValueError("logic_type must be 'or' or 'and'")
+
+        oppose_scores = [
+            self.positive[son]
+            for son in self.opposed_by[idx]
+            if self.positive[son] is not None
+        ]
+        son_negative = max(oppose_scores) if oppose_scores else None  # type: ignore
+        return son_positive, son_negative
+
+    def compute_positive_score(self, idx: int) -> float | None:
+        """
+        Calculate the positive score of a node from its son scores.
+        """
+        return avg_of_list(
+            [self.son_positive[idx], revert_score(self.son_negative[idx])]
+        )
+
+    def compute_negative_score(self, idx: int) -> float | None:
+        """
+        Calculate the negative score of a node from its parents.
+
+        A supported OR parent passes down its negative score and its reverted
+        son_negative_score. An AND parent only does so to its minimum sons.
+        An opposed parent passes down its reverted negative and son_positive scores.
+        """
+        score_list = []
+        positive = self.positive[idx]
+        for parent in self.supports[idx]:
+            if self.logic_type[parent] == "or" or (
+                self.logic_type[parent] == "and"
+                and self.son_positive[parent] is not None
+                and positive is not None
+                and (
+                    positive <= self.son_positive[parent]  # type: ignore
+                    or is_same(positive, self.son_positive[parent])
+                )
+            ):
+                score_list.append(self.negative[parent])
+                score_list.append(revert_score(self.son_negative[parent]))
+        for parent in self.opposes[idx]:
+            score_list.append(revert_score(self.negative[parent]))
+            score_list.append(revert_score(self.son_positive[parent]))
+        return min_of_list(score_list)
+
+
+def is_changed(old: float | None, new: float | None) -> bool:
+    """
+    Check if a score has changed, treating None as a real value.
+    """
+    if old is None and new is None:
+        return False
+    return not is_same(old, new)
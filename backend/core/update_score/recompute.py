@@ -0,0 +1,156 @@
+import time
+import numpy as np
+from neomodel import db
+from core.debate import get_global_debate
+from core.utils.membership import membership_cache
+from core.utils.debate_version import bump_versions
+from .engine import WRITE_QUERY, propagate_scores
+from .evaluate import evaluate_scores, _to_array
+
+WRITE_BATCH_SIZE = 5000
+
+# 全辩论与其他辩论分开查询，使后者能用 uid 索引定位节点
+ALL_NODES_QUERY = """
+MATCH (n:Opinion)
+RETURN n.uid, n.logic_type, n.positive_score, n.negative_score,
+       n.son_positive_score, n.son_negative_score
+"""
+
+NODES_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids
+RETURN n.uid, n.logic_type, n.positive_score, n.negative_score,
+       n.son_positive_score, n.son_negative_score
+"""
+
+# 有向匹配使每条边只返回一次
+ALL_LINKS_QUERY = """
+MATCH (s:Opinion)-[r:supports|opposes]->(t:Opinion)
+RETURN s.uid, t.uid, type(r)
+"""
+
+# 起点在辩论内的边
+OUTGOING_LINKS_QUERY = """
+MATCH (s:Opinion) WHERE s.uid IN $uids
+MATCH (s)-[r:supports|opposes]->(t:Opinion)
+RETURN s.uid, t.uid, type(r)
+"""
+
+# 只有终点在辩论内的边，与上一查询合起来每条边只返回一次
+INCOMING_LINKS_QUERY = """
+MATCH (t:Opinion) WHERE t.uid IN $uids
+MATCH (s:Opinion)-[r:supports|opposes]->(t)
+WHERE NOT s.uid IN $uids
+RETURN s.uid, t.uid, type(r)
+"""
+
+
+def _to_score(value: float) -> float | None:
+    return None if np.isnan(value) else float(value)
+
+
+def recompute_scores(debate_id: str | None = None) -> dict:
+    """
+    Rebuild the scores of all opinions in a debate from their leaves.
+
+    The debate is exported from Neo4j into NumPy arrays, evaluated level by
+    level in topological order and written back in batches. Opinions outside
+    the debate are only used as fixed inputs, and are repaired afterwards by
+    incremental propagation if they depend on a changed opinion.
+
+    Args:
+        debate_id (str | None): ID of the debate, the global debate if None.
+
+    Returns:
+        dict: Statistics of the run, including the processing rate in nodes per second.
+    """
+    start_time = time.perf_counter()
+    global_debate_id = get_global_debate()
+    if debate_id is None or debate_id == global_debate_id:
+        uids = None
+    else:
+        uids = membership_cache.members(debate_id)
+
+    # 导出节点与至少一端在辩论内的边
+    if uids is None:
+        node_rows, _ = db.cypher_query(ALL_NODES_QUERY)
+        link_rows, _ = db.cypher_query(ALL_LINKS_QUERY)
+    else:
+        node_rows, _ = db.cypher_query(NODES_QUERY, {"uids": uids})
+        link_rows, _ = db.cypher_query(OUTGOING_LINKS_QUERY, {"uids": uids})
+        incoming_rows, _ = db.cypher_query(INCOMING_LINKS_QUERY, {"uids": uids})
+        link_rows += incoming_rows
+    index = {row[0]: i for i, row in enumerate(node_rows)}
+    rows = [list(row) for row in node_rows]
+    num_inner = len(rows)
+    # 边另一端的辩论外节点作为固定输入单独加载
+    outside = {uid for row in link_rows for uid in row[:2] if uid not in index}
+    if outside:
+        outside_rows, _ = db.cypher_query(NODES_QUERY, {"uids": list(outside)})
+        for row in outside_rows:
+            index[row[0]] = len(rows)
+            rows.append(list(row))
+    load_time = time.perf_counter()
+
+    mutable = np.arange(len(rows)) < num_inner
+    logic_and = np.array([row[1] == "and" for row in rows], dtype=bool)
+    # 辩论外节点保留原有分数作为固定输入
+    old_scores = [_to_array([row[k] for row in rows]) for k in range(2, 6)]
+    src = np.array([index[row[0]] for row in link_rows], dtype=np.int64)
+    dst = np.array([index[row[1]] for row in link_rows], dtype=np.int64)
+    is_support = np.array([row[2] == "supports" for row in link_rows], dtype=bool)
+    positive, negative, son_positive, son_negative = evaluate_scores(
+        logic_and, *old_scores, mutable, src, dst, is_support
+    )
+    new_scores = [positive, negative, son_positive, son_negative]
+    compute_time = time.perf_counter()
+
+    # 批量写回有变化的节点
+    changed = np.zeros(len(rows), dtype=bool)
+    for new, old in zip(new_scores, old_scores):
+        both_nan = np.isnan(new) & np.isnan(old)
+        changed |= ~both_nan & ~(np.abs(new - old) < 1e-6)
+    changed &= mutable
+    changed_idx = np.flatnonzero(changed)
+    for begin in range(0, changed_idx.size, WRITE_BATCH_SIZE):
+        batch = changed_idx[begin : begin + WRITE_BATCH_SIZE]
+        db.cypher_query(
+            WRITE_QUERY,
+            {
+                "rows": [
+                    {
+                        "uid": rows[i][0],
+                        "positive_score": _to_score(positive[i]),
+                        "negative_score": _to_score(negative[i]),
+                        "son_positive_score": _to_score(son_positive[i]),
+                        "son_negative_score": _to_score(son_negative[i]),
+                    }
+                    for i in batch
+                ]
+            },
+        )
+
+    # 修复依赖于本辩论的辩论外节点
+    if uids is not None:
+        frontier = {
+            rows[s][0]
+            for s, d in zip(src, dst)
+            if (changed[s] and not mutable[d]) or (changed[d] and not mutable[s])
+        }
+        if frontier:
+            propagate_scores(list(frontier), {})
+    bump_versions(
+        debate_ids=[debate_id or global_debate_id],
+        opinion_ids=[rows[i][0] for i in changed_idx],
+    )
+    end_time = time.perf_counter()
+
+    elapsed = end_time - start_time
+    return {
+        "nodes": num_inner,
+        "links": len(link_rows),
+        "updated": int(changed_idx.size),
+        "load_seconds": round(load_time - start_time, 3),
+        "compute_seconds": round(compute_time - load_time, 3),
+        "write_seconds": round(end_time - compute_time, 3),
+        "nodes_per_second": round(num_inner / elapsed, 1) if elapsed > 0 else None,
+    }
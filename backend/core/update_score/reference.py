@@ -0,0 +1,262 @@
+import random
+
+# 参考实现：不依赖数据库、NumPy 与评分引擎的其他模块，
+# 每次修改后按定义对全图迭代至不动点，用于与增量引擎做差分测试
+
+TOLERANCE = 1e-6
+
+
+class ReferenceGraph:
+    """
+    A plain-array model of the opinion graph with a naive reference scorer.
+
+    Every mutation mirrors one core operation, and afterwards all scores are
+    re-evaluated over the whole graph by fixed-point iteration, straight from
+    the scoring rules:
+
+    - The son_positive_score of a node is the max (OR) or min (AND) positive
+      score of its scored supporting sons, its son_negative_score the max
+      positive score of its scored opposing sons.
+    - A node with a scored son has as positive score the mean of its
+      son_positive_score and its reverted son_negative_score. A node without
+      one keeps the score given to it, which is lost once it is computed.
+    - The negative score of a node is the minimum over its parents of: the
+      negative score and reverted son_negative_score of a supported OR parent,
+      or of a supported AND parent whose son_positive_score it attains; the
+      reverted negative score and reverted son_positive_score of an opposed parent.
+
+    Deleted nodes keep their index, so indices stay valid across mutations.
+    """
+
+    def __init__(self):
+        self.logic_type: list[str] = []
+        self.alive: list[bool] = []
+        self.given: list[float | None] = []
+        self.positive: list[float | None] = []
+        self.negative: list[float | None] = []
+        self.son_positive: list[float | None] = []
+        self.son_negative: list[float | None] = []
+        # (son, parent) -> "supports" | "opposes"
+        self.links: dict[tuple[int, int], str] = {}
+
+    def __len__(self) -> int:
+        return len(self.alive)
+
+    def nodes(self) -> list[int]:
+        return [i for i in range(len(self)) if self.alive[i]]
+
+    def sons(self, idx: int) -> list[tuple[int, str]]:
+        return [(s, t) for (s, p), t in self.links.items() if p == idx]
+
+    def parents(self, idx: int) -> list[tuple[int, str]]:
+        return [(p, t) for (s, p), t in self.links.items() if s == idx]
+
+    def reaches(self, from_idx: int, to_idx: int) -> bool:
+        """
+        Check whether there is a path of links from `from_idx` to `to_idx`.
+        """
+        stack, seen = [from_idx], set()
+        while stack:
+            i = stack.pop()
+            if i == to_idx:
+                return True
+            if i not in seen:
+                seen.add(i)
+                stack.extend(p for p, _ in self.parents(i))
+        return False
+
+    # 修改操作，与核心函数一一对应
+
+    def add_or(self, score: float | None = None) -> int:
+        """`create_or_opinion`"""
+        return self._add_node("or", score)
+
+    def add_and(self, son_ids: list[int], parent_id: int, link_type: str) -> int:
+        """`create_and_opinion`"""
+        for i in son_ids + [parent_id]:
+            self._check_alive(i)
+        if any(self.reaches(parent_id, son) for son in son_ids):
+            raise ValueError("The AND opinion would create a cycle.")
+        idx = self._add_node("and", None)
+        for son in son_ids:
+            self.links[(son, idx)] = "supports"
+        self.links[(idx, parent_id)] = link_type
+        self.evaluate()
+        return idx
+
+    def add_link(self, from_id: int, to_id: int, link_type: str):
+        """`create_link`"""
+        self._check_alive(from_id)
+        self._check_alive(to_id)
+        if from_id == to_id or self.reaches(to_id, from_id):
+            raise ValueError("The link would create a cycle.")
+        if (from_id, to_id) in self.links:
+            raise ValueError("The opinions are already linked.")
+        self.links[(from_id, to_id)] = link_type
+        self.evaluate()
+
+    def remove_link(self, from_id: int, to_id: int):
+        """`delete_link`"""
+        del self.links[(from_id, to_id)]
+        self.evaluate()
+
+    def remove_opinion(self, idx: int):
+        """`delete_opinion` in the global debate"""
+        self._check_alive(idx)
+        self.alive[idx] = False
+        self.links = {k: t for k, t in self.links.items() if idx not in k}
+        self.evaluate()
+
+    def set_score(self, idx: int, score: float | None):
+        """`patch_opinion` of a leaf"""
+        self._check_alive(idx)
+        if self.sons(idx):
+            raise ValueError("Only leaf opinions can be scored.")
+        self.given[idx] = score
+        self.evaluate()
+
+    def _add_node(self, logic_type: str, score: float | None) -> int:
+        self.logic_type.append(logic_type)
+        self.alive.append(True)
+        self.given.append(score)
+        self.positive.append(score)
+        self.negative.append(None)
+        self.son_positive.append(None)
+        self.son_negative.append(None)
+        return len(self) - 1
+
+    def _check_alive(self, idx: int):
+        if not 0 <= idx < len(self) or not self.alive[idx]:
+            raise ValueError(f"Opinion {idx} does not exist.")
+
+    # 评分
+
+    def evaluate(self):
+        """
+        Re-evaluate every score of the graph from the scoring rules.
+        """
+        nodes = self.nodes()
+        sons = {i: self.sons(i) for i in nodes}
+        parents = {i: self.parents(i) for i in nodes}
+
+        # 正证分只依赖后代，迭代次数不超过图的深度
+        for _ in range(len(nodes) + 1):
+            stable = True
+            for i in nodes:
+                supports = [self.positive[s] for s, t in sons[i] if t == "supports"]
+                supports = [v for v in supports if v is not None]
+                opposes = [self.positive[s] for s, t in sons[i] if t == "opposes"]
+                opposes = [v for v in opposes if v is not None]
+                son_positive = None
+                if supports:
+                    son_positive = max(supports) if self.logic_type[i] == "or" else min(supports)
+                son_negative = max(opposes) if opposes else None
+                parts = [v for v in (son_positive, _revert(son_negative)) if v is not None]
+                positive = sum(parts) / len(parts) if parts else self.given[i]
+                new = (positive, son_positive, son_negative)
+                old = (self.positive[i], self.son_positive[i], self.son_negative[i])
+                if any(not _same(a, b) for a, b in zip(new, old)):
+                    stable = False
+                    self.positive[i], self.son_positive[i], self.son_negative[i] = new
+            if stable:
+                break
+
+        # 反证分只依赖祖先
+        for _ in range(len(nodes) + 1):
+            stable = True
+            for i in nodes:
+                candidates = []
+                for p, t in parents[i]:
+                    if t == "supports":
+                        if self.logic_type[p] == "and" and not (
+                            self.positive[i] is not None
+                            and self.son_positive[p] is not None
+                            and self.positive[i] <= self.son_positive[p] + TOLERANCE
+                        ):
+                            continue
+                        candidates += [self.negative[p], _revert(self.son_negative[p])]
+                    else:
+                        candidates += [_revert(self.negative[p]), _revert(self.son_positive[p])]
+                candidates = [v for v in candidates if v is not None]
+                negative = min(candidates) if candidates else None
+                if not _same(negative, self.negative[i]):
+                    stable = False
+                    self.negative[i] = negative
+            if stable:
+                break
+
+        # 一旦由子节点计算得出，原先给定的分数即被覆盖
+        for i in nodes:
+            if self.son_positive[i] is not None or self.son_negative[i] is not None:
+                self.given[i] = None
+
+    def scores(self, idx: int) -> tuple[float | None, float | None, float | None, float | None]:
+        """
+        Get the positive, negative, son_positive and son_negative scores of a node.
+        """
+        return (
+            self.positive[idx],
+            self.negative[idx],
+            self.son_positive[idx],
+            self.son_negative[idx],
+        )
+
+
+def _revert(score: float | None) -> float | None:
+    return None if score is None else 1 - score
+
+
+def _same(a: float | None, b: float | None) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    return abs(a - b) < TOLERANCE
+
+
+def random_score(rng: random.Random, allow_none: bool = True) -> float | None:
+    if allow_none and rng.random() < 0.1:
+        return None
+    # 0 会被 create_or_opinion 当作未评分，不生成
+    return rng.randint(1, 20) / 20
+
+
+def random_mutation(rng: random.Random, graph: ReferenceGraph) -> tuple:
+    """
+    Draw a random mutation that is valid for the graph.
+
+    Returns:
+        tuple: The operation name followed by its arguments, e.g.
+            ("add_link", from_id, to_id, "supports"). Apply it with
+            `getattr(graph, op)(*args)`.
+    """
+    or_nodes = [i for i in graph.nodes() if graph.logic_type[i] == "or"]
+    leaves = [i for i in or_nodes if not graph.sons(i)]
+    while True:
+        op = rng.choices(
+            ["add_or", "add_link", "add_and", "set_score", "remove_link", "remove_opinion"],
+            weights=[3, 5, 2, 3, 2, 1],
+        )[0]
+        link_type = "supports" if rng.random() < 0.6 else "opposes"
+        if op == "add_or" or len(or_nodes) < 3:
+            return ("add_or", random_score(rng))
+        if op == "add_link":
+            from_id, to_id = rng.sample(or_nodes, 2)
+            if (from_id, to_id) not in graph.links and not graph.reaches(to_id, from_id):
+                return ("add_link", from_id, to_id, link_type)
+        elif op == "add_and":
+            parent_id = rng.choice(or_nodes)
+            candidates = [i for i in or_nodes if not graph.reaches(parent_id, i)]
+            if len(candidates) >= 2:
+                sons = rng.sample(candidates, rng.randint(2, min(3, len(candidates))))
+                return ("add_and", sons, parent_id, link_type)
+        elif op == "set_score" and leaves:
+            return ("set_score", rng.choice(leaves), random_score(rng))
+        elif op == "remove_link":
+            # 与节点的链随与节点一起删除
+            links = [
+                k for k in graph.links
+                if graph.logic_type[k[0]] == "or" and graph.logic_type[k[1]] == "or"
+            ]
+            if links:
+                return ("remove_link", *rng.choice(links))
+        elif op == "remove_opinion":
+            return ("remove_opinion", rng.choice(or_nodes))
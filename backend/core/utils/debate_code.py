@@ -0,0 +1,51 @@
+def parse_debate_code(debate_code: str):
+    """
+    解析辩论图代码，返回观点列表和链关系列表
+    观点格式: id:内容
+    链格式: a1->a2, a1->!a2, a1|a2->a3, a1&a2->a3
+    """
+    opinions = []
+    links = []
+    for line in debate_code.split(";"):
+        line = line.strip()
+        if not line:
+            continue
+        if ":" in line and "->" not in line:
+            # 观点
+            oid, content = line.split(":", 1)
+            opinions.append({"id": oid.strip(), "content": content.strip()})
+        elif "->" in line:
+            links.append(line)
+    return opinions, links
+
+
+def parse_link(link: str) -> tuple[list[str], str, str, bool]:
+    """
+    Parse one link of the debate code.
+
+    :param link: The link, e.g. "a1->a2", "a1->!a2", "a1|a2->a3" or "a1&a2->a3".
+    :return: The source keys, the target key, the link type ("supports" or "opposes")
+        and whether the sources are combined with AND.
+    """
+    if link.count("->") != 1:
+        raise ValueError(f"Invalid link: {link}")
+    left, right = (part.strip() for part in link.split("->"))
+    link_type = "supports"
+    if right.startswith("!"):
+        link_type = "opposes"
+        right = right[1:].strip()
+    is_and = "&" in left
+    if is_and and "|" in left:
+        raise ValueError(f"Cannot mix '&' and '|' in one link: {link}")
+    from_keys = [key.strip() for key in left.replace("&", "|").split("|")]
+    if not right or not all(from_keys):
+        raise ValueError(f"Invalid link: {link}")
+    return from_keys, right, link_type, is_and
+
+
+def leaf_keys(opinions: list[dict], links: list[str]) -> list[str]:
+    """
+    Get the keys of the opinions that no link points to.
+    """
+    targets = {parse_link(link)[1] for link in links}
+    return [op["id"] for op in opinions if op["id"] not in targets]
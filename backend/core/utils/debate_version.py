@@ -0,0 +1,87 @@
+import threading
+from contextlib import contextmanager
+from sqlalchemy import select, update
+from core.db_life import get_psql_session
+from schemas.db.psql import Debate, debate_opinion_association
+
+# 每个辩论的版本号：成员、内容、分数或链变化并写入后递增，辩论图接口以其作为ETag
+# 只递增受影响的辩论，未变化的辩论仍可命中客户端缓存
+
+_deferred = threading.local()
+
+
+def _bump_statement(debate_ids: set[str], opinion_ids: set[str]):
+    association = debate_opinion_association.c
+    conditions = []
+    if debate_ids:
+        conditions.append(Debate.id.in_(list(debate_ids)))
+    if opinion_ids:
+        conditions.append(
+            Debate.id.in_(
+                select(association.debate_id).where(
+                    association.opinion_id.in_(list(opinion_ids))
+                )
+            )
+        )
+    condition = conditions[0] if len(conditions) == 1 else conditions[0] | conditions[1]
+    return update(Debate).where(condition).values(version=Debate.version + 1)
+
+
+def bump_versions_in(session, debate_ids=(), opinion_ids=()):
+    """
+    Bump the debates in the transaction of `session`, e.g. before the
+    opinions are deleted and their debates can no longer be found.
+    """
+    debate_ids, opinion_ids = set(map(str, debate_ids)), set(map(str, opinion_ids))
+    if debate_ids or opinion_ids:
+        session.execute(_bump_statement(debate_ids, opinion_ids))
+
+
+def bump_versions(debate_ids=(), opinion_ids=()):
+    """
+    Mark the given debates, and the debates citing the given opinions, as changed.
+
+    Must be called after the change is written, so that no reader sees the new
+    version with the old graph. Inside `defer_bumps`, the bump is delayed until
+    the block exits.
+    """
+    pending = getattr(_deferred, "pending", None)
+    if pending is not None:
+        pending[0].update(map(str, debate_ids))
+        pending[1].update(map(str, opinion_ids))
+        return
+    if not debate_ids and not opinion_ids:
+        return
+    with get_psql_session() as psql_session:
+        try:
+            bump_versions_in(psql_session, debate_ids, opinion_ids)
+            psql_session.commit()
+        except Exception:
+            psql_session.rollback()
+            raise
+
+
+@contextmanager
+def defer_bumps():
+    """
+    Collect the bumps made in the block and apply them once it exits, e.g.
+    after the Neo4j transaction of the block has committed.
+    """
+    if getattr(_deferred, "pending", None) is not None:
+        yield
+        return
+    _deferred.pending = (set(), set())
+    try:
+        yield
+    finally:
+        debate_ids, opinion_ids = _deferred.pending
+        _deferred.pending = None
+        bump_versions(debate_ids, opinion_ids)
+
+
+def get_debate_version(debate_id: str) -> int | None:
+    """
+    Get the version of a debate, None if the debate does not exist.
+    """
+    with get_psql_session() as psql_session:
+        return psql_session.scalar(select(Debate.version).where(Debate.id == debate_id))
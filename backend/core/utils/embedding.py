@@ -0,0 +1,364 @@
+import os
+import time
+import zlib
+import threading
+import numpy as np
+from neomodel import db
+from .llm_cache import normalize_text
+from .membership import membership_cache
+from config_private import (
+    EMBEDDING_MODEL,
+    EMBEDDING_DIM,
+    EMBEDDING_INDEX_PATH,
+    EMBEDDING_SAVE_EVERY,
+    EMBEDDING_SAVE_INTERVAL,
+)
+
+# 散列特征使用的字符 n-gram 长度，中文以单字与双字、三字片段表示语义
+NGRAM_SIZES = (1, 2, 3)
+# 限定辩论的查询时，每轮按相似度顺序取出并过滤的候选数
+CANDIDATE_BATCH = 256
+
+# 只索引或观点，与观点的内容只是“与”或“与非”
+ALL_OPINIONS_QUERY = """
+MATCH (n:Opinion {logic_type: 'or'})
+RETURN n.uid, n.content
+"""
+
+
+class HashedNgramEmbedder:
+    """
+    Embed texts by hashing their character n-grams into a fixed-size vector.
+
+    It needs no model and no network, and texts sharing many n-grams, e.g. the
+    same statement with a few words changed, get close vectors.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.name = f"hashed-ngram-{dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            text = normalize_text(text).lower()
+            buckets, signs = [], []
+            for n in NGRAM_SIZES:
+                for i in range(len(text) - n + 1):
+                    h = zlib.crc32(text[i : i + n].encode())
+                    buckets.append(h % self.dim)
+                    # 用散列的另一位决定符号，使冲突相互抵消
+                    signs.append(1.0 if (h >> 31) & 1 else -1.0)
+            if buckets:
+                np.add.at(vectors[row], buckets, signs)
+        return _normalize(vectors)
+
+
+class ModelEmbedder:
+    """
+    Embed texts with a local sentence-transformers model, run on the CPU.
+    """
+
+    def __init__(self, path: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise RuntimeError(
+                "EMBEDDING_MODEL is set but sentence-transformers is not installed."
+            ) from e
+        self.model = SentenceTransformer(path, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"model-{os.path.basename(os.path.normpath(path))}-{self.dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            [normalize_text(text) for text in texts], convert_to_numpy=True
+        )
+        return _normalize(vectors.astype(np.float32))
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _checksum(content: str) -> int:
+    return zlib.crc32(content.encode())
+
+
+class VectorIndex:
+    """
+    A flat in-memory index of opinion embeddings, persisted to an .npz file.
+
+    Vectors are normalized, so the cosine similarity of a query against all
+    opinions is one matrix-vector product. A checksum of the indexed content is stored
+    with every row, so the index can be reconciled with Neo4j at startup.
+
+    The file is written in the background after `save_every` changes or
+    `save_interval` seconds since the last save, whichever comes first, and at
+    shutdown. Changes lost in a crash are rebuilt by `reconcile` at the next load.
+    """
+
+    def __init__(
+        self,
+        embedder,
+        path: str,
+        save_every: int | None = None,
+        save_interval: float | None = None,
+    ):
+        self.embedder = embedder
+        self.path = path
+        self.save_every = save_every
+        self.save_interval = save_interval
+        # 缓冲区按倍数扩容，前 len(self._ids) 行有效，单个插入无需复制整个矩阵
+        self._vectors = np.zeros((0, embedder.dim), dtype=np.float32)
+        self._checksums = np.zeros(0, dtype=np.uint32)
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        # 上次保存以来的修改条数与保存时刻，保存文件时持有 _save_lock，避免并发写同一临时文件
+        self._changes = 0
+        self._saved_at = time.monotonic()
+        self._save_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _reserve(self, size: int):
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 64)
+        vectors = np.zeros((capacity, self.embedder.dim), dtype=np.float32)
+        vectors[: len(self._ids)] = self._vectors[: len(self._ids)]
+        checksums = np.zeros(capacity, dtype=np.uint32)
+        checksums[: len(self._ids)] = self._checksums[: len(self._ids)]
+        self._vectors, self._checksums = vectors, checksums
+
+    def upsert(self, items: list[tuple[str, str]]):
+        """
+        Add opinions to the index or update their content.
+
+        :param items: Pairs of opinion ID and content.
+        """
+        if not items:
+            return
+        vectors = self.embedder.embed([content for _, content in items])
+        checksums = [_checksum(content) for _, content in items]
+        with self._lock:
+            self._reserve(len(self._ids) + len(items))
+            for (opinion_id, _), vector, checksum in zip(items, vectors, checksums):
+                row = self._rows.get(opinion_id)
+                if row is None:
+                    row = self._rows[opinion_id] = len(self._ids)
+                    self._ids.append(opinion_id)
+                self._vectors[row] = vector
+                self._checksums[row] = checksum
+            self._dirty = True
+            self._changes += len(items)
+        self._maybe_save()
+
+    def remove(self, opinion_ids: list[str]):
+        """
+        Remove opinions from the index, ignoring those not in it.
+        """
+        with self._lock:
+            for opinion_id in opinion_ids:
+                row = self._rows.pop(opinion_id, None)
+                if row is None:
+                    continue
+                # 用最后一行填补空缺，保持有效行连续
+                last = len(self._ids) - 1
+                if row != last:
+                    moved_id = self._ids[last]
+                    self._ids[row] = moved_id
+                    self._vectors[row] = self._vectors[last]
+                    self._checksums[row] = self._checksums[last]
+                    self._rows[moved_id] = row
+                self._ids.pop()
+                self._dirty = True
+                self._changes += 1
+        self._maybe_save()
+
+    def _maybe_save(self):
+        """
+        Save in a background thread once enough changes or time accumulated.
+        """
+        with self._lock:
+            due = self._dirty and (
+                (self.save_every is not None and self._changes >= self.save_every)
+                or (
+                    self.save_interval is not None
+                    and time.monotonic() - self._saved_at >= self.save_interval
+                )
+            )
+        # 已有保存在进行时跳过，其后的修改由下一次保存写入
+        if due and not self._save_lock.locked():
+            threading.Thread(
+                target=self.save, name="opinion-index-save", daemon=True
+            ).start()
+
+    def search(
+        self, text: str, k: int, debate_id: str | None = None
+    ) -> list[tuple[str, float]]:
+        """
+        Find the opinions most similar to a text.
+
+        :param text: The text to compare against.
+        :param k: Maximum number of opinions to return.
+        :param debate_id: Optional debate the opinions must belong to.
+        :return: IDs of the opinions with their cosine similarity, most similar first.
+        """
+        query = self.embedder.embed([text])[0]
+        with self._lock:
+            ids = list(self._ids)
+            similarities = self._vectors[: len(ids)] @ query
+        if not ids or k <= 0:
+            return []
+        if not debate_id:
+            top = np.argpartition(-similarities, min(k, len(ids)) - 1)[:k]
+            top = top[np.argsort(-similarities[top], kind="stable")]
+            return [(ids[i], float(similarities[i])) for i in top]
+
+        # 按相似度降序分批取候选，用成员缓存过滤，直到凑够 k 个
+        order = np.argsort(-similarities, kind="stable")
+        results = []
+        for begin in range(0, len(order), max(CANDIDATE_BATCH, k)):
+            batch = order[begin : begin + max(CANDIDATE_BATCH, k)]
+            members = membership_cache.filter(debate_id, [ids[i] for i in batch])
+            for i in batch:
+                if ids[i] in members:
+                    results.append((ids[i], float(similarities[i])))
+                    if len(results) == k:
+                        return results
+        return results
+
+    def save(self):
+        """
+        Write the index to disk if it changed, atomically: the file is written
+        to a temporary path first and then renamed over the old one.
+        """
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                ids = np.array(self._ids, dtype="U36")
+                vectors = self._vectors[: len(ids)].copy()
+                checksums = self._checksums[: len(ids)].copy()
+                self._dirty = False
+                self._changes = 0
+                self._saved_at = time.monotonic()
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    np.savez(
+                        f,
+                        embedder=np.array(self.embedder.name),
+                        ids=ids,
+                        vectors=vectors,
+                        checksums=checksums,
+                    )
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                # 写入失败时保留修改，留给下一次保存
+                with self._lock:
+                    self._dirty = True
+                raise
+
+    def load(self) -> bool:
+        """
+        Read the index from disk.
+
+        :return: Whether a file built with the same embedder was loaded.
+        """
+        if not os.path.exists(self.path):
+            return False
+        with np.load(self.path) as data:
+            if str(data["embedder"]) != self.embedder.name:
+                return False
+            ids = [str(uid) for uid in data["ids"]]
+            vectors = data["vectors"].astype(np.float32)
+            checksums = data["checksums"].astype(np.uint32)
+        with self._lock:
+            self._ids = ids
+            self._rows = {uid: row for row, uid in enumerate(ids)}
+            self._vectors = vectors
+            self._checksums = checksums
+            self._dirty = False
+            self._changes = 0
+        return True
+
+    def reconcile(self, contents: dict[str, str]) -> dict[str, int]:
+        """
+        Bring the index in line with the current contents of all opinions.
+
+        Only new or changed opinions are embedded again.
+
+        :param contents: Content of every opinion that should be indexed.
+        :return: Numbers of opinions added or updated, and removed.
+        """
+        with self._lock:
+            indexed = {uid: int(self._checksums[row]) for uid, row in self._rows.items()}
+        stale = [uid for uid in indexed if uid not in contents]
+        changed = [
+            (uid, content)
+            for uid, content in contents.items()
+            if indexed.get(uid) != _checksum(content)
+        ]
+        self.remove(stale)
+        self.upsert(changed)
+        return {"upserted": len(changed), "removed": len(stale)}
+
+
+def _make_embedder():
+    if EMBEDDING_MODEL:
+        return ModelEmbedder(EMBEDDING_MODEL)
+    return HashedNgramEmbedder(EMBEDDING_DIM)
+
+
+_opinion_index: VectorIndex | None = None
+_opinion_index_lock = threading.Lock()
+
+
+def get_opinion_index() -> VectorIndex:
+    """
+    Get the index of opinions, created on first use so that importing this
+    module loads no model.
+    """
+    global _opinion_index
+    with _opinion_index_lock:
+        if _opinion_index is None:
+            _opinion_index = VectorIndex(
+                _make_embedder(),
+                EMBEDDING_INDEX_PATH,
+                EMBEDDING_SAVE_EVERY,
+                EMBEDDING_SAVE_INTERVAL,
+            )
+        return _opinion_index
+
+
+def load_opinion_index() -> dict[str, int]:
+    """
+    Load the index from disk and reconcile it with the opinions in Neo4j.
+
+    Opinions missing from the file, e.g. written after the last save before a
+    crash, or whose content changed since, are embedded again, and opinions
+    no longer in Neo4j are dropped, so the file may lag behind at any time.
+
+    :return: Numbers of opinions indexed, added or updated, and removed.
+    """
+    index = get_opinion_index()
+    index.load()
+    results, _ = db.cypher_query(ALL_OPINIONS_QUERY)
+    stats = index.reconcile({uid: content or "" for uid, content in results})
+    index.save()
+    return {"indexed": len(index), **stats}
+
+
+def save_opinion_index():
+    get_opinion_index().save()
@@ -1,8 +1,65 @@
 import re
-from openai import OpenAI
-from config_private import MODEL, BASE_URL, API_KEY, LINK_REASONABLENESS_THRESHOLD
+import time
+import asyncio
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultAsyncHttpxClient
+from config_private import (
+    MODEL,
+    BASE_URL,
+    API_KEY,
+    LINK_REASONABLENESS_THRESHOLD,
+    LLM_MAX_CONCURRENCY,
+    LLM_TIMEOUT,
+    LLM_MAX_RETRIES,
+)
+from .llm_cache import llm_cache
+from .tracing import record_llm
 
-client = OpenAI(api_key=API_KEY, base_url=BASE_URL)
+# 超时与重试（指数退避）由 openai 客户端负责
+client = OpenAI(
+    api_key=API_KEY,
+    base_url=BASE_URL,
+    timeout=LLM_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+)
+# 异步客户端复用连接池，并用信号量限制同时进行的请求数
+async_client = AsyncOpenAI(
+    api_key=API_KEY,
+    base_url=BASE_URL,
+    timeout=LLM_TIMEOUT,
+    max_retries=LLM_MAX_RETRIES,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=LLM_MAX_CONCURRENCY,
+            max_keepalive_connections=LLM_MAX_CONCURRENCY,
+        )
+    ),
+)
+_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+# 提示词模板版本，修改模板后递增，使旧的缓存结果失效
+PROMPT_VERSIONS = {
+    "score": 1,
+    "or_link": 1,
+    "and_link": 1,
+}
+
+
+def _messages(prompt: str) -> list[dict]:
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _content(resp) -> str:
+    content = resp.choices[0].message.content
+    if not content:
+        raise RuntimeError("Empty response from LLM")
+    return content.strip()
 
 
 def llm_chat(prompt: str) -> str:
@@ -13,34 +70,79 @@ def llm_chat(prompt: str) -> str:
     and returns the assistant text. Errors are propagated to caller.
     """
     global client
-    resp = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a helpful assistant.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        stream=False,
-    )
-    content = resp.choices[0].message.content
-    if not content:
-        raise RuntimeError("Empty response from LLM")
-    return content.strip()
+    start = time.perf_counter()
+    try:
+        resp = client.chat.completions.create(
+            model=MODEL,
+            messages=_messages(prompt),  # type: ignore
+            stream=False,
+        )
+    finally:
+        record_llm(time.perf_counter() - start)
+    return _content(resp)
 
 
-def llm_score(text: str) -> float | None:
-    """Score the input text between 0 and 1 using an LLM.
+async def llm_chat_async(prompt: str) -> str:
+    """Asynchronous variant of `llm_chat` using the pooled client.
 
-    The prompt is designed to make the LLM return a single float number between 0 and 1.
+    At most `LLM_MAX_CONCURRENCY` requests run at the same time, the others wait.
+    """
+    start = time.perf_counter()
+    try:
+        async with _semaphore:
+            resp = await async_client.chat.completions.create(
+                model=MODEL,
+                messages=_messages(prompt),  # type: ignore
+                stream=False,
+            )
+    finally:
+        record_llm(time.perf_counter() - start)
+    return _content(resp)
+
+
+async def close_llm_async():
+    """Close the connection pool of the asynchronous client."""
+    await async_client.close()
+
+
+def _cached_llm_value(kind: str, inputs: list[str], prompt: str, parse) -> float | None:
+    """Return the parsed LLM result from the cache, or ask the LLM and cache it.
+
+    Unparsable results are not cached.
     """
-    prompt = (
+    key = llm_cache.make_key(kind, PROMPT_VERSIONS[kind], *inputs)
+    value = llm_cache.get(key)
+    if value is None:
+        value = parse(llm_chat(prompt))
+        if value is not None:
+            llm_cache.set(key, kind, value)
+    return value
+
+
+async def _cached_llm_value_async(
+    kind: str, inputs: list[str], prompt: str, parse
+) -> float | None:
+    """Asynchronous variant of `_cached_llm_value`, the table is accessed in a thread."""
+    key = llm_cache.make_key(kind, PROMPT_VERSIONS[kind], *inputs)
+    value = llm_cache.get_memory(key)
+    if value is None:
+        value = await asyncio.to_thread(llm_cache.get_db, key)
+    if value is None:
+        value = parse(await llm_chat_async(prompt))
+        if value is not None:
+            await asyncio.to_thread(llm_cache.set, key, kind, value)
+    return value
+
+
+def _score_prompt(text: str) -> str:
+    return (
         "在0到1的范围内评分，其中0表示完全不合理，1表示完全合理。"
         "请对以下陈述进行合理性评分，提供一个介于0到1之间的浮点数，将答案放在<answer></answer>两个tag中。\n\n"
         f"陈述：{text}"
     )
-    response = llm_chat(prompt)
+
+
+def _parse_score(response: str) -> float | None:
     match = re.search(r"<answer>(.*?)</answer>", response, re.DOTALL)
     try:
         if not match:
@@ -53,39 +155,82 @@ def llm_score(text: str) -> float | None:
         return None
 
 
-def is_OR_link_reasonable(
-    from_content: str,
-    to_content: str,
-    link_type: str,
-) -> bool:
-    """Use an LLM to score the OR-link between two opinions from 0 to 1 and compare to a threshold."""
-    prompt = (
+def llm_score(text: str) -> float | None:
+    """Score the input text between 0 and 1 using an LLM.
+
+    The prompt is designed to make the LLM return a single float number between 0 and 1.
+    """
+    return _cached_llm_value("score", [text], _score_prompt(text), _parse_score)
+
+
+async def llm_score_async(text: str) -> float | None:
+    """Asynchronous variant of `llm_score`."""
+    return await _cached_llm_value_async(
+        "score", [text], _score_prompt(text), _parse_score
+    )
+
+
+def _OR_link_prompt(from_content: str, to_content: str, link_type: str) -> str:
+    return (
         "请在0到1的范围内对下面两个观点之间的关系合理性进行评分，0表示完全不合理，1表示完全合理。"
         "将答案放在<answer></answer>两个tag中。\n\n"
         f"观点1：{from_content}\n"
         f"观点2：{to_content}\n"
         f"关系类型：{link_type}\n\n"
     )
-    response = llm_chat(prompt)
+
+
+def _parse_OR_link(response: str) -> float | None:
+    # 缓存原始评分而非结论，阈值调整后缓存仍然有效
     match = re.search(r"<answer>(.*?)</answer>", response, re.DOTALL)
     if not match:
-        return False
+        return None
     try:
         score = float(match.group(1).strip())
     except ValueError:
-        return False
+        return None
     if score < 0 or score > 1:
-        return False
-    return score >= LINK_REASONABLENESS_THRESHOLD
+        return None
+    return score
 
 
-def is_AND_link_reasonable(from_contents: list[str], to_content: str, link_type: str) -> bool:
-    """Check if an AND link between multiple opinions and one opinion is reasonable using an LLM.
+def _is_OR_link_score_reasonable(score: float | None) -> bool:
+    return score is not None and score >= LINK_REASONABLENESS_THRESHOLD
 
-    The prompt is designed to make the LLM return "是" or "否".
-    """
+
+def is_OR_link_reasonable(
+    from_content: str,
+    to_content: str,
+    link_type: str,
+) -> bool:
+    """Use an LLM to score the OR-link between two opinions from 0 to 1 and compare to a threshold."""
+    score = _cached_llm_value(
+        "or_link",
+        [from_content, to_content, link_type],
+        _OR_link_prompt(from_content, to_content, link_type),
+        _parse_OR_link,
+    )
+    return _is_OR_link_score_reasonable(score)
+
+
+async def is_OR_link_reasonable_async(
+    from_content: str,
+    to_content: str,
+    link_type: str,
+) -> bool:
+    """Asynchronous variant of `is_OR_link_reasonable`."""
+    score = await _cached_llm_value_async(
+        "or_link",
+        [from_content, to_content, link_type],
+        _OR_link_prompt(from_content, to_content, link_type),
+        _parse_OR_link,
+    )
+    return _is_OR_link_score_reasonable(score)
+
+
+def _AND_link_prompt(from_contents: list[str], to_content: str, link_type: str) -> str:
     from_text = "\n".join([f"观点{i+1}：{content}" for i, content in enumerate(from_contents)])
-    prompt = (
+    return (
         "请用批判性思维判断多个观点与一个结论观点的关系是否合理。\n\n"
         f"{from_text}\n"
         f"结论观点：{to_content}\n"
@@ -93,9 +238,39 @@ def is_AND_link_reasonable(from_contents: list[str], to_content: str, link_type:
         "如果是支持关系，所有前提观点必须共同蕴含结论观点，反之亦然。"
         "如果关系合理，请回答“是”；如果不合理，请回答“否”，将答案放在<answer></answer>两个tag中。\n\n"
     )
-    response = llm_chat(prompt)
+
+
+def _parse_AND_link(response: str) -> float | None:
+    # 合理记为1.0，不合理记为0.0，以便与评分共用缓存
     match = re.search(r"<answer>(.*?)</answer>", response, re.DOTALL)
     if not match:
-        return False
+        return None
     answer = match.group(1).strip()
-    return answer == "是"
+    return 1.0 if answer == "是" else 0.0
+
+
+def is_AND_link_reasonable(from_contents: list[str], to_content: str, link_type: str) -> bool:
+    """Check if an AND link between multiple opinions and one opinion is reasonable using an LLM.
+
+    The prompt is designed to make the LLM return "是" or "否".
+    """
+    verdict = _cached_llm_value(
+        "and_link",
+        [str(len(from_contents)), *from_contents, to_content, link_type],
+        _AND_link_prompt(from_contents, to_content, link_type),
+        _parse_AND_link,
+    )
+    return verdict == 1.0
+
+
+async def is_AND_link_reasonable_async(
+    from_contents: list[str], to_content: str, link_type: str
+) -> bool:
+    """Asynchronous variant of `is_AND_link_reasonable`."""
+    verdict = await _cached_llm_value_async(
+        "and_link",
+        [str(len(from_contents)), *from_contents, to_content, link_type],
+        _AND_link_prompt(from_contents, to_content, link_type),
+        _parse_AND_link,
+    )
+    return verdict == 1.0
@@ -0,0 +1,126 @@
+import re
+import hashlib
+import datetime
+import threading
+import unicodedata
+from collections import OrderedDict
+from sqlalchemy.dialects.postgresql import insert
+from core.db_life import get_psql_session
+from schemas.db.psql import LlmCache
+from config_private import MODEL, LLM_CACHE_SIZE, LLM_CACHE_TTL
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text so that trivially different inputs share one cache entry.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class LLMCache:
+    """
+    A content-addressed cache of LLM results.
+
+    An in-process LRU sits in front of the `llm_cache` table in PostgreSQL.
+    Keys are derived from the model, the kind and version of the prompt
+    template and the normalized inputs, so changing any of them misses.
+    Errors of the table are ignored, and the caller falls back to the LLM.
+    """
+
+    def __init__(self, max_size: int, ttl: int | None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def make_key(self, kind: str, version: int, *inputs: str) -> str:
+        raw = "\x1f".join([MODEL, kind, str(version), *map(normalize_text, inputs)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl is not None and created_at + self.ttl < datetime.datetime.now().timestamp()
+
+    def _remember(self, key: str, value: float, created_at: float):
+        with self._lock:
+            self._entries[key] = (value, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_memory(self, key: str) -> float | None:
+        """
+        Look up the in-process LRU only, which never blocks on I/O.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._is_expired(entry[1]):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return entry[0]
+
+    def get_db(self, key: str) -> float | None:
+        """
+        Look up the PostgreSQL table, and count a miss if nothing is found.
+        """
+        try:
+            with get_psql_session() as psql_session:
+                row = psql_session.query(LlmCache).filter(LlmCache.key == key).first()
+                if row is not None:
+                    created_at = row.created_at.timestamp()
+                    if not self._is_expired(created_at):
+                        self._remember(key, row.value, created_at)
+                        with self._lock:
+                            self.db_hits += 1
+                        return row.value
+        except Exception as e:
+            print(f"Failed to read LLM cache: {e}")
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def get(self, key: str) -> float | None:
+        value = self.get_memory(key)
+        if value is None:
+            value = self.get_db(key)
+        return value
+
+    def set(self, key: str, kind: str, value: float):
+        now = datetime.datetime.now()
+        self._remember(key, value, now.timestamp())
+        try:
+            with get_psql_session() as psql_session:
+                stmt = insert(LlmCache).values(
+                    key=key, model=MODEL, kind=kind, value=value, created_at=now
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[LlmCache.key],
+                    set_={"value": value, "created_at": now},
+                )
+                psql_session.execute(stmt)
+                psql_session.commit()
+        except Exception as e:
+            print(f"Failed to write LLM cache: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.memory_hits + self.db_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    round((self.memory_hits + self.db_hits) / total, 4) if total else None
+                ),
+            }
+
+
+llm_cache = LLMCache(LLM_CACHE_SIZE, LLM_CACHE_TTL)
@@ -0,0 +1,191 @@
+import time
+import uuid
+import threading
+import numpy as np
+from collections import OrderedDict
+from sqlalchemy import select
+from core.db_life import get_psql_session, async_psql_session
+from schemas.db.psql import debate_opinion_association
+from config_private import MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL
+
+
+def _to_keys(opinion_ids) -> np.ndarray:
+    """
+    Convert opinion IDs into a sorted array of 16-byte keys.
+    """
+    keys = []
+    for opinion_id in opinion_ids:
+        try:
+            keys.append(uuid.UUID(str(opinion_id)).bytes)
+        except ValueError:
+            continue
+    return np.sort(np.array(keys, dtype="S16"))
+
+
+def _to_id(key: bytes) -> str:
+    # numpy 会去掉 S16 末尾的 \x00，需要补齐
+    return str(uuid.UUID(bytes=key.ljust(16, b"\x00")))
+
+
+def _members_query(debate_id: str):
+    return select(debate_opinion_association.c.opinion_id).where(
+        debate_opinion_association.c.debate_id == debate_id
+    )
+
+
+def _filter_keys(members: np.ndarray, opinion_ids) -> set[str]:
+    valid_ids, keys = [], []
+    for opinion_id in opinion_ids:
+        try:
+            keys.append(uuid.UUID(str(opinion_id)).bytes)
+        except ValueError:
+            continue
+        valid_ids.append(str(opinion_id))
+    if not keys or not members.size:
+        return set()
+    keys = np.array(keys, dtype="S16")
+    idx = np.minimum(np.searchsorted(members, keys), members.size - 1)
+    found = members[idx] == keys
+    return {opinion_id for opinion_id, hit in zip(valid_ids, found) if hit}
+
+
+class MembershipCache:
+    """
+    Cache of the opinion IDs belonging to each debate.
+
+    Every debate is stored as a sorted array of 16-byte UUID keys, so a
+    membership check is a binary search. The cache must be updated or
+    invalidated by every write to the `debate_opinion` table.
+
+    The cache lives in one process and is only updated by the writes of that
+    process; writes of other processes (workers, scripts) are not notified,
+    so the TTL bounds how long they may be missed.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        # 值为（过期时刻, 成员键数组）
+        self._members: OrderedDict[str, tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次修改递增，避免并发修改期间载入的旧数据被写入缓存
+        self._version = 0
+
+    def _load(self, debate_id: str) -> np.ndarray:
+        with get_psql_session() as psql_session:
+            rows = psql_session.execute(_members_query(debate_id)).all()
+        return _to_keys(row[0] for row in rows)
+
+    async def _load_async(self, debate_id: str) -> np.ndarray:
+        async with async_psql_session() as psql_session:
+            rows = (await psql_session.execute(_members_query(debate_id))).all()
+        return _to_keys(row[0] for row in rows)
+
+    def _lookup(self, debate_id: str) -> tuple[np.ndarray | None, int]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._members.get(debate_id)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._members[debate_id]
+                return None, self._version
+            self._members.move_to_end(debate_id)
+            return entry[1], self._version
+
+    def _store(self, debate_id: str, members: np.ndarray, version: int):
+        with self._lock:
+            if version != self._version:
+                return
+            self._members[debate_id] = (time.monotonic() + self.ttl, members)
+            while len(self._members) > self.max_size:
+                self._members.popitem(last=False)
+
+    def _get(self, debate_id: str) -> np.ndarray:
+        debate_id = str(debate_id)
+        members, version = self._lookup(debate_id)
+        if members is None:
+            members = self._load(debate_id)
+            self._store(debate_id, members, version)
+        return members
+
+    async def _get_async(self, debate_id: str) -> np.ndarray:
+        debate_id = str(debate_id)
+        members, version = self._lookup(debate_id)
+        if members is None:
+            members = await self._load_async(debate_id)
+            self._store(debate_id, members, version)
+        return members
+
+    def members(self, debate_id: str) -> list[str]:
+        """
+        Get the IDs of all opinions in a debate.
+        """
+        return [_to_id(key) for key in self._get(debate_id)]
+
+    async def members_async(self, debate_id: str) -> list[str]:
+        """
+        Async version of `members`, loading a missing debate without blocking.
+        """
+        return [_to_id(key) for key in await self._get_async(debate_id)]
+
+    def count(self, debate_id: str) -> int:
+        return int(self._get(debate_id).size)
+
+    def filter(self, debate_id: str, opinion_ids) -> set[str]:
+        """
+        Get the given opinion IDs that belong to the debate.
+        """
+        return _filter_keys(self._get(debate_id), opinion_ids)
+
+    async def filter_async(self, debate_id: str, opinion_ids) -> set[str]:
+        """
+        Async version of `filter`, loading a missing debate without blocking.
+        """
+        return _filter_keys(await self._get_async(debate_id), opinion_ids)
+
+    def add(self, debate_id: str, opinion_ids):
+        """
+        Add opinions to a cached debate, uncached debates are loaded on demand.
+        """
+        with self._lock:
+            self._version += 1
+            entry = self._members.get(str(debate_id))
+            if entry is not None:
+                self._members[str(debate_id)] = (
+                    entry[0],
+                    np.union1d(entry[1], _to_keys(opinion_ids)),
+                )
+
+    def discard(self, debate_id: str, opinion_ids):
+        with self._lock:
+            self._version += 1
+            entry = self._members.get(str(debate_id))
+            if entry is not None:
+                self._members[str(debate_id)] = (
+                    entry[0],
+                    np.setdiff1d(entry[1], _to_keys(opinion_ids)),
+                )
+
+    def discard_everywhere(self, opinion_ids):
+        """
+        Remove opinions from all cached debates, e.g. after they are deleted.
+        """
+        keys = _to_keys(opinion_ids)
+        with self._lock:
+            self._version += 1
+            for debate_id, (expires_at, members) in self._members.items():
+                self._members[debate_id] = (expires_at, np.setdiff1d(members, keys))
+
+    def invalidate(self, debate_id: str | None = None):
+        """
+        Drop a debate from the cache, or the whole cache if no debate is given.
+        """
+        with self._lock:
+            self._version += 1
+            if debate_id is None:
+                self._members.clear()
+            else:
+                self._members.pop(str(debate_id), None)
+
+
+membership_cache = MembershipCache(MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_CACHE_TTL)
@@ -0,0 +1,141 @@
+import time
+import threading
+from functools import wraps
+from sqlalchemy import event
+from .tracing import record_query
+
+
+class StoreMetrics:
+    """
+    Thread-safe counters of the connection waits and queries of one store.
+
+    Queries are also added to the accounting of the current request.
+    """
+
+    def __init__(self, store: str):
+        self.store = store
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.max_query_seconds = 0.0
+        self.active_queries = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_query(self, seconds: float):
+        record_query(self.store, seconds)
+        with self._lock:
+            self.queries += 1
+            self.query_seconds += seconds
+            self.max_query_seconds = max(self.max_query_seconds, seconds)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def begin_query(self):
+        with self._lock:
+            self.active_queries += 1
+
+    def end_query(self, seconds: float):
+        with self._lock:
+            self.active_queries -= 1
+        self.record_query(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "queries": self.queries,
+                "query_seconds": round(self.query_seconds, 6),
+                "max_query_seconds": round(self.max_query_seconds, 6),
+                "active_queries": self.active_queries,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 6),
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+            }
+
+
+neo4j_metrics = StoreMetrics("neo4j")
+psql_metrics = StoreMetrics("psql")
+psql_async_metrics = StoreMetrics("psql")
+
+
+def timed_pool(pool_class: type, metrics: StoreMetrics) -> type:
+    """
+    Subclass a SQLAlchemy pool class so that the time spent waiting for a
+    connection is recorded, including the time to open a new one.
+    """
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                metrics.record_wait(time.perf_counter() - start)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+def instrument_engine(engine, metrics: StoreMetrics):
+    """
+    Count and time every statement executed by a synchronous SQLAlchemy engine.
+    """
+
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        metrics.begin_query()
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    def after_execute(conn, *args):
+        starts = conn.info.get("query_start")
+        if starts:
+            metrics.end_query(time.perf_counter() - starts.pop())
+
+    def on_error(context):
+        if context.connection is not None and context.execution_context is not None:
+            after_execute(context.connection)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    event.listen(engine, "after_cursor_execute", after_execute)
+    event.listen(engine, "handle_error", on_error)
+
+
+def instrument_cypher_query(database):
+    """
+    Count and time every Cypher query sent through a neomodel database.
+
+    neomodel nodes, node sets and `db.cypher_query` all run their queries
+    through `cypher_query` or `_stream_cypher_query` of the same database
+    object, so wrapping both once covers every Neo4j query of the process.
+    """
+    if getattr(database.cypher_query, "_instrumented", False):
+        return
+    cypher_query = database.cypher_query
+    stream_cypher_query = database._stream_cypher_query
+
+    @wraps(cypher_query)
+    def instrumented(*args, **kwargs):
+        neo4j_metrics.begin_query()
+        start = time.perf_counter()
+        try:
+            return cypher_query(*args, **kwargs)
+        finally:
+            neo4j_metrics.end_query(time.perf_counter() - start)
+
+    @wraps(stream_cypher_query)
+    def instrumented_stream(*args, **kwargs):
+        # 流式查询在结果读完后才结束
+        neo4j_metrics.begin_query()
+        start = time.perf_counter()
+        try:
+            yield from stream_cypher_query(*args, **kwargs)
+        finally:
+            neo4j_metrics.end_query(time.perf_counter() - start)
+
+    instrumented._instrumented = True  # type: ignore[attr-defined]
+    database.cypher_query = instrumented
+    database._stream_cypher_query = instrumented_stream
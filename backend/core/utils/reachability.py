@@ -0,0 +1,230 @@
+import threading
+from neomodel import db
+
+# 拓扑序标签：每条边 (son)-[:supports|opposes]->(parent) 都满足 son.topo_order < parent.topo_order
+# 加边时采用 Pearce–Kelly 算法，只在受影响区域内搜索并重排标签
+
+# 计数器只在启动时由 ensure_topo_order 创建一次，此后只 MATCH，避免并发创建出多个计数器
+CREATE_COUNTER_QUERY = """
+OPTIONAL MATCH (n:Opinion)
+WITH min(n.topo_order) AS low
+MERGE (c:TopoOrderCounter)
+ON CREATE SET c.value = coalesce(low, 0.0)
+"""
+
+RESERVE_ORDERS_QUERY = """
+MATCH (c:TopoOrderCounter)
+SET c.value = c.value - $count
+RETURN c.value
+"""
+
+ORDERS_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids
+RETURN n.uid, n.topo_order
+"""
+
+FORWARD_QUERY = """
+UNWIND $uids AS uid
+MATCH (:Opinion {uid: uid})-[:supports|opposes]->(m:Opinion)
+WHERE m.topo_order <= $bound
+RETURN DISTINCT m.uid, m.topo_order
+"""
+
+BACKWARD_QUERY = """
+UNWIND $uids AS uid
+MATCH (:Opinion {uid: uid})<-[:supports|opposes]-(m:Opinion)
+WHERE m.topo_order >= $bound
+RETURN DISTINCT m.uid, m.topo_order
+"""
+
+WRITE_ORDERS_QUERY = """
+UNWIND $rows AS row
+MATCH (n:Opinion {uid: row.uid})
+SET n.topo_order = row.topo_order
+"""
+
+MISSING_ORDER_QUERY = """
+MATCH (n:Opinion) WHERE n.topo_order IS NULL
+RETURN count(n) > 0
+"""
+
+ALL_LINKS_QUERY = """
+MATCH (n:Opinion)
+OPTIONAL MATCH (n)-[:supports|opposes]->(m:Opinion)
+RETURN n.uid, collect(m.uid)
+"""
+
+RESET_COUNTER_QUERY = """
+MATCH (c:TopoOrderCounter)
+SET c.value = 0.0
+"""
+
+
+# 进程每次从计数器预留的标签数，单个观点的分配不再访问计数器节点
+TOPO_ORDER_BLOCK_SIZE = 64
+
+_order_block: list[float] = []
+_order_block_lock = threading.Lock()
+
+
+def next_topo_order() -> float:
+    """
+    Allocate a unique topological order label below all existing ones.
+
+    New opinions are usually linked as sons, so a label at the bottom keeps
+    most new links in order without any reordering. Labels are taken from a
+    block reserved by this process, so this must be called before the write
+    transaction of the opinion starts, to keep the counter node unlocked.
+    """
+    with _order_block_lock:
+        if not _order_block:
+            base = reserve_topo_orders(TOPO_ORDER_BLOCK_SIZE)
+            # 从块的顶部向下分配，使后创建的观点标签更小
+            _order_block.extend(base + i for i in range(TOPO_ORDER_BLOCK_SIZE))
+        return _order_block.pop()
+
+
+def reserve_topo_orders(count: int) -> float:
+    """
+    Allocate `count` consecutive topological order labels below all existing ones.
+
+    Used by bulk imports, the labels are the returned value plus 0, 1, ..., count - 1.
+
+    Raises:
+        RuntimeError: If the counter has not been created by `ensure_topo_order`.
+    """
+    results, _ = db.cypher_query(RESERVE_ORDERS_QUERY, {"count": count})
+    if not results:
+        raise RuntimeError("topo order counter missing; call ensure_topo_order()")
+    return results[0][0]
+
+
+def get_topo_orders(uids: list[str]) -> dict[str, float]:
+    """
+    Get the topological order labels of the given opinions.
+    """
+    results, _ = db.cypher_query(ORDERS_QUERY, {"uids": uids})
+    orders = {uid: order for uid, order in results}
+    for uid in uids:
+        if uid not in orders:
+            raise ValueError(f"Opinion with ID {uid} not found in Neo4j.")
+        if orders[uid] is None:
+            raise RuntimeError(f"Opinion with ID {uid} has no topological order.")
+    return orders
+
+
+def _search(
+    start: str,
+    start_order: float,
+    query: str,
+    bound: float,
+    forbidden: str | None = None,
+) -> dict[str, float]:
+    """
+    Collect the nodes reachable from `start` within the order bound, level by level.
+
+    Raises:
+        ValueError: If `forbidden` is reachable, i.e. the new link would create a cycle.
+    """
+    visited = {start: start_order}
+    frontier = [start]
+    while frontier:
+        results, _ = db.cypher_query(query, {"uids": frontier, "bound": bound})
+        frontier = []
+        for uid, order in results:
+            if uid == forbidden:
+                raise ValueError("Adding this link would create a cycle in the graph.")
+            if uid not in visited:
+                visited[uid] = order
+                frontier.append(uid)
+    return visited
+
+
+def ensure_link_order(from_id: str, to_id: str):
+    """
+    Prepare the topological order for a new link from `from_id` to `to_id`.
+
+    Must be called before the link is created. If the order is violated,
+    the affected region is reordered (Pearce–Kelly), so the check costs
+    O(affected region) instead of a bounded variable-length path search.
+
+    Raises:
+        ValueError: If the link would create a cycle.
+    """
+    if from_id == to_id:
+        raise ValueError("Cannot create a link from a node to itself.")
+    orders = get_topo_orders([from_id, to_id])
+    from_order, to_order = orders[from_id], orders[to_id]
+    if from_order < to_order:
+        return
+
+    forward = _search(to_id, to_order, FORWARD_QUERY, from_order, from_id)
+    backward = _search(from_id, from_order, BACKWARD_QUERY, to_order)
+
+    # 下游区域整体移到上游区域之前，复用原有标签
+    old_orders = {**backward, **forward}
+    nodes = sorted(backward, key=backward.__getitem__) + sorted(
+        forward, key=forward.__getitem__
+    )
+    pool = sorted(old_orders.values())
+    rows = [
+        {"uid": uid, "topo_order": order}
+        for uid, order in zip(nodes, pool)
+        if old_orders[uid] != order
+    ]
+    if rows:
+        db.cypher_query(WRITE_ORDERS_QUERY, {"rows": rows})
+
+
+def topo_order_between(son_ids: list[str], parent_id: str) -> float:
+    """
+    Allocate a topological order label for a new node linking the sons to the parent.
+
+    Used for AND opinions, which sit between their sons and their parent.
+
+    Raises:
+        ValueError: If any son can be reached from the parent, i.e. a cycle would be created.
+    """
+    for son_id in son_ids:
+        ensure_link_order(son_id, parent_id)
+    orders = get_topo_orders(son_ids + [parent_id])
+    low = max(orders[son_id] for son_id in son_ids)
+    high = orders[parent_id]
+    middle = (low + high) / 2
+    if low < middle < high:
+        return middle
+    # 标签间隙耗尽时退回到底部，由 ensure_link_order 重排
+    return next_topo_order()
+
+
+def ensure_topo_order():
+    """
+    Create the order counter, and assign topological order labels to all
+    opinions if any of them has none.
+
+    The labels are rebuilt from scratch with Kahn's algorithm. Must run once
+    at startup, before any opinion is created.
+    """
+    db.cypher_query(CREATE_COUNTER_QUERY)
+    results, _ = db.cypher_query(MISSING_ORDER_QUERY)
+    if not results or not results[0][0]:
+        return
+
+    results, _ = db.cypher_query(ALL_LINKS_QUERY)
+    parents = {uid: parent_ids for uid, parent_ids in results}
+    in_degree = {uid: 0 for uid in parents}
+    for parent_ids in parents.values():
+        for parent_id in parent_ids:
+            in_degree[parent_id] += 1
+    order = [uid for uid, degree in in_degree.items() if degree == 0]
+    for uid in order:  # order grows while iterating
+        for parent_id in parents[uid]:
+            in_degree[parent_id] -= 1
+            if in_degree[parent_id] == 0:
+                order.append(parent_id)
+    if len(order) != len(parents):
+        raise RuntimeError("The opinion graph contains a cycle.")
+
+    rows = [{"uid": uid, "topo_order": float(i)} for i, uid in enumerate(order)]
+    db.cypher_query(WRITE_ORDERS_QUERY, {"rows": rows})
+    db.cypher_query(RESET_COUNTER_QUERY)
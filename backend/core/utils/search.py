@@ -0,0 +1,124 @@
+import re
+from neomodel import db
+from core.db_life import cypher_query_async
+from config_private import FULLTEXT_ANALYZER, FULLTEXT_BATCH_SIZE
+
+FULLTEXT_INDEX = "opinion_content"
+
+# 索引名与分析器无法参数化
+CREATE_INDEX_QUERY = """
+CREATE FULLTEXT INDEX {index} IF NOT EXISTS
+FOR (n:Opinion) ON EACH [n.content]
+OPTIONS {{indexConfig: {{`fulltext.analyzer`: '{analyzer}'}}}}
+"""
+
+# 按索引顺序分批读取命中，每个命中附带是否通过子串与分数过滤，调用方据此续读下一批
+SEARCH_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query, {skip: $skip, limit: $limit})
+YIELD node AS n, score
+RETURN n.uid, score, coalesce(
+    n.content CONTAINS $q
+    AND ($min_score IS NULL OR (
+        n.positive_score IS NOT NULL AND n.negative_score IS NOT NULL
+        AND (n.positive_score + n.negative_score) / 2 >= $min_score))
+    AND ($max_score IS NULL OR (
+        n.positive_score IS NOT NULL AND n.negative_score IS NOT NULL
+        AND (n.positive_score + n.negative_score) / 2 <= $max_score)),
+    false)
+"""
+
+# cjk 分析器切分为二元组的文字：汉字、假名与谚文
+CJK_PATTERN = re.compile(
+    r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+)
+
+
+def ensure_fulltext_index():
+    """
+    Create the full-text index on opinion content if it does not exist.
+
+    The analyzer is `FULLTEXT_ANALYZER`, by default "cjk", which splits Chinese
+    text into overlapping character bigrams.
+    """
+    db.cypher_query(
+        CREATE_INDEX_QUERY.format(index=FULLTEXT_INDEX, analyzer=FULLTEXT_ANALYZER)
+    )
+
+
+def is_searchable(q: str | None) -> bool:
+    """
+    Check whether a query can use the full-text index.
+
+    Only runs of at least two CJK characters qualify: a phrase of their bigrams
+    is found in every content containing the query. Latin words are indexed
+    as whole words without stop-words, so other queries need substring matching.
+    """
+    return q is not None and len(q.strip()) >= 2 and bool(CJK_PATTERN.fullmatch(q.strip()))
+
+
+def phrase_query(q: str) -> str:
+    """
+    Turn a user query into a Lucene phrase query.
+
+    Inside a phrase only quotes and backslashes are special.
+    """
+    escaped = q.strip().replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def _search_params(
+    q: str, min_score: float | None, max_score: float | None, skip: int, limit: int
+) -> dict:
+    return {
+        "index": FULLTEXT_INDEX,
+        "query": phrase_query(q),
+        "q": q.strip(),
+        "skip": skip,
+        "limit": limit,
+        "min_score": min_score,
+        "max_score": max_score,
+    }
+
+
+def search_opinion_ids(
+    q: str,
+    min_score: float | None = None,
+    max_score: float | None = None,
+    skip: int = 0,
+    limit: int = FULLTEXT_BATCH_SIZE,
+) -> tuple[list[tuple[str, float]], int]:
+    """
+    Search a batch of opinions by content with the full-text index.
+
+    The index hits are checked against the exact substring, so the results
+    equal those of substring matching, ranked by relevance.
+
+    :param q: The query, a run of CJK characters, see `is_searchable`.
+    :param min_score: Optional minimum of the mean of positive and negative scores.
+    :param max_score: Optional maximum of the mean of positive and negative scores.
+    :param skip: Number of index hits already read.
+    :param limit: Number of index hits to read.
+    :return: IDs of the matching opinions of the batch with their relevance,
+        most relevant first, and the number of index hits read; fewer than
+        `limit` means the index is exhausted.
+    """
+    results, _ = db.cypher_query(
+        SEARCH_QUERY, _search_params(q, min_score, max_score, skip, limit)
+    )
+    return [(uid, relevance) for uid, relevance, ok in results if ok], len(results)
+
+
+async def search_opinion_ids_async(
+    q: str,
+    min_score: float | None = None,
+    max_score: float | None = None,
+    skip: int = 0,
+    limit: int = FULLTEXT_BATCH_SIZE,
+) -> tuple[list[tuple[str, float]], int]:
+    """
+    Async version of `search_opinion_ids`.
+    """
+    results, _ = await cypher_query_async(
+        SEARCH_QUERY, _search_params(q, min_score, max_score, skip, limit)
+    )
+    return [(uid, relevance) for uid, relevance, ok in results if ok], len(results)
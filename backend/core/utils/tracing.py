@@ -0,0 +1,238 @@
+import json
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("opendebate.request")
+
+STORES = ("neo4j", "psql")
+# 直方图桶上界，与 Prometheus 客户端的默认桶一致
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+@dataclass
+class RequestStats:
+    """
+    Database and LLM work done while handling one request.
+
+    Work done in threads started with `run_in_threadpool` or `asyncio.to_thread`
+    is included, because they run in a copy of the request context.
+    """
+
+    queries: dict[str, int] = field(default_factory=lambda: dict.fromkeys(STORES, 0))
+    seconds: dict[str, float] = field(default_factory=lambda: dict.fromkeys(STORES, 0.0))
+    psql_sessions: int = 0
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_query(self, store: str, seconds: float):
+        with self._lock:
+            self.queries[store] += 1
+            self.seconds[store] += seconds
+
+    def add_llm(self, seconds: float):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_seconds += seconds
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+@contextmanager
+def track_request():
+    """
+    Account the database and LLM work done inside the block, like a request.
+
+    Yields:
+        RequestStats: The counters, filled in while the block runs.
+    """
+    stats = RequestStats()
+    token = _request_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _request_stats.reset(token)
+
+
+def record_query(store: str, seconds: float):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add_query(store, seconds)
+
+
+def record_psql_session():
+    stats = _request_stats.get()
+    if stats is not None:
+        with stats._lock:
+            stats.psql_sessions += 1
+
+
+def record_llm(seconds: float):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.add_llm(seconds)
+
+
+class Histogram:
+    """
+    A labelled histogram rendered in the Prometheus text format.
+    """
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...], buckets: tuple):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # 各桶计数、总和、总数
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            i = bisect_left(self.buckets, value)
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(v[0]), v[1], v[2]) for k, v in sorted(self._series.items())]
+        for label_values, counts, total, count in items:
+            labels = ",".join(
+                f'{k}="{_escape(v)}"' for k, v in zip(self.labels, label_values)
+            )
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+request_seconds = Histogram(
+    "opendebate_request_seconds",
+    "Time spent handling a request.",
+    ("method", "route"),
+    SECONDS_BUCKETS,
+)
+request_db_queries = Histogram(
+    "opendebate_request_db_queries",
+    "Database queries made by a request.",
+    ("method", "route", "store"),
+    COUNT_BUCKETS,
+)
+request_db_seconds = Histogram(
+    "opendebate_request_db_seconds",
+    "Time spent in database queries by a request.",
+    ("method", "route", "store"),
+    SECONDS_BUCKETS,
+)
+request_llm_seconds = Histogram(
+    "opendebate_request_llm_seconds",
+    "Time spent waiting for the LLM by a request.",
+    ("method", "route"),
+    SECONDS_BUCKETS,
+)
+HISTOGRAMS = (request_seconds, request_db_queries, request_db_seconds, request_llm_seconds)
+
+
+def render_prometheus() -> str:
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def _server_timing(stats: RequestStats, total: float) -> str:
+    parts = [
+        f'{store};dur={stats.seconds[store] * 1000:.1f};desc="{stats.queries[store]} queries"'
+        for store in STORES
+    ]
+    parts.append(f'llm;dur={stats.llm_seconds * 1000:.1f};desc="{stats.llm_calls} calls"')
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware accounting the database and LLM work of every API request.
+
+    The numbers are sent back in a `Server-Timing` header, written to the
+    `opendebate.request` logger as one JSON line and added to the histograms
+    of the route.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # 流式响应的头部先于请求结束发送，此时只能给出已发生的部分
+                total = time.perf_counter() - start
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(stats, total).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        with track_request() as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._finish(scope, stats, time.perf_counter() - start, status_code)
+
+    @staticmethod
+    def _finish(scope, stats: RequestStats, total: float, status_code: int):
+        route = scope.get("route")
+        # 使用路由模板而非实际路径，避免 ID 造成标签爆炸
+        path = getattr(route, "path", None) or "unmatched"
+        method = scope["method"]
+        request_seconds.observe(total, method, path)
+        for store in STORES:
+            request_db_queries.observe(stats.queries[store], method, path, store)
+            request_db_seconds.observe(stats.seconds[store], method, path, store)
+        request_llm_seconds.observe(stats.llm_seconds, method, path)
+        logger.info(
+            json.dumps(
+                {
+                    "method": method,
+                    "route": path,
+                    "status": status_code,
+                    "seconds": round(total, 6),
+                    "neo4j_queries": stats.queries["neo4j"],
+                    "neo4j_seconds": round(stats.seconds["neo4j"], 6),
+                    "psql_queries": stats.queries["psql"],
+                    "psql_seconds": round(stats.seconds["psql"], 6),
+                    "psql_sessions": stats.psql_sessions,
+                    "llm_calls": stats.llm_calls,
+                    "llm_seconds": round(stats.llm_seconds, 6),
+                }
+            )
+        )
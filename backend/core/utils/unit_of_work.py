@@ -0,0 +1,278 @@
+import uuid
+from typing import Callable
+from datetime import timedelta
+from contextlib import contextmanager
+from neomodel import db
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from core.db_life import get_psql_session
+from core.debate import get_global_debate
+from core.update_score import propagate_scores
+from core.utils.membership import membership_cache
+from core.utils.debate_version import bump_versions, bump_versions_in, defer_bumps
+from schemas.db.psql import (
+    Debate as DebatePsql,
+    Opinion as OpinionPsql,
+    WriteOutbox,
+    PruneOutbox,
+    debate_opinion_association,
+)
+
+# 删除一组观点并返回其余邻居，邻居随后只需传播一次
+DELETE_OPINIONS_QUERY = """
+MATCH (n:Opinion) WHERE n.uid IN $uids
+OPTIONAL MATCH (n)-[:supports|opposes]-(m:Opinion)
+WHERE NOT m.uid IN $uids
+WITH collect(DISTINCT n) AS nodes, collect(DISTINCT m.uid) AS neighbor_ids
+FOREACH (x IN nodes | DETACH DELETE x)
+RETURN size(nodes), neighbor_ids
+"""
+
+# 删除观点时每个 Neo4j 事务删除的节点数
+PRUNE_BATCH_SIZE = 5000
+
+# 发件箱行写入后超过该秒数才视为被中断，更新的行可能属于其他进程中仍在进行的写入
+OUTBOX_GRACE_PERIOD = 300
+
+# 观点的双写顺序：
+# 1. PostgreSQL 单个事务写入观点行、辩论关联行与发件箱行
+# 2. Neo4j 单个显式事务写入节点与边
+# 3. 删除发件箱行
+# 进程在 1 与 3 之间中断时，由 reconcile_outbox 根据 Neo4j 中节点是否存在补齐或回滚
+
+
+def _create_opinion_rows(creator: str, debate_id: str) -> str:
+    """
+    Insert an opinion, its debate links and its outbox entry in one transaction.
+    """
+    opinion_id = uuid.uuid4()
+    debate_ids = [debate_id]
+    global_debate_id = get_global_debate()
+    # Also link to the global debate
+    if global_debate_id and debate_id != global_debate_id:
+        debate_ids.append(global_debate_id)
+    with get_psql_session() as psql_session:
+        try:
+            found = psql_session.query(DebatePsql.id).filter(DebatePsql.id == debate_id).first()
+            if not found:
+                raise ValueError(f"Debate with ID {debate_id} does not exist.")
+            psql_session.add(OpinionPsql(id=opinion_id, creator=creator))
+            psql_session.add(WriteOutbox(opinion_id=opinion_id, operation="create"))
+            psql_session.flush()
+            psql_session.execute(
+                debate_opinion_association.insert(),
+                [{"debate_id": d, "opinion_id": opinion_id} for d in debate_ids],
+            )
+            psql_session.commit()
+        except ValueError:
+            psql_session.rollback()
+            raise
+        except Exception as e:
+            psql_session.rollback()
+            raise RuntimeError(f"Failed to create opinion in PostgreSQL: {str(e)}")
+    for d in debate_ids:
+        membership_cache.add(d, [opinion_id])
+    return str(opinion_id)
+
+
+def _complete(opinion_id: str):
+    with get_psql_session() as psql_session:
+        psql_session.query(WriteOutbox).filter(
+            WriteOutbox.opinion_id == opinion_id
+        ).delete()
+        psql_session.commit()
+
+
+def _abort(opinion_id: str):
+    """
+    Remove the rows of an opinion whose Neo4j writes did not happen.
+    """
+    with get_psql_session() as psql_session:
+        # 级联删除辩论关联行与发件箱行
+        psql_session.query(OpinionPsql).filter(OpinionPsql.id == opinion_id).delete()
+        psql_session.commit()
+    membership_cache.discard_everywhere([opinion_id])
+
+
+@contextmanager
+def create_opinion_unit(creator: str, debate_id: str):
+    """
+    Create an opinion in both databases as one unit of work.
+
+    The PostgreSQL rows are committed first together with an outbox entry,
+    then the body runs the Neo4j writes in one explicit transaction. If the
+    body fails, the PostgreSQL rows are removed again.
+
+    Yields:
+        str: The ID of the new opinion.
+
+    Example:
+        with create_opinion_unit(creator, debate_id) as opinion_id:
+            OpinionNeo4j(uid=opinion_id, ...).save()
+    """
+    opinion_id = _create_opinion_rows(creator, debate_id)
+    try:
+        # 辩论版本在 Neo4j 事务提交后才递增
+        with defer_bumps():
+            with db.transaction:
+                yield opinion_id
+            bump_versions(opinion_ids=[opinion_id])
+    except BaseException:
+        try:
+            _abort(opinion_id)
+        except Exception as e:
+            # 留给 reconcile_outbox 处理
+            print(f"Failed to roll back opinion {opinion_id}: {e}")
+        raise
+    try:
+        _complete(opinion_id)
+    except Exception as e:
+        print(f"Failed to complete outbox entry of opinion {opinion_id}: {e}")
+
+
+# 批量删除观点的顺序：
+# 1. PostgreSQL 单个事务删除观点行，并为每个观点写入 prune 行
+# 2. Neo4j 按批删除节点与链，每批完成后在一个事务中删除该批 prune 行，并为留存的邻居写入 repair 行
+# 3. 重新传播 repair 行中邻居的分数，完成后删除 repair 行
+# 进程在其间中断时，由 reconcile_outbox 继续删除剩余节点并修复分数
+
+
+def prune_rows(opinion_ids: list[str]) -> list[dict]:
+    """
+    Build the outbox rows to insert in the transaction deleting the opinion rows.
+    """
+    return [{"opinion_id": uid, "operation": "prune"} for uid in opinion_ids]
+
+
+def finish_prune(
+    opinion_ids: list[str],
+    progress: Callable[[int, int], None] | None = None,
+) -> dict[str, dict[str, float | None]]:
+    """
+    Delete opinions from Neo4j in batches, then repair the scores of their
+    remaining neighbors once.
+
+    The PostgreSQL rows of the opinions must be deleted already, in the same
+    transaction as their `prune_rows`.
+
+    Args:
+        opinion_ids (list[str]): IDs of the opinions to delete.
+        progress (Callable | None): Optional callback receiving the numbers of
+            deleted and all opinions after each batch.
+
+    Returns:
+        dict: The updated node IDs and their new scores.
+    """
+    total = len(opinion_ids)
+    for begin in range(0, total, PRUNE_BATCH_SIZE):
+        batch = opinion_ids[begin : begin + PRUNE_BATCH_SIZE]
+        results, _ = db.cypher_query(DELETE_OPINIONS_QUERY, {"uids": batch})
+        neighbor_ids = results[0][1]
+        with get_psql_session() as psql_session:
+            try:
+                psql_session.query(PruneOutbox).filter(
+                    PruneOutbox.operation == "prune",
+                    PruneOutbox.opinion_id.in_(batch),
+                ).delete(synchronize_session=False)
+                if neighbor_ids:
+                    psql_session.execute(
+                        insert(PruneOutbox)
+                        .values(
+                            [
+                                {"opinion_id": uid, "operation": "repair"}
+                                for uid in neighbor_ids
+                            ]
+                        )
+                        .on_conflict_do_nothing()
+                    )
+                psql_session.commit()
+            except Exception as e:
+                psql_session.rollback()
+                raise RuntimeError(f"Failed to update prune outbox: {str(e)}")
+        if progress:
+            progress(min(begin + PRUNE_BATCH_SIZE, total), total)
+    # 全辩论的图直接读取 Neo4j，节点删除后才递增其版本
+    if total:
+        bump_versions(debate_ids=[get_global_debate()])
+    return _repair_pruned()
+
+
+def _repair_pruned() -> dict[str, dict[str, float | None]]:
+    with get_psql_session() as psql_session:
+        repair_ids = [
+            str(row[0])
+            for row in psql_session.query(PruneOutbox.opinion_id).filter(
+                PruneOutbox.operation == "repair"
+            )
+        ]
+    updated_nodes = dict()
+    if not repair_ids:
+        return updated_nodes
+    # 已删除的观点不在 Neo4j 中，传播时被忽略
+    propagate_scores(repair_ids, updated_nodes)
+    with get_psql_session() as psql_session:
+        psql_session.query(PruneOutbox).filter(
+            PruneOutbox.operation == "repair",
+            PruneOutbox.opinion_id.in_(repair_ids),
+        ).delete(synchronize_session=False)
+        psql_session.commit()
+    return updated_nodes
+
+
+def reconcile_outbox() -> dict:
+    """
+    Finish or roll back the opinions left in the outbox by an interrupted process.
+
+    Opinions whose Neo4j node exists are kept and their scores propagated,
+    the others are removed from PostgreSQL. Opinions whose deletion was
+    interrupted are deleted from Neo4j and their neighbors repaired.
+
+    Only rows older than `OUTBOX_GRACE_PERIOD` are considered, and the write
+    outbox rows are locked with `FOR UPDATE SKIP LOCKED` until reconciled, so
+    writes still in progress in other processes, and concurrent reconciliations,
+    are left alone.
+
+    Returns:
+        dict: The numbers of kept, removed and pruned opinions.
+    """
+    cutoff = func.now() - timedelta(seconds=OUTBOX_GRACE_PERIOD)
+    with get_psql_session() as psql_session:
+        pruning = [
+            str(row[0])
+            for row in psql_session.query(PruneOutbox.opinion_id).filter(
+                PruneOutbox.operation == "prune", PruneOutbox.created_at < cutoff
+            )
+        ]
+    finish_prune(pruning)
+    with get_psql_session() as psql_session:
+        try:
+            pending = [
+                str(row[0])
+                for row in psql_session.query(WriteOutbox.opinion_id)
+                .filter(WriteOutbox.created_at < cutoff)
+                .with_for_update(skip_locked=True)
+            ]
+            if not pending:
+                psql_session.rollback()
+                return {"kept": 0, "removed": 0, "pruned": len(pruning)}
+            results, _ = db.cypher_query(
+                "MATCH (n:Opinion) WHERE n.uid IN $uids RETURN n.uid", {"uids": pending}
+            )
+            existing = {row[0] for row in results}
+            if existing:
+                propagate_scores(list(existing), {})
+            missing = [uid for uid in pending if uid not in existing]
+            if missing:
+                bump_versions_in(psql_session, opinion_ids=missing)
+                psql_session.query(OpinionPsql).filter(
+                    OpinionPsql.id.in_(missing)
+                ).delete(synchronize_session=False)
+            psql_session.query(WriteOutbox).filter(
+                WriteOutbox.opinion_id.in_(list(existing))
+            ).delete(synchronize_session=False)
+            psql_session.commit()
+        except Exception as e:
+            psql_session.rollback()
+            raise RuntimeError(f"Failed to reconcile outbox: {str(e)}")
+    membership_cache.discard_everywhere(missing)
+    return {"kept": len(existing), "removed": len(missing), "pruned": len(pruning)}
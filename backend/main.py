@@ -1,11 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from routers import debate, opinion, link, ai_maker
+from routers import debate, opinion, link, ai_maker, metrics
 from config_private import CORS_ALLOW_ORIGIN, LOG_LEVEL
-from core.db_life import init_db, close_db
+from core.db_life import init_db, close_db, close_db_async
 from core.utils.debate import init_global_debate
+from core.utils.reachability import ensure_topo_order
+from core.utils.search import ensure_fulltext_index
+from core.utils.embedding import load_opinion_index, save_opinion_index
+from core.utils.llm import close_llm_async
+from core.ai_job import start_workers, stop_workers
+from core.utils.unit_of_work import reconcile_outbox
+from core.utils.tracing import TracingMiddleware
 from core.authentication.user_manager import fastapi_users, auth_backend
+from core.authentication.user_cache import start_user_listener, stop_user_listener
 from schemas.authentication import UserRead, UserCreate, UserUpdate
 import uvicorn.config
 import uvicorn
@@ -15,9 +23,26 @@ import uvicorn
 async def lifespan(app: FastAPI):
     init_db()
     print("✅ Database initialized")
+    await start_user_listener()
+    print("✅ User change listener started")
     init_global_debate()
     print("✅ 'Global' debate initialized")
+    ensure_topo_order()
+    print("✅ Topological order initialized")
+    ensure_fulltext_index()
+    print("✅ Full-text index initialized")
+    reconcile_stats = reconcile_outbox()
+    print(f"✅ Outbox reconciled: {reconcile_stats}")
+    index_stats = load_opinion_index()
+    print(f"✅ Opinion vector index loaded: {index_stats}")
+    start_workers()
+    print("✅ AI job workers started")
     yield
+    stop_workers()
+    await close_llm_async()
+    save_opinion_index()
+    await stop_user_listener()
+    await close_db_async()
     close_db()
     print("❎ Database closed")
 
@@ -33,7 +58,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# 统计每个请求的数据库与LLM耗时
+app.add_middleware(TracingMiddleware)
 
 # 分发路由
 ## Authentication
@@ -57,6 +85,8 @@ app.include_router(opinion.router, prefix="/api/opinion", tags=["opinion"])
 app.include_router(link.router, prefix="/api/link", tags=["link"])
 app.include_router(debate.router, prefix="/api/debate", tags=["debate"])
 app.include_router(ai_maker.router, prefix="/api/ai", tags=["ai"])
+## 运维
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 
 
 @app.get("/api/")
@@ -72,6 +102,12 @@ if __name__ == "__main__":
     log_config["formatters"]["default"][
         "fmt"
     ] = "%(asctime)s - %(levelname)s - %(message)s"
+    # 每个请求一行JSON统计
+    log_config["loggers"]["opendebate"] = {
+        "handlers": ["default"],
+        "level": LOG_LEVEL.upper(),
+        "propagate": False,
+    }
     uvicorn.run(
         app, host="127.0.0.1", port=3142, log_config=log_config, log_level=LOG_LEVEL
     )
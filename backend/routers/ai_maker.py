@@ -1,6 +1,14 @@
-from fastapi import APIRouter, Depends
+import json
+import asyncio
+from fastapi import APIRouter, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from schemas.ai_maker import *
+from schemas.msg import MsgResponse
 from core.ai_maker import ai_build_debate_from_opinion
+from core.ai_job import submit_job, get_job, cancel_job, TERMINAL_STATUSES
+from config_private import AI_JOB_POLL_INTERVAL
+from core.utils.llm_cache import llm_cache
 from core.authentication.role import require_role
 
 router = APIRouter()
@@ -18,3 +26,81 @@ def create_http(request: CreateDebateRequest, user=Depends(require_role("user"))
         result = {"is_success": False, "msg": str(e)}
 
     return result
+
+
+@router.get("/llm_cache", response_model=LlmCacheStatsResponse)
+def llm_cache_stats_http(user=Depends(require_role("admin"))):
+    try:
+        result = {"is_success": True, "data": llm_cache.stats()}
+    except Exception as e:
+        result = {"is_success": False, "msg": str(e)}
+
+    return result
+
+
+@router.post("/job/submit", response_model=SubmitJobResponse)
+def submit_job_http(request: SubmitJobRequest, user=Depends(require_role("user"))):
+    try:
+        id = submit_job(request.content, str(user.username), request.max_nodes)
+        result = {"is_success": True, "id": id}
+    except Exception as e:
+        result = {"is_success": False, "msg": str(e)}
+
+    return result
+
+
+def _is_admin(user) -> bool:
+    return str(user.role) == "admin"
+
+
+@router.get("/job/{job_id}", response_model=JobResponse)
+def get_job_http(job_id: str, user=Depends(require_role("user"))):
+    try:
+        data = get_job(job_id, str(user.username), _is_admin(user))
+        result = {"is_success": True, "data": data}
+    except Exception as e:
+        result = {"is_success": False, "msg": str(e)}
+
+    return result
+
+
+@router.post("/job/cancel", response_model=MsgResponse)
+def cancel_job_http(request: JobRequest, user=Depends(require_role("user"))):
+    try:
+        cancel_job(request.id, str(user.username), _is_admin(user))
+        result = {"is_success": True}
+    except Exception as e:
+        result = {"is_success": False, "msg": str(e)}
+
+    return result
+
+
+@router.get("/job/{job_id}/events")
+async def job_events_http(
+    job_id: str, request: Request, user=Depends(require_role("user"))
+):
+    """
+    以SSE推送任务状态，任务结束后关闭连接
+    """
+    requester, is_admin = str(user.username), _is_admin(user)
+
+    async def events():
+        last_updated_at = None
+        while not await request.is_disconnected():
+            try:
+                job = await run_in_threadpool(get_job, job_id, requester, is_admin)
+            except Exception as e:
+                yield f"event: error\ndata: {json.dumps({'msg': str(e)})}\n\n"
+                return
+            if job["updated_at"] != last_updated_at:
+                last_updated_at = job["updated_at"]
+                yield f"data: {json.dumps(job, ensure_ascii=False)}\n\n"
+            if job["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(AI_JOB_POLL_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,8 @@
-from fastapi import APIRouter, Query, Depends
+import gzip
+import json
+import msgpack
+from fastapi import APIRouter, Query, Depends, Request, Response
+from fastapi.responses import JSONResponse
 from typing import Annotated
 from schemas.db.neo4j import Opinion as OpinionNeo4j
 from schemas.debate import *
@@ -6,11 +10,15 @@ from schemas.msg import MsgResponse
 from core.debate import (
     create_debate,
     delete_debate,
-    query_debate,
+    query_debate_async,
     patch_debate,
     cited_in_debate,
-    get_global_debate,
+    get_global_debate_async,
+    graph_debate,
 )
+from core.bulk_import import import_debate
+from core.utils.debate_code import parse_debate_code
+from core.utils.debate_version import get_debate_version
 from core.authentication.role import require_role
 
 router = APIRouter()
@@ -32,14 +40,14 @@ def create_debate_http(request: CreateDebateRequest, user=Depends(require_role("
     return result
 
 
-@router.post("/delete", response_model=MsgResponse)
+@router.post("/delete", response_model=DeleteDebateResponse)
 def delete_debate_http(request: DeleteDebateRequest, user=Depends(require_role("admin"))):
     debate_id = request.id
 
     # 调用核心函数实现逻辑
     try:
-        delete_debate(debate_id)
-        result = {"is_success": True}
+        stats = delete_debate(debate_id, delete_orphans=request.delete_orphans)
+        result = {"is_success": True, "data": stats}
     except Exception as e:
         result = {"is_success": False, "msg": str(e)}
 
@@ -47,7 +55,7 @@ def delete_debate_http(request: DeleteDebateRequest, user=Depends(require_role("
 
 
 @router.get("/query", response_model=QueryDebateResponse)
-def query_debate_http(filter_query: Annotated[QueryDebateRequest, Query()]):
+async def query_debate_http(filter_query: Annotated[QueryDebateRequest, Query()]):
     title = filter_query.title
     description = filter_query.description
     creator = filter_query.creator
@@ -56,7 +64,7 @@ def query_debate_http(filter_query: Annotated[QueryDebateRequest, Query()]):
     end_timestamp = filter_query.end_timestamp
 
     try:
-        debates = query_debate(
+        debates = await query_debate_async(
             title, description, creator, start_timestamp, end_timestamp, debate_id
         )
         result = {
@@ -101,12 +109,98 @@ def cited_in_debate_http(request: CiteDebateRequest, user=Depends(require_role("
     return result
 
 
+@router.post("/import", response_model=ImportDebateResponse)
+def import_debate_http(request: ImportDebateRequest, user=Depends(require_role("user"))):
+    try:
+        if request.opinions:
+            opinions = [opinion.model_dump() for opinion in request.opinions]
+            links = request.links
+        elif request.code:
+            opinions, links = parse_debate_code(request.code)
+        else:
+            raise ValueError("Either opinions or code must be provided.")
+        stats = import_debate(
+            title=request.title,
+            creator=request.creator,
+            opinions=opinions,
+            links=links,
+            description=request.description,
+        )
+        result = {"is_success": True, "id": stats["debate_id"], "id_map": stats["id_map"]}
+    except Exception as e:
+        result = {"is_success": False, "msg": str(e)}
+
+    return result
+
+
 @router.get("/global", response_model=GlobalDebateIDResponse)
-def get_global_debate_http():
+async def get_global_debate_http():
     try:
-        global_debate_id = get_global_debate()
+        global_debate_id = await get_global_debate_async()
         assert global_debate_id is not None
         result = {"is_success": True, "id": global_debate_id}
     except Exception as e:
         result = {"is_success": False, "msg": str(e)}
     return result
+
+
+# 小于该字节数的响应不压缩
+GZIP_MIN_SIZE = 1024
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    # 按q值判断，gzip;q=0表示拒绝；显式的gzip优先于*
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    return weights.get("gzip", weights.get("*", 0.0)) > 0
+
+
+@router.get("/{debate_id}/graph")
+def graph_debate_http(debate_id: str, request: Request):
+    # 以辩论ID与其版本作为ETag，先于查询快照比较，辩论未变化时直接返回304
+    try:
+        version = get_debate_version(debate_id)
+    except Exception as e:
+        return JSONResponse({"is_success": False, "msg": str(e)})
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if version is not None:
+        etag = f'W/"{debate_id}-{version}"'
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers={"ETag": etag, **headers})
+
+    try:
+        snapshot = graph_debate(debate_id)
+    except Exception as e:
+        return JSONResponse({"is_success": False, "msg": str(e)})
+    if version is not None:
+        headers["ETag"] = etag
+
+    body = json.dumps(
+        {"is_success": True, "data": snapshot},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+    # 按Accept协商msgpack或JSON，按Accept-Encoding协商gzip
+    if "application/msgpack" in request.headers.get("accept", ""):
+        body = msgpack.packb({"is_success": True, "data": snapshot})
+        media_type = "application/msgpack"
+    else:
+        media_type = "application/json"
+    if _accepts_gzip(request.headers.get("accept-encoding", "")) and len(body) >= GZIP_MIN_SIZE:
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type=media_type, headers=headers)
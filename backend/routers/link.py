@@ -1,12 +1,17 @@
 from fastapi import APIRouter, Query, Depends
+from fastapi.concurrency import run_in_threadpool
 from typing import Annotated
 from core.link import (
     create_link,
     delete_link_by_info,
     info_link,
+    info_link_async,
     patch_link,
     attack_link,
+    attack_content,
 )
+from core.opinion import get_opinion_contents
+from core.utils.llm import llm_score_async, is_OR_link_reasonable_async
 from schemas.link import *
 from schemas.msg import MsgResponse
 from schemas.db.neo4j import Opinion as OpinionNeo4j
@@ -16,24 +21,29 @@ router = APIRouter()
 
 
 @router.post("/create", response_model=CreateLinkResponse)
-def create_link_http(request: CreateLinkRequest, user=Depends(require_role("user"))):
+async def create_link_http(request: CreateLinkRequest, user=Depends(require_role("user"))):
     """
     创建一个链（两个已存在观点间）
     """
     try:
         # Check if the neighborhood opinion is not AND opinion
-        from_opinion = OpinionNeo4j.nodes.get(uid=request.from_id)
-        to_opinion = OpinionNeo4j.nodes.get(uid=request.to_id)
+        from_opinion = await run_in_threadpool(OpinionNeo4j.nodes.get, uid=request.from_id)
+        to_opinion = await run_in_threadpool(OpinionNeo4j.nodes.get, uid=request.to_id)
         if from_opinion.logic_type == "and" or to_opinion.logic_type == "and":
             return {
                 "is_success": False,
                 "msg": "Cannot create link to an AND opinion.",
             }
-        link_id, updated_nodes = create_link(
+        # 使用AI判断合理性，等待期间不占用工作线程
+        if not await is_OR_link_reasonable_async(
+            from_opinion.content, to_opinion.content, request.link_type.value
+        ):
+            raise ValueError("The proposed link is not considered reasonable by the AI.")
+        link_id, updated_nodes = await run_in_threadpool(
+            create_link,
             from_id=request.from_id,
             to_id=request.to_id,
             link_type=request.link_type,
-            is_llm_evalate=True,
         )
         need_updated_nodes = {
             k: updated_nodes[k] for k in updated_nodes if updated_nodes[k] is not None
@@ -66,12 +76,12 @@ def delete_link_http(request: LinkRequest, user=Depends(require_role("admin"))):
 
 
 @router.get("/info", response_model=InfoLinkResponse)
-def info_link_http(filter_query: Annotated[LinkRequest, Query()]):
+async def info_link_http(filter_query: Annotated[LinkRequest, Query()]):
     """
     查询一个链（两个已存在观点间）的信息
     """
     try:
-        link_info = info_link(link_id=filter_query.link_id)
+        link_info = await info_link_async(link_id=filter_query.link_id)
         return {
             "is_success": True,
             "id": filter_query.link_id,
@@ -99,15 +109,23 @@ def patch_link_http(request: PatchLinkRequest, user=Depends(require_role("admin"
 
 
 @router.post("/attack", response_model=AttackLinkResponse)
-def attack_link_http(request: AttackLinkRequest, user=Depends(require_role("user"))):
+async def attack_link_http(request: AttackLinkRequest, user=Depends(require_role("user"))):
     """
     对链辩论，即对链进行攻击，返回OR和AND观点的ID
     """
     try:
-        or_id, and_id, link_ids = attack_link(
+        link_info = await info_link_async(link_id=request.link_id)
+        contents = await run_in_threadpool(
+            get_opinion_contents, [link_info["from_id"], link_info["to_id"]]
+        )
+        positive_score = await llm_score_async(
+            attack_content(contents[link_info["from_id"]], contents[link_info["to_id"]])
+        )
+        or_id, and_id, link_ids = await run_in_threadpool(
+            attack_link,
             link_id=request.link_id,
             debate_id=request.debate_id,
-            is_llm_score=True,
+            positive_score=positive_score,
         )
         return {
             "is_success": True,
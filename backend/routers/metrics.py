@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from schemas.metrics import MetricsResponse
+from core.db_life import get_db_metrics
+from core.utils.tracing import render_prometheus
+from core.authentication.role import require_role
+
+router = APIRouter()
+
+
+@router.get("", response_model=MetricsResponse)
+def metrics_http(user=Depends(require_role("admin"))):
+    try:
+        result = {"is_success": True, "data": get_db_metrics()}
+    except Exception as e:
+        result = {"is_success": False, "msg": str(e)}
+
+    return result
+
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+def prometheus_http(user=Depends(require_role("admin"))):
+    # Prometheus 文本格式的每路由请求耗时、数据库查询数与耗时、LLM耗时直方图
+    return PlainTextResponse(
+        render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
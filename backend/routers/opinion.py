@@ -1,29 +1,38 @@
 from fastapi import APIRouter, Query, Depends
+from fastapi.concurrency import run_in_threadpool
 from typing import Annotated
 from schemas.opinion import *
 from core.opinion import (
     create_or_opinion,
     create_and_opinion,
     delete_opinion,
-    info_opinion,
-    query_opinion,
-    head_opinion,
+    delete_opinions,
+    info_opinion_async,
+    info_opinions_async,
+    query_opinion_async,
+    similar_opinions,
+    head_opinion_async,
     patch_opinion,
+    get_opinion_contents,
 )
+from core.utils.llm import llm_score_async, is_AND_link_reasonable_async
 from core.authentication.role import require_role
 
 router = APIRouter()
 
 
+# LLM调用在事件循环中等待，数据库操作交给线程池，避免长时间占用工作线程
 @router.post("/create_or", response_model=CreateOROpinionResponse)
-def create_or_opinion_http(request: CreateOrOpinionRequest, user=Depends(require_role("user"))):
+async def create_or_opinion_http(request: CreateOrOpinionRequest, user=Depends(require_role("user"))):
     try:
-        node_id = create_or_opinion(
+        positive_score = await llm_score_async(request.content)
+        node_id = await run_in_threadpool(
+            create_or_opinion,
             content=request.content,
             creator=request.creator,
             host="local",
             node_type="solid",
-            is_llm_score=True,
+            positive_score=positive_score,
             debate_id=request.debate_id,
         )
         result = {"is_success": True, "node_id": node_id}
@@ -34,16 +43,25 @@ def create_or_opinion_http(request: CreateOrOpinionRequest, user=Depends(require
 
 
 @router.post("/create_and", response_model=CreateANDOpinionResponse)
-def create_and_opinion_http(request: CreateAndOpinionRequest, user=Depends(require_role("user"))):
+async def create_and_opinion_http(request: CreateAndOpinionRequest, user=Depends(require_role("user"))):
     try:
-        node_id, link_ids, updated_nodes = create_and_opinion(
+        contents = await run_in_threadpool(
+            get_opinion_contents, request.son_ids + [request.parent_id]
+        )
+        if not await is_AND_link_reasonable_async(
+            [contents[son_id] for son_id in request.son_ids],
+            contents[request.parent_id],
+            request.link_type.value,
+        ):
+            raise ValueError("The AND link is not reasonable according to LLM evaluation.")
+        node_id, link_ids, updated_nodes = await run_in_threadpool(
+            create_and_opinion,
             parent_id=request.parent_id,
             son_ids=request.son_ids,
             link_type=request.link_type,
             creator=request.creator,
             host="local",
             debate_id=request.debate_id,
-            is_llm_evaluate=True,
         )
         need_updated_nodes = {
             k: updated_nodes[k] for k in request.loaded_ids if k in updated_nodes
@@ -77,10 +95,33 @@ def delete_opinion_http(request: DeleteOpinionRequest, user=Depends(require_role
     return result
 
 
+@router.post("/delete_batch", response_model=DeleteOpinionsResponse)
+def delete_opinions_http(request: DeleteOpinionsRequest, user=Depends(require_role("admin"))):
+    try:
+        deleted_ids, updated_nodes = delete_opinions(
+            opinion_ids=request.opinion_ids,
+            debate_id=request.debate_id,
+            include_subtree=request.include_subtree,
+        )
+        need_updated_nodes = {
+            k: updated_nodes[k] for k in request.loaded_ids if k in updated_nodes
+        }
+        result = {
+            "is_success": True,
+            "deleted_ids": deleted_ids,
+            "updated_nodes": need_updated_nodes,
+        }
+    except Exception as e:
+        result = {"is_success": False, "msg": str(e)}
+
+    return result
+
+
+# 只读接口使用异步驱动，直接在事件循环中查询，不占用线程池
 @router.get("/info", response_model=InfoOpinionResponse)
-def info_opinion_http(filter_query: Annotated[InfoOpinionRequest, Query()]):
+async def info_opinion_http(filter_query: Annotated[InfoOpinionRequest, Query()]):
     try:
-        result = info_opinion(
+        result = await info_opinion_async(
             opinion_id=filter_query.opinion_id,
             debate_id=filter_query.debate_id,
         )
@@ -95,16 +136,55 @@ def info_opinion_http(filter_query: Annotated[InfoOpinionRequest, Query()]):
         }
 
 
+@router.post("/info_batch", response_model=InfoOpinionsResponse)
+async def info_opinions_http(request: InfoOpinionsRequest):
+    try:
+        result = await info_opinions_async(
+            opinion_ids=request.opinion_ids,
+            debate_id=request.debate_id,
+        )
+        return {
+            "is_success": True,
+            "data": result,
+        }
+    except Exception as e:
+        return {
+            "is_success": False,
+            "msg": str(e),
+        }
+
+
 @router.get("/query", response_model=QueryOpinionResponse)
-def query_opinion_http(filter_query: Annotated[QueryOpinionRequest, Query()]):
+async def query_opinion_http(filter_query: Annotated[QueryOpinionRequest, Query()]):
     try:
-        result = query_opinion(
+        result = await query_opinion_async(
             q=filter_query.q,
             debate_id=filter_query.debate_id,
             min_score=filter_query.min_score,
             max_score=filter_query.max_score,
             is_time_accending=filter_query.is_time_accending,
             max_num=filter_query.max_num,
+            cursor=filter_query.cursor,
+            is_relevance_order=filter_query.is_relevance_order,
+        )
+        return {
+            "is_success": True,
+            "data": result,
+        }
+    except Exception as e:
+        return {
+            "is_success": False,
+            "msg": str(e),
+        }
+
+
+@router.get("/similar", response_model=SimilarOpinionResponse)
+def similar_opinions_http(filter_query: Annotated[SimilarOpinionRequest, Query()]):
+    try:
+        result = similar_opinions(
+            text=filter_query.text,
+            debate_id=filter_query.debate_id,
+            k=filter_query.k,
         )
         return {
             "is_success": True,
@@ -118,9 +198,9 @@ def query_opinion_http(filter_query: Annotated[QueryOpinionRequest, Query()]):
 
 
 @router.post("/head", response_model=HeadOpinionResponse)
-def head_opinion_http(request: HeadOpinionRequest):
+async def head_opinion_http(request: HeadOpinionRequest):
     try:
-        result = head_opinion(
+        result = await head_opinion_async(
             debate_id=request.debate_id,
             is_root=request.is_root,
         )
@@ -136,13 +216,21 @@ def head_opinion_http(request: HeadOpinionRequest):
 
 
 @router.post("/patch", response_model=PatchOpinionResponse)
-def patch_opinion_http(request: PatchOpinionRequest, user=Depends(require_role("admin"))):
+async def patch_opinion_http(request: PatchOpinionRequest, user=Depends(require_role("admin"))):
     try:
-        updated_nodes = patch_opinion(
+        score = request.score
+        if request.is_llm_score:
+            content = request.content
+            if content is None:
+                content = (await run_in_threadpool(get_opinion_contents, [request.id]))[
+                    request.id
+                ]
+            score = {"positive": await llm_score_async(content)}
+        updated_nodes = await run_in_threadpool(
+            patch_opinion,
             opinion_id=request.id,
             content=request.content,
-            score=request.score,
-            is_llm_score=request.is_llm_score,
+            score=score,
             creator=request.creator,
         )
         need_updated_nodes = {
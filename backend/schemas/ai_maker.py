@@ -8,3 +8,26 @@ class CreateDebateRequest(BaseModel):
 
 class CreateDebateResponse(MsgResponse):
     id: str | None = Field(None, description="ID of the created debate")
+
+
+class LlmCacheStatsResponse(MsgResponse):
+    data: dict | None = Field(None, description="Hit and miss counts of the LLM cache")
+
+
+class SubmitJobRequest(BaseModel):
+    content: str = Field(..., description="The root opinion content")
+    max_nodes: int = Field(
+        20, description="Maximum number of opinions to create", ge=1, le=500
+    )
+
+
+class SubmitJobResponse(MsgResponse):
+    id: str | None = Field(None, description="ID of the submitted job")
+
+
+class JobRequest(BaseModel):
+    id: str = Field(..., min_length=1)
+
+
+class JobResponse(MsgResponse):
+    data: dict | None = Field(None, description="Status and progress of the job")
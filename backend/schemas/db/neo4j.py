@@ -23,10 +23,13 @@ class Opinion(StructuredNode):
         choices={"solid": "solid", "empty": "empty"}, required=True
     )
     intermediate = BooleanProperty(default=False)
+    # AI 生成辩论时 LLM 判定无需继续辩论，继续生成时不再展开
+    settled = BooleanProperty(default=False)
     positive_score = FloatProperty(min_value=0, max_value=1)  #type: ignore
     negative_score = FloatProperty(min_value=0, max_value=1)  #type: ignore
     son_positive_score = FloatProperty(min_value=0, max_value=1)  #type: ignore
     son_negative_score = FloatProperty(min_value=0, max_value=1)  #type: ignore
+    topo_order = FloatProperty()
 
     supports = RelationshipTo("Opinion", "supports", model=Link)
     opposes = RelationshipTo("Opinion", "opposes", model=Link)
@@ -7,6 +7,9 @@ from sqlalchemy import (
     Boolean,
     Index,
     Enum,
+    Float,
+    Integer,
+    JSON,
 )
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import declarative_base
@@ -47,6 +50,7 @@ class Debate(DbBase):
     created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
     creator = Column(Text, nullable=False)
     is_all = Column(Boolean, default=False, nullable=False)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     __table_args__ = (
         Index(
             "uq_debate_is_all_true",
@@ -81,6 +85,67 @@ class Opinion(DbBase):
     )
 
 
+# ================== 双写发件箱表 ==================
+class WriteOutbox(DbBase):
+    __tablename__ = "write_outbox"
+
+    # 与观点行在同一事务中写入，Neo4j写入完成后删除
+    opinion_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("opinion.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    operation = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+
+# ================== 删除发件箱表 ==================
+class PruneOutbox(DbBase):
+    __tablename__ = "prune_outbox"
+
+    # 观点行删除后其 Neo4j 节点仍待删除（prune），或留存的邻居仍待修复分数（repair）
+    # 观点行已不存在，因此不设外键
+    opinion_id = Column(UUID(as_uuid=True), primary_key=True)
+    operation = Column(Text, primary_key=True)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+
+# ================== LLM 结果缓存表 ==================
+class LlmCache(DbBase):
+    __tablename__ = "llm_cache"
+
+    # 模型、提示词模板版本与规范化后输入的SHA-256
+    key = Column(Text, primary_key=True)
+    model = Column(Text, nullable=False)
+    kind = Column(Text, nullable=False)
+    value = Column(Float, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+
+
+# ================== AI 生成辩论任务表 ==================
+class AiJob(DbBase):
+    __tablename__ = "ai_job"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    creator = Column(Text, nullable=False)
+    content = Column(Text, nullable=False)
+    max_nodes = Column(Integer, nullable=False)
+    # pending/running/done/failed/cancelled
+    status = Column(Text, nullable=False, default="pending")
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    # 运行中任务的租约，由执行任务的工作线程定期刷新
+    locked_at = Column(TIMESTAMP)
+    # 生成中的辩论，重启后据此继续生成
+    debate_id = Column(UUID(as_uuid=True))
+    progress = Column(JSON)
+    error = Column(Text)
+    created_at = Column(TIMESTAMP, server_default=func.now(), nullable=False)
+    updated_at = Column(
+        TIMESTAMP, server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+    __table_args__ = (Index("ix_ai_job_status_created_at", "status", "created_at"),)
+
+
 def model2dict(model) -> dict:
     """
     Convert a SQLAlchemy model instance to a dictionary.
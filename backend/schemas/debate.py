@@ -14,6 +14,16 @@ class CreateDebateResponse(MsgResponse):
 
 class DeleteDebateRequest(BaseModel):
     id: str = Field(..., min_length=1)
+    delete_orphans: bool = Field(
+        False,
+        description="Whether to delete the opinions cited by no other debate but the global one",
+    )
+
+
+class DeleteDebateResponse(MsgResponse):
+    data: dict | None = Field(
+        None, description="Numbers of deleted orphans and of opinions with updated scores"
+    )
 
 
 class QueryDebateRequest(BaseModel):
@@ -50,3 +60,31 @@ class CiteDebateRequest(BaseModel):
 
 class GlobalDebateIDResponse(MsgResponse):
     id: str = Field(..., description="ID of the global debate")
+
+
+class ImportOpinion(BaseModel):
+    id: str = Field(..., min_length=1, description="Key of the opinion in the links")
+    content: str = Field(..., min_length=1)
+    score: float | None = Field(
+        None, description="Initial positive score of the opinion", ge=0, le=1
+    )
+
+
+class ImportDebateRequest(BaseModel):
+    title: str = Field(..., min_length=1)
+    creator: str = Field(..., min_length=1)
+    description: str | None = None
+    code: str | None = Field(
+        None, description="Debate code, e.g. 'a1:...; a2:...; a1->a2', used if opinions is empty"
+    )
+    opinions: list[ImportOpinion] = []
+    links: list[str] = Field(
+        [], description="Links in debate code, e.g. 'a1->a2', 'a1->!a2', 'a1|a2->a3' or 'a1&a2->a3'"
+    )
+
+
+class ImportDebateResponse(MsgResponse):
+    id: str | None = Field(None, description="ID of the imported debate")
+    id_map: dict[str, str] | None = Field(
+        None, description="ID of the created opinion for every key"
+    )
@@ -0,0 +1,8 @@
+from pydantic import Field
+from schemas.msg import MsgResponse
+
+
+class MetricsResponse(MsgResponse):
+    data: dict | None = Field(
+        None, description="Connection pool and query statistics of each store"
+    )
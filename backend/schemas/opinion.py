@@ -68,6 +68,25 @@ class DeleteOpinionResponse(MsgResponse):
     )
 
 
+class DeleteOpinionsRequest(BaseModel):
+    opinion_ids: list[str] = Field(..., min_length=1)
+    debate_id: str
+    include_subtree: bool = Field(
+        False,
+        description="Whether to also delete the descendants only linked to deleted opinions",
+    )
+    loaded_ids: list[str] = Field(
+        [], description="List of opinion IDs that are already loaded in the frontend"
+    )
+
+
+class DeleteOpinionsResponse(MsgResponse):
+    deleted_ids: list[str] | None = Field(None, description="IDs of the deleted opinions")
+    updated_nodes: dict[str, dict[str, float | None]] | None = Field(
+        None, description="IDs of nodes with updated scores and their new scores"
+    )
+
+
 class InfoOpinionRequest(BaseModel):
     opinion_id: str
     debate_id: str | None = None
@@ -77,6 +96,19 @@ class InfoOpinionResponse(MsgResponse):
     data: dict | None = Field(None, description="Details of the opinion if found")
 
 
+class InfoOpinionsRequest(BaseModel):
+    opinion_ids: list[str] = Field(
+        ..., description="IDs of the opinions to retrieve", max_length=1000
+    )
+    debate_id: str | None = None
+
+
+class InfoOpinionsResponse(MsgResponse):
+    data: list[dict] | None = Field(
+        None, description="Details of the opinions found, in the given order"
+    )
+
+
 class QueryOpinionRequest(BaseModel):
     q: str | None = None
     debate_id: str | None = None
@@ -88,6 +120,13 @@ class QueryOpinionRequest(BaseModel):
     max_num: int = Field(
         20, description="Maximum number of opinions to return", le=100, ge=1
     )
+    cursor: str | None = Field(
+        None, description="ID of the last opinion of the previous page"
+    )
+    is_relevance_order: bool = Field(
+        False,
+        description="Whether to rank the results by relevance, q must be at least two CJK characters",
+    )
 
 
 class QueryOpinionResponse(MsgResponse):
@@ -96,6 +135,18 @@ class QueryOpinionResponse(MsgResponse):
     )
 
 
+class SimilarOpinionRequest(BaseModel):
+    text: str = Field(..., min_length=1)
+    debate_id: str | None = None
+    k: int = Field(5, description="Maximum number of opinions to return", le=50, ge=1)
+
+
+class SimilarOpinionResponse(MsgResponse):
+    data: list[dict] | None = Field(
+        None, description="Most similar opinions with their similarity, most similar first"
+    )
+
+
 class HeadOpinionRequest(BaseModel):
     debate_id: str
     is_root: bool = Field(
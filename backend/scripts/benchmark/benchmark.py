@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+性能基准脚本
+
+生成合成辩论（长链、宽扇入、与节点菱形、质疑拆分图），批量导入后对核心操作计时，
+记录每个操作的 p50/p99 延迟与平均数据库调用次数，结果写入 JSON 文件，便于在不同版本间对比。
+LLM 由确定性的本地桩代替，可离线运行。
+
+注意：脚本会向配置的数据库写入数据，结束时删除，请勿在生产库上运行。
+
+使用方法:
+    python benchmark.py                                 # 默认规模 1000 与 10000
+    python benchmark.py --sizes 1000 10000 100000       # 指定规模
+    python benchmark.py --shapes chain fan_in -o a.json # 指定图形与输出文件
+    python benchmark.py --compare old.json new.json     # 对比两次结果
+"""
+
+import sys
+import json
+import uuid
+import time
+import random
+import hashlib
+import argparse
+import pathlib
+import subprocess
+import numpy as np
+
+# 添加项目根目录到路径
+project_root = pathlib.Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import delete
+from neomodel import db
+from core.db_life import init_db, close_db, get_psql_session
+from core.debate import get_global_debate
+from core.bulk_import import import_debate, DELETE_NODES_QUERY, NEO4J_BATCH_SIZE
+from core.opinion import (
+    patch_opinion,
+    delete_opinion,
+    head_opinion,
+    query_opinion,
+    info_opinion,
+)
+from core.link import create_link
+from core.utils import llm
+from core.utils.membership import membership_cache
+from core.utils.tracing import track_request, record_llm
+from core.utils.debate import init_global_debate
+from core.utils.search import ensure_fulltext_index
+from core.utils.reachability import ensure_topo_order
+from core.utils.debate_version import bump_versions_in
+from core.utils.embedding import get_opinion_index
+from schemas.db.psql import Debate as DebatePsql, Opinion as OpinionPsql
+from schemas.link import LinkType
+
+SHAPES = ("chain", "fan_in", "diamonds", "attack_split")
+# 每个操作的采样次数
+DEFAULT_REPEAT = 50
+SEED = 42
+
+
+def stub_llm_chat(prompt: str) -> str:
+    """
+    确定性的 LLM 桩：同一提示词总是得到同一回答，评分落在合理阈值之上。
+    """
+    start = time.perf_counter()
+    try:
+        if "请回答“是”" in prompt:
+            return "<answer>是</answer>"
+        digest = hashlib.sha256(prompt.encode()).digest()
+        score = 0.6 + 0.4 * digest[0] / 255
+        return f"<answer>{score:.3f}</answer>"
+    finally:
+        # 与真实调用一样计入请求的 LLM 统计
+        record_llm(time.perf_counter() - start)
+
+
+async def stub_llm_chat_async(prompt: str) -> str:
+    return stub_llm_chat(prompt)
+
+
+def stub_cached_llm_value(kind: str, inputs: list[str], prompt: str, parse):
+    # 桩的回答不写入 llm_cache 表，以免污染真实的缓存
+    return parse(llm.llm_chat(prompt))
+
+
+async def stub_cached_llm_value_async(kind: str, inputs: list[str], prompt: str, parse):
+    return parse(await llm.llm_chat_async(prompt))
+
+
+def install_llm_stub():
+    llm.llm_chat = stub_llm_chat
+    llm.llm_chat_async = stub_llm_chat_async
+    llm._cached_llm_value = stub_cached_llm_value
+    llm._cached_llm_value_async = stub_cached_llm_value_async
+
+
+# 生成器返回的观点按“子先于父”排列，下标小的观点指向下标大的观点不会成环
+def gen_chain(n: int, rng: random.Random) -> tuple[list[dict], list[str]]:
+    """长链：a0 -> a1 -> ... -> a(n-1)，每三条链有一条反对。"""
+    opinions = [{"id": f"a{i}", "content": f"链观点 {i}"} for i in range(n)]
+    links = [
+        f"a{i}->{'!' if i % 3 == 2 else ''}a{i + 1}" for i in range(n - 1)
+    ]
+    return opinions, links
+
+
+def gen_fan_in(n: int, rng: random.Random) -> tuple[list[dict], list[str]]:
+    """宽扇入：n-1 个叶节点直接指向同一个根节点。"""
+    opinions = [{"id": f"a{i}", "content": f"扇入观点 {i}"} for i in range(n)]
+    root = f"a{n - 1}"
+    links = [
+        f"a{i}->{'!' if rng.random() < 0.3 else ''}{root}" for i in range(n - 1)
+    ]
+    return opinions, links
+
+
+def gen_diamonds(n: int, rng: random.Random, width: int = 32) -> tuple[list[dict], list[str]]:
+    """与节点菱形：逐层排列，每个观点由上一层两个观点的与节点支持或反对。"""
+    opinions = [{"id": f"a{i}", "content": f"菱形观点 {i}"} for i in range(n)]
+    links = []
+    for i in range(width, n):
+        layer_start = (i // width - 1) * width
+        a, b = rng.sample(range(layer_start, layer_start + width), 2)
+        links.append(f"a{a}&a{b}->{'!' if rng.random() < 0.3 else ''}a{i}")
+    return opinions, links
+
+
+def gen_attack_split(n: int, rng: random.Random) -> tuple[list[dict], list[str]]:
+    """
+    质疑拆分图：一棵二叉树，每条链都按 attack_link 的方式拆分为
+    “子观点 & 质疑观点 -> 父观点”。
+    """
+    tree_size = max(2, n // 2)
+    # 树节点按倒序编号，使子节点下标小于父节点
+    keys = [f"t{i}" for i in range(tree_size)]
+    opinions = []
+    links = []
+    for i in range(1, tree_size):
+        son, parent = tree_size - 1 - i, tree_size - 1 - (i - 1) // 2
+        attacker = f"x{son}"
+        opinions.append(
+            {"id": attacker, "content": f"树观点 {son} -> 树观点 {parent}", "score": 1.0}
+        )
+        links.append(f"{keys[son]}&{attacker}->{keys[parent]}")
+    opinions += [{"id": key, "content": f"树观点 {i}"} for i, key in enumerate(keys)]
+    return opinions, links
+
+
+GENERATORS = {
+    "chain": gen_chain,
+    "fan_in": gen_fan_in,
+    "diamonds": gen_diamonds,
+    "attack_split": gen_attack_split,
+}
+
+
+def generate(shape: str, n: int, rng: random.Random) -> tuple[list[dict], list[str]]:
+    opinions, links = GENERATORS[shape](n, rng)
+    targets = {link.split("->")[1].lstrip("!") for link in links}
+    for opinion in opinions:
+        if opinion["id"] not in targets and "score" not in opinion:
+            opinion["score"] = round(rng.random(), 3)
+    return opinions, links
+
+
+def measure(fn, samples: list) -> dict:
+    """
+    Run fn on every sample and summarize the latencies and DB calls.
+    """
+    latencies, neo4j_queries, psql_queries, llm_calls = [], [], [], []
+    errors, first_error = 0, None
+    for sample in samples:
+        with track_request() as stats:
+            start = time.perf_counter()
+            try:
+                fn(sample)
+            except Exception as e:
+                errors += 1
+                first_error = first_error or str(e)
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+        neo4j_queries.append(stats.queries["neo4j"])
+        psql_queries.append(stats.queries["psql"])
+        llm_calls.append(stats.llm_calls)
+    if not latencies:
+        return {"samples": 0, "errors": errors, "first_error": first_error}
+    return {
+        "samples": len(latencies),
+        "errors": errors,
+        "first_error": first_error,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "neo4j_queries": round(float(np.mean(neo4j_queries)), 2),
+        "psql_queries": round(float(np.mean(psql_queries)), 2),
+        "llm_calls": round(float(np.mean(llm_calls)), 2),
+    }
+
+
+def run_case(shape: str, n: int, repeat: int, keep: bool) -> dict:
+    rng = random.Random(f"{SEED}-{shape}-{n}")
+    opinions, links = generate(shape, n, rng)
+    start = time.perf_counter()
+    imported = import_debate(
+        title=f"benchmark {shape} {n}",
+        creator="benchmark",
+        opinions=opinions,
+        links=links,
+        description="性能基准自动生成，可删除",
+    )
+    import_seconds = time.perf_counter() - start
+    debate_id = imported["debate_id"]
+    id_map = imported["id_map"]
+    uids = [id_map[op["id"]] for op in opinions]
+    leaves = [id_map[op["id"]] for op in opinions if "score" in op]
+    global_debate_id = get_global_debate()
+
+    existing = set()
+    for link in links:
+        left, right = link.split("->")
+        for key in left.replace("&", "|").split("|"):
+            existing.add((key, right.lstrip("!")))
+    link_pairs = []
+    while len(link_pairs) < repeat and len(opinions) > 1:
+        i, j = sorted(rng.sample(range(len(opinions)), 2))
+        pair = (opinions[i]["id"], opinions[j]["id"])
+        if pair not in existing:
+            existing.add(pair)
+            link_pairs.append((uids[i], uids[j]))
+
+    results = {
+        "import_seconds": round(import_seconds, 3),
+        "nodes": imported["nodes"],
+        "links": imported["links"],
+    }
+    try:
+        results["head_opinion_root"] = measure(
+            lambda _: head_opinion(debate_id, is_root=True), range(repeat)
+        )
+        results["head_opinion_leaf"] = measure(
+            lambda _: head_opinion(debate_id, is_root=False), range(repeat)
+        )
+        results["query_opinion"] = measure(
+            lambda q: query_opinion(q=q, debate_id=debate_id, max_num=20),
+            [f"观点 {rng.randrange(n)}" for _ in range(repeat)],
+        )
+        results["info_opinion"] = measure(
+            lambda uid: info_opinion(uid, debate_id),
+            [rng.choice(uids) for _ in range(repeat)],
+        )
+        results["patch_opinion"] = measure(
+            lambda uid: patch_opinion(uid, score={"positive": round(rng.random(), 3)}),
+            [rng.choice(leaves) for _ in range(repeat)],
+        )
+        results["create_link"] = measure(
+            lambda pair: create_link(
+                pair[0],
+                pair[1],
+                LinkType.SUPPORT if rng.random() < 0.7 else LinkType.OPPOSE,
+                is_llm_evalate=True,
+            ),
+            link_pairs,
+        )
+        results["delete_opinion"] = measure(
+            lambda uid: delete_opinion(uid, global_debate_id),
+            rng.sample(leaves, min(repeat, len(leaves))),
+        )
+    finally:
+        if not keep:
+            cleanup(debate_id)
+    return results
+
+
+def cleanup(debate_id: str):
+    """
+    删除基准辩论及其全部观点（包括导入时生成的与节点）。
+    """
+    uids = membership_cache.members(debate_id)
+    for begin in range(0, len(uids), NEO4J_BATCH_SIZE):
+        db.cypher_query(
+            DELETE_NODES_QUERY, {"uids": uids[begin : begin + NEO4J_BATCH_SIZE]}
+        )
+    with get_psql_session() as psql_session:
+        bump_versions_in(psql_session, opinion_ids=uids)
+        psql_session.execute(
+            delete(OpinionPsql).where(
+                OpinionPsql.id.in_([uuid.UUID(uid) for uid in uids])
+            )
+        )
+        psql_session.execute(delete(DebatePsql).where(DebatePsql.id == debate_id))
+        psql_session.commit()
+    membership_cache.discard_everywhere(uids)
+    membership_cache.invalidate(debate_id)
+    get_opinion_index().remove(uids)
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=project_root,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(old_path: str, new_path: str):
+    """
+    打印两次结果中每个操作 p50/p99 与数据库调用次数的变化。
+    """
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old.get('revision')} -> {new.get('revision')}")
+    for case, new_ops in new["cases"].items():
+        old_ops = old["cases"].get(case)
+        if not old_ops:
+            continue
+        print(f"\n[{case}]")
+        for op, new_stats in new_ops.items():
+            old_stats = old_ops.get(op)
+            if not isinstance(new_stats, dict) or not old_stats or "p50_ms" not in new_stats:
+                continue
+            cells = []
+            for key in ("p50_ms", "p99_ms", "neo4j_queries", "psql_queries"):
+                before, after = old_stats.get(key), new_stats[key]
+                ratio = f"{after / before:.2f}x" if before else "-"
+                cells.append(f"{key} {before} -> {after} ({ratio})")
+            print(f"  {op:<18} " + ", ".join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenDebate 性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=list(SHAPES))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    parser.add_argument("--keep", action="store_true", help="保留生成的辩论")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    install_llm_stub()
+    init_db()
+    try:
+        init_global_debate()
+        ensure_topo_order()
+        ensure_fulltext_index()
+        report = {
+            "revision": git_revision(),
+            "timestamp": int(time.time() * 1000),
+            "repeat": args.repeat,
+            "cases": {},
+        }
+        for shape in args.shapes:
+            for n in args.sizes:
+                case = f"{shape}-{n}"
+                print(f"运行 {case} ...")
+                report["cases"][case] = run_case(shape, n, args.repeat, args.keep)
+                print(json.dumps(report["cases"][case], ensure_ascii=False, indent=2))
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+    finally:
+        close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
+import sys
+import pathlib
+
+# 添加项目根目录到路径
+project_root = pathlib.Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
 from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
 from config_private import BACKEND_API_BASEURL, MODEL, BASE_URL, API_KEY
+from core.utils.debate_code import parse_debate_code, leaf_keys
 import re
 import httpx
 import json
 
 # 以txt结尾则让AI生成辩论图代码，若是json则直接读取
 DOC_PATH = "/home/test/Documents/个人/辩驳.json"
+# True 则在进程内批量导入（需能直连数据库），False 则逐个调用后端接口
+BULK_IMPORT = True
+# 批量导入时叶节点AI打分的并发数
+SCORE_WORKERS = 8
 
 
 def chat(prompt, client: OpenAI) -> str:
@@ -100,27 +113,6 @@ def eval_opinion(content: str, client: OpenAI) -> float | None:
         return None
 
 
-def parse_debate_code(debate_code: str):
-    """
-    解析辩论图代码，返回观点列表和链关系列表
-    观点格式: id:内容
-    链格式: a1->a2, a1->!a2, a1|a2->a3, a1&a2->a3
-    """
-    opinions = []
-    links = []
-    for line in debate_code.split(";"):
-        line = line.strip()
-        if not line:
-            continue
-        if ":" in line and "->" not in line:
-            # 观点
-            oid, content = line.split(":", 1)
-            opinions.append({"id": oid.strip(), "content": content.strip()})
-        elif "->" in line:
-            links.append(line)
-    return opinions, links
-
-
 def create_debate(title, description, creator, session) -> str:
     resp = session.post(
         f"{BACKEND_API_BASEURL}/debate/create",
@@ -230,6 +222,35 @@ def score_son_opinion(debate_id, session, client: OpenAI):
             )
 
 
+def bulk_import(debate_title, opinions, links, client: OpenAI):
+    from core.db_life import init_db, close_db
+    from core.bulk_import import import_debate
+    from core.utils.reachability import ensure_topo_order
+
+    # 叶节点先由AI并发打分，随导入一并写入，分数只在最后计算一次
+    by_key = {op["id"]: op for op in opinions}
+    keys = leaf_keys(opinions, links)
+    with ThreadPoolExecutor(max_workers=SCORE_WORKERS) as executor:
+        scores = executor.map(lambda k: eval_opinion(by_key[k]["content"], client), keys)
+        for key, score in zip(keys, scores):
+            by_key[key]["score"] = score
+
+    init_db()
+    ensure_topo_order()
+    try:
+        stats = import_debate(
+            title=debate_title,
+            creator="ai",
+            opinions=opinions,
+            links=links,
+            description="测试",
+        )
+        stats.pop("id_map")
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    finally:
+        close_db()
+
+
 def main():
     client = OpenAI(
         api_key=API_KEY,
@@ -238,6 +259,9 @@ def main():
     debate_title, debate_code = ai_struct(client)
     # 1. 解析辩论图代码
     opinions, links = parse_debate_code(debate_code)
+    if BULK_IMPORT:
+        bulk_import(debate_title, opinions, links, client)
+        return
     # 2. 创建debate
     with httpx.Client() as session:
         debate_id = create_debate(debate_title, "测试", creator="ai", session=session)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+分数重算脚本
+
+从叶节点开始重新计算某辩论（默认全辩论）中所有观点的分数，
+适用于批量导入或评分规则变更之后的对账。
+
+使用方法:
+    python recompute_scores.py              # 重算全辩论
+    python recompute_scores.py <debate_id>  # 重算指定辩论
+"""
+
+import sys
+import json
+import pathlib
+
+# 添加项目根目录到路径
+project_root = pathlib.Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from core.db_life import init_db, close_db
+from core.update_score.recompute import recompute_scores
+
+
+def main():
+    debate_id = sys.argv[1] if len(sys.argv) > 1 else None
+
+    init_db()
+    try:
+        print(f"开始重算辩论: {debate_id or '全辩论'}")
+        stats = recompute_scores(debate_id)
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+        print(
+            f"共 {stats['nodes']} 个观点，更新 {stats['updated']} 个，"
+            f"速度 {stats['nodes_per_second']} 节点/秒"
+        )
+    finally:
+        close_db()
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,7 @@ project_root = pathlib.Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from core.db_life import init_db, get_psql_session
+from core.authentication.user_cache import notify_user_changed
 from schemas.db.psql import User
 
 
@@ -54,6 +55,8 @@ def set_user_permissions(permissions: Dict[str, Union[str, List[str]]]) -> None:
                 if user:
                     user.is_superuser = True
                     user.role = "admin"
+                    # 通知运行中的服务丢弃该用户的缓存
+                    notify_user_changed(session, user.id)
                     session.commit()
                     print(f"✓ 已设置用户 '{superuser_username}' 为超级用户")
                 else:
@@ -69,6 +72,7 @@ def set_user_permissions(permissions: Dict[str, Union[str, List[str]]]) -> None:
                 user = session.query(User).filter(User.username == username).first()
                 if user:
                     user.role = "admin"
+                    notify_user_changed(session, user.id)
                     session.commit()
                     print(f"✓ 已设置用户 '{username}' 为管理员")
                 else:
@@ -0,0 +1,297 @@
+import os
+import random
+import pytest
+from pytest import approx
+from core.update_score.graph import ScoreGraph
+from core.update_score.engine import propagate_in_memory
+from core.update_score.evaluate import evaluate_scores, _to_array
+from core.update_score.reference import ReferenceGraph, random_mutation
+import numpy as np
+
+# 随机图差分测试：参考实现与评分引擎在同一串随机修改后应得到相同的分数
+# 与 Neo4j 的差分测试会清空数据库，需设置环境变量 NEO4J_DIFF_TEST=1 才运行
+SEEDS = 200
+STEPS = 60
+NEO4J_SEEDS = 5
+
+
+class EngineModel:
+    """
+    Replays mutations the way the core functions do: change the stored graph,
+    then call the incremental engine on the same source nodes.
+
+    With `region`, only the region `load_region` would load is given to the
+    engine, with the outside parents as fixed nodes, otherwise the whole graph.
+    """
+
+    def __init__(self, region: bool = False):
+        self.region = region
+        self.logic_type: list[str] = []
+        self.alive: list[bool] = []
+        self.scores: list[list[float | None]] = []
+        self.links: dict[tuple[int, int], str] = {}
+
+    def apply(self, op: str, *args):
+        sources: list[int] = []
+        if op == "add_or":
+            self._add_node("or", args[0])
+        elif op == "add_and":
+            son_ids, parent_id, link_type = args
+            idx = self._add_node("and", None)
+            for son in son_ids:
+                self.links[(son, idx)] = "supports"
+            self.links[(idx, parent_id)] = link_type
+            sources = [idx]
+        elif op == "add_link":
+            from_id, to_id, link_type = args
+            self.links[(from_id, to_id)] = link_type
+            sources = [from_id]
+        elif op == "remove_link":
+            del self.links[args]
+            sources = list(args)
+        elif op == "remove_opinion":
+            idx = args[0]
+            self.alive[idx] = False
+            sources = [j for k in self.links if idx in k for j in k if j != idx]
+            self.links = {k: t for k, t in self.links.items() if idx not in k}
+        elif op == "set_score":
+            idx, score = args
+            self.scores[idx][0] = score
+            sources = [idx]
+        self._propagate(sources)
+
+    def _add_node(self, logic_type: str, score: float | None) -> int:
+        self.logic_type.append(logic_type)
+        self.alive.append(True)
+        self.scores.append([score, None, None, None])
+        return len(self.alive) - 1
+
+    def _closure(self, start: list[int], upward: bool) -> set[int]:
+        seen = set(start)
+        stack = list(start)
+        while stack:
+            i = stack.pop()
+            for s, p in self.links:
+                j = p if upward else s
+                if (s if upward else p) == i and j not in seen:
+                    seen.add(j)
+                    stack.append(j)
+        return seen
+
+    def _load_region(self, sources: list[int]) -> ScoreGraph:
+        """
+        Build the region like REGION_QUERY: the sources and their ancestors,
+        all descendants of those, and the outside parents as fixed nodes.
+        """
+        graph = ScoreGraph()
+        if not sources:
+            return graph
+        region = self._closure(self._closure(sources, upward=True), upward=False)
+        for i in sorted(region):
+            graph.add_node(str(i), self.logic_type[i], *self.scores[i])
+        for (s, p), link_type in self.links.items():
+            if s not in region:
+                continue
+            if str(p) not in graph.index:
+                graph.add_node(str(p), self.logic_type[p], *self.scores[p], mutable=False)
+            graph.add_edge(graph.index[str(s)], graph.index[str(p)], link_type)
+        return graph
+
+    def _propagate(self, sources: list[int]):
+        if self.region:
+            graph = self._load_region(sources)
+        else:
+            graph = ScoreGraph()
+            for i, alive in enumerate(self.alive):
+                if alive:
+                    graph.add_node(str(i), self.logic_type[i], *self.scores[i])
+            for (s, p), link_type in self.links.items():
+                graph.add_edge(graph.index[str(s)], graph.index[str(p)], link_type)
+        propagate_in_memory(graph, [graph.index[str(i)] for i in sources], {})
+        for j, uid in enumerate(graph.uids):
+            if not graph.mutable[j]:
+                continue
+            self.scores[int(uid)] = [
+                graph.positive[j],
+                graph.negative[j],
+                graph.son_positive[j],
+                graph.son_negative[j],
+            ]
+
+
+def assert_same_scores(reference: ReferenceGraph, scores_of, context: str):
+    for i in reference.nodes():
+        expected = reference.scores(i)
+        actual = scores_of(i)
+        for name, e, a in zip(("positive", "negative", "son_positive", "son_negative"), expected, actual):
+            if e is None:
+                assert a is None, f"{context}: {name} of node {i} should be None, got {a}"
+            else:
+                assert a == approx(e, abs=1e-5), f"{context}: {name} of node {i}"
+
+
+@pytest.mark.parametrize("region", [False, True])
+def test_reference_matches_engine(region: bool):
+    for seed in range(SEEDS):
+        rng = random.Random(seed)
+        reference = ReferenceGraph()
+        engine = EngineModel(region)
+        history = []
+        for _ in range(STEPS):
+            mutation = random_mutation(rng, reference)
+            history.append(mutation)
+            getattr(reference, mutation[0])(*mutation[1:])
+            engine.apply(*mutation)
+            assert_same_scores(
+                reference,
+                lambda i: engine.scores[i],
+                f"seed {seed}, after {history}",
+            )
+
+
+def test_reference_matches_recompute():
+    for seed in range(SEEDS):
+        rng = random.Random(seed)
+        reference = ReferenceGraph()
+        for _ in range(STEPS):
+            mutation = random_mutation(rng, reference)
+            getattr(reference, mutation[0])(*mutation[1:])
+
+        # 从头重算：只保留给定分数，其余分数清空
+        nodes = reference.nodes()
+        index = {i: k for k, i in enumerate(nodes)}
+        given = [reference.given[i] for i in nodes]
+        empty = _to_array([None] * len(nodes))
+        links = list(reference.links.items())
+        positive, negative, son_positive, son_negative = evaluate_scores(
+            np.array([reference.logic_type[i] == "and" for i in nodes], dtype=bool),
+            _to_array(given),
+            empty,
+            empty,
+            empty,
+            np.ones(len(nodes), dtype=bool),
+            np.array([index[s] for (s, _), _ in links], dtype=np.int64),
+            np.array([index[p] for (_, p), _ in links], dtype=np.int64),
+            np.array([t == "supports" for _, t in links], dtype=bool),
+        )
+
+        def scores_of(i):
+            k = index[i]
+            return [
+                None if np.isnan(v) else float(v)
+                for v in (positive[k], negative[k], son_positive[k], son_negative[k])
+            ]
+
+        assert_same_scores(reference, scores_of, f"seed {seed}")
+
+
+def test_reference_rules():
+    graph = ReferenceGraph()
+    root = graph.add_or()
+    a = graph.add_or(0.8)
+    b = graph.add_or(0.4)
+    c = graph.add_or(0.9)
+    graph.add_link(a, root, "supports")
+    graph.add_link(b, root, "supports")
+    assert graph.positive[root] == approx(0.8)
+    graph.add_link(c, root, "opposes")
+    assert graph.positive[root] == approx((0.8 + 0.1) / 2)
+    # 反对者得到父节点反转后的正证分
+    assert graph.negative[c] == approx(1 - 0.8)
+
+    # 与节点只向取到最小值的子节点传递反证分
+    parent = graph.add_or()
+    d = graph.add_or(0.3)
+    graph.add_link(d, parent, "opposes")
+    x = graph.add_or(0.8)
+    y = graph.add_or(0.4)
+    and_id = graph.add_and([x, y], parent, "supports")
+    assert graph.son_positive[and_id] == approx(0.4)
+    assert graph.negative[y] == approx(1 - 0.3)
+    assert graph.negative[x] is None
+
+    # 失去全部子节点后，已被覆盖的给定分数不会恢复
+    graph.remove_opinion(c)
+    graph.remove_link(a, root)
+    graph.remove_link(b, root)
+    assert graph.positive[root] is None
+
+
+@pytest.mark.skipif(
+    not os.environ.get("NEO4J_DIFF_TEST"), reason="needs a disposable database"
+)
+def test_reference_matches_neo4j():
+    from neomodel import db
+    from core.db_life import init_db, close_db
+    from core.debate import create_debate, get_global_debate
+    from core.opinion import create_or_opinion, create_and_opinion, delete_opinion, patch_opinion
+    from core.link import create_link, delete_link_by_info
+    from core.utils.debate import init_global_debate
+    from core.utils.reachability import ensure_topo_order
+    from schemas.link import LinkType
+    from tests.utils import clear_db
+
+    init_db()
+    clear_db()
+    init_global_debate()
+    ensure_topo_order()
+    global_debate_id = get_global_debate()
+    try:
+        for seed in range(NEO4J_SEEDS):
+            rng = random.Random(seed)
+            debate_id = create_debate(title=f"差分测试 {seed}", creator="test_user")
+            reference = ReferenceGraph()
+            uids: list[str] = []
+            for _ in range(STEPS):
+                op, *args = random_mutation(rng, reference)
+                # 删除前记下链的类型
+                removed_type = reference.links.get(tuple(args)) if op == "remove_link" else None
+                getattr(reference, op)(*args)
+                if op == "add_or":
+                    uids.append(
+                        create_or_opinion(
+                            content=f"观点 {len(uids)}",
+                            creator="test_user",
+                            debate_id=debate_id,
+                            positive_score=args[0],
+                        )
+                    )
+                elif op == "add_and":
+                    son_ids, parent_id, link_type = args
+                    uid, _, _ = create_and_opinion(
+                        parent_id=uids[parent_id],
+                        son_ids=[uids[i] for i in son_ids],
+                        link_type=LinkType(link_type),
+                        creator="test_user",
+                        debate_id=debate_id,
+                    )
+                    uids.append(uid)
+                elif op == "add_link":
+                    create_link(uids[args[0]], uids[args[1]], LinkType(args[2]))
+                elif op == "remove_link":
+                    delete_link_by_info(
+                        {
+                            "from_id": uids[args[0]],
+                            "to_id": uids[args[1]],
+                            "link_type": removed_type,
+                        }
+                    )
+                elif op == "remove_opinion":
+                    delete_opinion(uids[args[0]], global_debate_id)
+                elif op == "set_score":
+                    patch_opinion(uids[args[0]], score={"positive": args[1]})
+
+            results, _ = db.cypher_query(
+                """
+                MATCH (n:Opinion) WHERE n.uid IN $uids
+                RETURN n.uid, n.positive_score, n.negative_score,
+                       n.son_positive_score, n.son_negative_score
+                """,
+                {"uids": uids},
+            )
+            stored = {row[0]: row[1:] for row in results}
+            assert_same_scores(
+                reference, lambda i: stored[uids[i]], f"seed {seed}"
+            )
+    finally:
+        close_db()
@@ -4,6 +4,7 @@ from core.opinion import create_or_opinion, create_and_opinion, info_opinion, pa
 from core.link import create_link, attack_link
 from core.db_life import init_db, close_db
 from core.utils.debate import init_global_debate
+from core.utils.reachability import ensure_topo_order
 from schemas.link import LinkType
 from tests.utils import clear_db
 
@@ -141,6 +142,8 @@ def test_score():
     clear_db()
     # 初始化全局辩论
     init_global_debate()
+    # 创建拓扑序计数器
+    ensure_topo_order()
 
     # 创建一个辩论
     debate_id = create_debate(